@@ -0,0 +1,48 @@
+// eventStream.js
+// Server-Sent Events for the translate endpoints. Clients opt in with
+// `Accept: text/event-stream` or ?stream=1 and then get, in order:
+//   queued    { job_id, position }    whenever the queue position changes
+//   started   { job_id }              once a worker picks the job up
+//   progress  { job_id, target, stage, lines_done, lines_total, progress, eta_seconds }
+//   done      the endpoint's JSON payload
+// or a final `error` / `cancelled` event with { error, details }.
+
+function wantsEventStream(req) {
+  return (req.headers.accept || "").includes("text/event-stream") || (req.query || {}).stream === "1";
+}
+
+function openEventStream(res, jobId) {
+  res.writeHead(200, {
+    "Content-Type": "text/event-stream",
+    "Cache-Control": "no-cache",
+    Connection: "keep-alive",
+    "X-Job-Id": jobId
+  });
+}
+
+function sendEvent(res, event, data) {
+  res.write(`event: ${event}\ndata: ${JSON.stringify(data)}\n\n`);
+}
+
+// jobQueue onUpdate handler relaying queue position and start
+function queueEvents(res, jobId) {
+  return ({ status, position }) => {
+    if (status === "queued") sendEvent(res, "queued", { job_id: jobId, position });
+    else sendEvent(res, "started", { job_id: jobId });
+  };
+}
+
+// translationWorker onProgress handler relaying a worker progress event (progress.py)
+function progressEvents(res, jobId) {
+  return (event) => sendEvent(res, "progress", {
+    job_id: jobId,
+    target: event.target,
+    stage: event.stage,
+    lines_done: event.lines_done,
+    lines_total: event.lines_total,
+    progress: event.progress,
+    eta_seconds: event.eta_seconds
+  });
+}
+
+module.exports = { wantsEventStream, openEventStream, sendEvent, queueEvents, progressEvents };
@@ -0,0 +1,157 @@
+// jobQueue.js
+// Bounded scheduler for Python jobs. At most `concurrency` jobs run at once,
+// each on its own slot (0..concurrency-1) so callers can pin a slot to a
+// worker process. Queued jobs are dispatched FIFO within a user, and across
+// users the one served least recently goes first, so one user's batch of
+// uploads can't starve others.
+
+function cancelledError() {
+  return Object.assign(new Error("Job cancelled"), { cancelled: true, details: "Job cancelled" });
+}
+
+class JobQueue {
+  constructor({ concurrency = 1 } = {}) {
+    this.concurrency = concurrency;
+    this.freeSlots = Array.from({ length: concurrency }, (_, i) => i);
+    this.userQueues = new Map(); // userId -> [queued job]
+    this.lastServed = new Map(); // userId -> sequence number of the user's last started job
+    this.sequence = 0;
+    this.jobs = new Map(); // jobId -> job (queued or running)
+  }
+
+  // User with queued work who was served least recently (never-served users first)
+  static _nextUser(userQueues, lastServed) {
+    let best = null;
+    let bestServed = Infinity;
+    for (const [userId, queue] of userQueues) {
+      if (!queue.length) continue;
+      const served = lastServed.has(userId) ? lastServed.get(userId) : -1;
+      if (served < bestServed) {
+        best = userId;
+        bestServed = served;
+      }
+    }
+    return best;
+  }
+
+  // run(job, slot) must return a promise; it may set job.onCancel to support
+  // cancelling while running. onUpdate({ status, position }) is called when the
+  // job's queue position changes and when it starts running.
+  enqueue({ id, userId, kind, run, onUpdate = null }) {
+    const job = {
+      id,
+      userId: String(userId),
+      kind,
+      run,
+      onUpdate,
+      status: "queued",
+      position: null,
+      slot: null,
+      onCancel: null,
+      enqueuedAt: Date.now(),
+      startedAt: null
+    };
+    job.promise = new Promise((resolve, reject) => {
+      job.resolve = resolve;
+      job.reject = reject;
+    });
+
+    if (!this.userQueues.has(job.userId)) this.userQueues.set(job.userId, []);
+    this.userQueues.get(job.userId).push(job);
+    this.jobs.set(id, job);
+    this._dispatch();
+    return job;
+  }
+
+  // Order in which queued jobs would start if nothing else arrived
+  _dispatchOrder() {
+    const queues = new Map([...this.userQueues].map(([userId, q]) => [userId, q.slice()]));
+    const lastServed = new Map(this.lastServed);
+    let sequence = this.sequence;
+    const order = [];
+    let userId;
+    while ((userId = JobQueue._nextUser(queues, lastServed)) !== null) {
+      order.push(queues.get(userId).shift());
+      lastServed.set(userId, sequence++);
+    }
+    return order;
+  }
+
+  _dispatch() {
+    let userId;
+    while (this.freeSlots.length && (userId = JobQueue._nextUser(this.userQueues, this.lastServed)) !== null) {
+      const queue = this.userQueues.get(userId);
+      const job = queue.shift();
+      if (!queue.length) this.userQueues.delete(userId);
+      this.lastServed.set(userId, this.sequence++);
+      this._start(job, this.freeSlots.shift());
+    }
+    this._notifyPositions();
+  }
+
+  _start(job, slot) {
+    job.status = "running";
+    job.slot = slot;
+    job.position = null;
+    job.startedAt = Date.now();
+    if (job.onUpdate) job.onUpdate({ status: "running", position: null });
+
+    Promise.resolve()
+      .then(() => job.run(job, slot))
+      .then(job.resolve, job.reject)
+      .finally(() => {
+        this.jobs.delete(job.id);
+        this.freeSlots.push(slot);
+        this._dispatch();
+      });
+  }
+
+  _notifyPositions() {
+    this._dispatchOrder().forEach((job, position) => {
+      if (job.position === position) return;
+      job.position = position;
+      if (job.onUpdate) job.onUpdate({ status: "queued", position });
+    });
+  }
+
+  status(id) {
+    const job = this.jobs.get(id);
+    if (!job) return null;
+    return {
+      job_id: job.id,
+      kind: job.kind,
+      status: job.status,
+      position: job.position,
+      queued_jobs: this.jobs.size - (this.concurrency - this.freeSlots.length),
+      waited_seconds: Math.round(((job.startedAt || Date.now()) - job.enqueuedAt) / 1000)
+    };
+  }
+
+  owner(id) {
+    const job = this.jobs.get(id);
+    return job ? job.userId : null;
+  }
+
+  // Removes a queued job, or asks a running job to stop via its onCancel hook
+  cancel(id) {
+    const job = this.jobs.get(id);
+    if (!job) return false;
+
+    if (job.status === "running") {
+      if (!job.onCancel) return false;
+      job.onCancel();
+      return true;
+    }
+
+    const queue = this.userQueues.get(job.userId) || [];
+    queue.splice(queue.indexOf(job), 1);
+    if (!queue.length) this.userQueues.delete(job.userId);
+    this.jobs.delete(id);
+    job.status = "cancelled";
+    job.reject(cancelledError());
+    this._notifyPositions();
+    return true;
+  }
+}
+
+module.exports = { JobQueue, cancelledError };
@@ -1,12 +1,17 @@
 # analysis.py
-import json, os, sys
+import json, sys
+from columnar_report import as_list, open_report
+from report_index import ReportIndex
 
 def find_latest_similarity_json(downloads_dir):
-    files = [f for f in os.listdir(downloads_dir) if f.endswith(".json") and "similarity" in f]
-    if not files:
-        return None
-    files.sort(key=lambda x: os.path.getmtime(os.path.join(downloads_dir, x)), reverse=True)
-    return os.path.join(downloads_dir, files[0])
+    # Latest similarity report (JSON or columnar .npz) from the downloads
+    # index, which only re-reads reports that are new since the last call
+    index = ReportIndex(downloads_dir)
+    try:
+        index.update()
+        return index.latest("similarity")
+    finally:
+        index.close()
 
 if __name__ == "__main__":
     downloads_dir = sys.argv[1] if len(sys.argv) > 1 else "."
@@ -14,9 +19,13 @@ if __name__ == "__main__":
     if not sim_json_path:
         print(json.dumps({"error": "No similarity JSON found for analysis"}))
     else:
-        with open(sim_json_path, "r", encoding="utf-8") as f:
-            report = json.load(f)
-        similarities = [r.get("similarity", 0.0) for r in report]
+        # similarity.py writes {"summary": ..., "report": [...]}; only the
+        # similarity column is read
+        with open_report(sim_json_path) as report:
+            similarities = [
+                float(s) if s is not None else 0.0
+                for s in (as_list(report.column("similarity")) if "similarity" in report.columns else [])
+            ]
         stats = {
             "count": len(similarities),
             "min": min(similarities) if similarities else 0.0,
@@ -0,0 +1,122 @@
+# batching.py
+import torch
+
+# Source-token budget per generate() call: batch_size * longest_line <= max_tokens.
+DEFAULT_MAX_TOKENS = 1024
+DEFAULT_MAX_BATCH_SIZE = 64
+
+
+def token_lengths(texts, tokenizer, max_length=512):
+    """Tokenized length of each text (no padding, same truncation as generation)."""
+    if not texts:
+        return []
+    encoded = tokenizer(list(texts), truncation=True, max_length=max_length)
+    return [len(ids) for ids in encoded["input_ids"]]
+
+
+def token_budget_batches(lengths, max_tokens=DEFAULT_MAX_TOKENS, max_batch_size=DEFAULT_MAX_BATCH_SIZE):
+    """
+    Group indices into batches of similar length. Indices are sorted by token
+    length and a batch is closed when adding the next line would push
+    (lines * longest line) over max_tokens, or the batch reaches max_batch_size.
+    A single line longer than the budget still gets a batch of its own.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches = []
+    current = []
+    longest = 0
+    for i in order:
+        new_longest = max(longest, lengths[i])
+        if current and (new_longest * (len(current) + 1) > max_tokens or len(current) >= max_batch_size):
+            batches.append(current)
+            current = []
+            new_longest = lengths[i]
+        current.append(i)
+        longest = new_longest
+    if current:
+        batches.append(current)
+    return batches
+
+
+def fixed_batches(n, batch_size):
+    """File-order batches of a fixed line count (the previous behaviour)."""
+    return [list(range(i, min(i + batch_size, n))) for i in range(0, n, batch_size)]
+
+
+def padding_stats(lengths, batches):
+    """Real vs padded source tokens for a batching plan."""
+    real = sum(lengths)
+    padded = sum(max(lengths[i] for i in b) * len(b) for b in batches if b)
+    return {
+        "batches": len(batches),
+        "real_tokens": real,
+        "padded_tokens": padded,
+        "padding_ratio": round(1 - real / padded, 4) if padded else 0.0
+    }
+
+
+def iter_token_batches(texts, tokenizer, max_tokens=DEFAULT_MAX_TOKENS,
+                       max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_length=512):
+    """Yield (indices, batch_texts) in length-bucketed order."""
+    lengths = token_lengths(texts, tokenizer, max_length=max_length)
+    for batch in token_budget_batches(lengths, max_tokens, max_batch_size):
+        yield batch, [texts[i] for i in batch]
+
+
+def sequence_log_probs(model, outputs, pad_token_id):
+    """
+    Mean token log-probability of each returned sequence, taken from the
+    scores of the same generate() call (return_dict_in_generate=True,
+    output_scores=True). Beam search already provides it as the
+    length-normalized sequences_scores. Greedy output is scored with
+    compute_transition_scores over each row's own tokens up to its EOS.
+    """
+    if getattr(outputs, "sequences_scores", None) is not None:
+        return outputs.sequences_scores.tolist()
+    if not outputs.scores:
+        return [0.0] * outputs.sequences.shape[0]
+    transition = model.compute_transition_scores(outputs.sequences, outputs.scores, normalize_logits=True)
+    generated = outputs.sequences[:, -transition.shape[1]:]
+    mask = generated != pad_token_id  # rows that finished early are padded after EOS
+    transition = transition.masked_fill(~mask, 0.0)
+    return (transition.sum(dim=1) / mask.sum(dim=1).clamp(min=1)).tolist()
+
+
+def iter_batched_generate(texts, model, tokenizer, max_tokens=DEFAULT_MAX_TOKENS,
+                          max_batch_size=DEFAULT_MAX_BATCH_SIZE, device="cpu", with_scores=False,
+                          **generate_kwargs):
+    """batched_generate() one batch at a time: yields (indices, decoded outputs) per generate() call."""
+    for indices, batch in iter_token_batches(texts, tokenizer, max_tokens, max_batch_size):
+        inputs = tokenizer(batch, return_tensors="pt", padding=True, truncation=True).to(device)
+        with torch.inference_mode():
+            if with_scores:
+                outputs = model.generate(
+                    **inputs, return_dict_in_generate=True, output_scores=True, **generate_kwargs
+                )
+                decoded = tokenizer.batch_decode(outputs.sequences, skip_special_tokens=True)
+                scores = sequence_log_probs(model, outputs, tokenizer.pad_token_id)
+                decoded = list(zip(decoded, scores))
+            else:
+                outputs = model.generate(**inputs, **generate_kwargs)
+                decoded = tokenizer.batch_decode(outputs, skip_special_tokens=True)
+        yield indices, decoded
+
+
+def batched_generate(texts, model, tokenizer, max_tokens=DEFAULT_MAX_TOKENS,
+                     max_batch_size=DEFAULT_MAX_BATCH_SIZE, device="cpu", on_batch=None,
+                     with_scores=False, **generate_kwargs):
+    """
+    Run model.generate over texts in token-budgeted, length-sorted batches and
+    return the decoded outputs in the original order. on_batch, if given, is
+    called with the indices finished after every batch. with_scores returns
+    (text, mean token log-prob) pairs computed from the same generate() call.
+    """
+    results = [None] * len(texts)
+    for indices, decoded in iter_batched_generate(
+        texts, model, tokenizer, max_tokens, max_batch_size, device, with_scores, **generate_kwargs
+    ):
+        for i, text in zip(indices, decoded):
+            results[i] = text
+        if on_batch is not None:
+            on_batch(indices)
+    return results
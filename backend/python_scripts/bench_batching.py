@@ -0,0 +1,59 @@
+# bench_batching.py
+# Compare fixed file-order batches (the old translate_text) with
+# length-bucketed, token-budgeted batches on one SRT file.
+#
+#   python bench_batching.py ../en.srt --src_lang en --tgt_lang es
+import argparse
+import json
+import time
+import pysrt
+import torch
+from batching import fixed_batches, padding_stats, token_budget_batches, token_lengths
+from model_registry import get_registry, marian_model_name
+
+
+def run_plan(texts, batches, model, tokenizer, generate_kwargs):
+    start = time.time()
+    for batch in batches:
+        inputs = tokenizer([texts[i] for i in batch], return_tensors="pt", padding=True, truncation=True)
+        with torch.inference_mode():
+            model.generate(**inputs, **generate_kwargs)
+    elapsed = time.time() - start
+    return {
+        "seconds": round(elapsed, 2),
+        "lines_per_sec": round(len(texts) / elapsed, 2) if elapsed > 0 else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fixed vs length-bucketed batching.")
+    parser.add_argument("srt", type=str, help="SRT file to translate")
+    parser.add_argument("--src_lang", type=str, default="en")
+    parser.add_argument("--tgt_lang", type=str, default="es")
+    parser.add_argument("--batch_size", type=int, default=8, help="Fixed batch size (baseline)")
+    parser.add_argument("--max_tokens", type=int, default=1024, help="Token budget (bucketed)")
+    parser.add_argument("--num_beams", type=int, default=4)
+    parser.add_argument("--no_generate", action="store_true", help="Only report padding statistics")
+    args = parser.parse_args()
+
+    texts = [s.text.replace("\n", " ").strip() for s in pysrt.open(args.srt)]
+    tokenizer, model = get_registry().marian(marian_model_name(args.src_lang, args.tgt_lang))
+    lengths = token_lengths(texts, tokenizer)
+
+    plans = {
+        "fixed": fixed_batches(len(texts), args.batch_size),
+        "bucketed": token_budget_batches(lengths, max_tokens=args.max_tokens)
+    }
+    generate_kwargs = {"max_length": 256, "num_beams": args.num_beams}
+
+    results = {"lines": len(texts)}
+    for name, batches in plans.items():
+        results[name] = padding_stats(lengths, batches)
+        if not args.no_generate:
+            results[name].update(run_plan(texts, batches, model, tokenizer, generate_kwargs))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# bench_hybrid_translator.py
+# Throughput of HybridSubtitleTranslatorCPUOptimized.translate_subtitles
+# (two-phase, batched) against the previous per-group loop, which ran two
+# batch-of-one generate() calls for every context group.
+#
+#   python bench_hybrid_translator.py ../en.srt --repeat 10
+import argparse
+import json
+import time
+import pysrt
+from my_translator import HybridSubtitleTranslatorCPUOptimized
+
+
+def per_group(translator, subs):
+    """The old loop: forward + back-translation one group at a time."""
+    entries = []
+    for group in translator._group_context(subs):
+        texts = [translator.clean_text(s.text) for s in group]
+        merged_text = " ".join(texts)
+        fwd_trans, fwd_conf = translator.batch_translate([merged_text])[0]
+        bt_text, _ = translator.batch_translate(
+            [fwd_trans], model=translator.bt_model, tokenizer=translator.bt_tokenizer
+        )[0]
+        entries.extend(translator._group_entries(group, texts, merged_text, fwd_trans, fwd_conf, bt_text))
+    return entries
+
+
+def long_srt(path, repeat):
+    """The SRT repeated `repeat` times, shifted so timestamps keep increasing."""
+    base = pysrt.open(path)
+    span = base[-1].end.ordinal + 1000 if base else 0
+    subs = pysrt.SubRipFile()
+    for r in range(repeat):
+        for sub in base:
+            subs.append(pysrt.SubRipItem(
+                index=len(subs) + 1,
+                start=pysrt.SubRipTime.from_ordinal(sub.start.ordinal + r * span),
+                end=pysrt.SubRipTime.from_ordinal(sub.end.ordinal + r * span),
+                text=sub.text
+            ))
+    return subs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-group vs two-phase translate_subtitles.")
+    parser.add_argument("srt", type=str)
+    parser.add_argument("--repeat", type=int, default=10, help="Repeat the SRT to make a long file")
+    parser.add_argument("--src_lang", type=str, default="en")
+    parser.add_argument("--tgt_lang", type=str, default="es")
+    args = parser.parse_args()
+
+    subs = long_srt(args.srt, args.repeat)
+    translator = HybridSubtitleTranslatorCPUOptimized(src_lang=args.src_lang, tgt_lang=args.tgt_lang)
+
+    start = time.time()
+    old = per_group(translator, subs)
+    old_seconds = time.time() - start
+
+    start = time.time()
+    new = translator.translate_subtitles(subs)
+    new_seconds = time.time() - start
+
+    print(json.dumps({
+        "lines": len(subs),
+        "per_group": {"seconds": round(old_seconds, 2), "lines_per_sec": round(len(subs) / old_seconds, 2)},
+        "two_phase": {"seconds": round(new_seconds, 2), "lines_per_sec": round(len(subs) / new_seconds, 2)},
+        "speedup": round(old_seconds / new_seconds, 2) if new_seconds else None,
+        "identical_entries": sum(a == b for a, b in zip(old, new)),
+        "differing_translations": sum(a["translated"] != b["translated"] for a, b in zip(old, new))
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# bench_overlap.py
+# Wall time of translate.py's sequential stages against --overlap with
+# different process-wide torch thread counts (--overlap-threads, shared by
+# all three stages), on the same total thread budget.
+# Each overlapped run reports every stage's utilization (busy / wall time)
+# and how far its output is from the sequential run: translations should
+# match exactly, while back-translation similarities may differ
+# slightly because those stages batch per forward batch (see
+# stage_pipeline.py). The translation memory and embedding cache should be
+# off (SUBTITLE_TM_PATH=off SUBTITLE_EMBEDDING_CACHE=off) so every run does
+# the full work.
+#
+#   python bench_overlap.py ../en.srt --repeat 20 --overlap-threads 2 4
+import argparse
+import json
+import os
+import tempfile
+from model_registry import configure_torch_threads
+from bench_hybrid_translator import long_srt
+from stage_pipeline import default_overlap_threads, parse_overlap_threads
+from translate import translate_srt
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sequential vs overlapped translate.py stages.")
+    parser.add_argument("srt", type=str)
+    parser.add_argument("--repeat", type=int, default=20, help="Repeat the SRT to make a long file")
+    parser.add_argument("--src_lang", type=str, default="en")
+    parser.add_argument("--tgt_lang", type=str, default="es")
+    parser.add_argument("--threads", type=int, default=None, help="Total torch threads (default: all cores)")
+    parser.add_argument("--overlap-threads", nargs="*", default=[],
+                        help="Process-wide torch thread counts to try (the default third of the budget always runs)")
+    args = parser.parse_args()
+
+    threads = configure_torch_threads(args.threads, default=os.cpu_count())
+    splits = [default_overlap_threads(threads)] + [parse_overlap_threads(s) for s in args.overlap_threads]
+    with tempfile.TemporaryDirectory() as tmp:
+        srt_path = os.path.join(tmp, "long.srt")
+        long_srt(args.srt, args.repeat).save(srt_path, encoding="utf-8")
+
+        sequential = translate_srt(srt_path, args.src_lang, args.tgt_lang, os.path.join(tmp, "sequential"))
+        with open(sequential["json_file"], encoding="utf-8") as f:
+            baseline = json.load(f)["subtitles"]
+        runs = []
+        for split in splits:
+            result = translate_srt(
+                srt_path, args.src_lang, args.tgt_lang, os.path.join(tmp, "overlap"),
+                overlap=True, overlap_threads=split
+            )
+            with open(result["json_file"], encoding="utf-8") as f:
+                subtitles = json.load(f)["subtitles"]
+            runs.append({
+                "overlap_threads": split,
+                "seconds": result["meta"]["inference_seconds"],
+                "overlap": result["meta"]["overlap"],
+                # equivalence with the sequential path
+                "differing_lines": sum(a["translated"] != b["translated"] for a, b in zip(baseline, subtitles)),
+                "max_similarity_delta": max(
+                    (abs(a["back_translation_match"] - b["back_translation_match"])
+                     for a, b in zip(baseline, subtitles)), default=0.0
+                )
+            })
+
+    print(json.dumps({
+        "lines": sequential["meta"]["lines_translated"],
+        "threads": threads,
+        "sequential": {
+            "seconds": sequential["meta"]["inference_seconds"],
+            "stage_seconds": sequential["meta"]["stage_seconds"]
+        },
+        "overlapped": runs
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# bench_parallel.py
+# Lines/sec of translate.py against the number of worker processes
+# (--workers), on an SRT repeated to make a multi-hour file. Every run uses
+# the same total thread budget, split evenly across workers. The translation
+# memory should be off (SUBTITLE_TM_PATH=off) so repeated lines and earlier
+# runs don't skip the work being measured.
+#
+#   SUBTITLE_TM_PATH=off python bench_parallel.py ../en.srt --repeat 50 --workers 1,2,4,8
+import argparse
+import json
+import os
+import tempfile
+from model_registry import configure_torch_threads
+from bench_hybrid_translator import long_srt
+from translate import translate_srt
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark translate.py lines/sec vs worker processes.")
+    parser.add_argument("srt", type=str)
+    parser.add_argument("--repeat", type=int, default=50, help="Repeat the SRT to make a long file")
+    parser.add_argument("--src_lang", type=str, default="en")
+    parser.add_argument("--tgt_lang", type=str, default="es")
+    parser.add_argument("--workers", type=str, default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--threads", type=int, default=None, help="Total torch threads (default: all cores)")
+    parser.add_argument("--fast", action="store_true", help="Skip back-translation")
+    args = parser.parse_args()
+
+    threads = configure_torch_threads(args.threads, default=os.cpu_count())
+    with tempfile.TemporaryDirectory() as tmp:
+        srt_path = os.path.join(tmp, "long.srt")
+        long_srt(args.srt, args.repeat).save(srt_path, encoding="utf-8")
+
+        runs = []
+        baseline = None
+        for workers in [int(w) for w in args.workers.split(",")]:
+            result = translate_srt(
+                srt_path, args.src_lang, args.tgt_lang, os.path.join(tmp, f"out_{workers}"),
+                skip_back_translation=args.fast, workers=workers
+            )
+            meta = result["meta"]
+            with open(result["json_file"], encoding="utf-8") as f:
+                translated = [s["translated"] for s in json.load(f)["subtitles"]]
+            if baseline is None:
+                baseline = translated
+            runs.append({
+                "workers": workers,
+                "threads_per_worker": max(1, threads // workers),
+                "seconds": meta["inference_seconds"],
+                "lines_per_sec": round(meta["lines_translated"] / meta["inference_seconds"], 2)
+                if meta["inference_seconds"] else None,
+                "differing_lines": sum(a != b for a, b in zip(baseline, translated))
+            })
+
+    print(json.dumps({"lines": meta["lines_translated"], "threads": threads, "runs": runs}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
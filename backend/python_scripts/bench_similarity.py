@@ -0,0 +1,71 @@
+# bench_similarity.py
+# Compare the old per-line similarity path (one generate() and two encode()
+# calls per line) with the batched engine in similarity.py on one SRT pair.
+# The translation memory is bypassed so both paths do the full work.
+#
+#   python bench_similarity.py original.srt translated.srt --src_lang en --tgt_lang es
+import argparse
+import json
+import time
+import pysrt
+from sentence_transformers import util
+from model_registry import get_registry, marian_model_name
+from pipeline_artifact import clean_line
+from similarity import SBERT_MODEL_NAME, diagonal_cosine, encode_lines, translate_lines
+
+
+def per_line(orig_lines, trans_lines, src_lang, tgt_lang, sbert_model, max_length=128):
+    tokenizer, model = get_registry().marian(marian_model_name(tgt_lang, src_lang))
+    similarities = []
+    for orig, trans in zip(orig_lines, trans_lines):
+        inputs = tokenizer(trans, return_tensors="pt", padding=True, truncation=True)
+        outputs = model.generate(**inputs, max_length=max_length, num_beams=2)
+        back = tokenizer.decode(outputs[0], skip_special_tokens=True)
+        emb_orig = sbert_model.encode(orig, convert_to_tensor=True)
+        emb_back = sbert_model.encode(back, convert_to_tensor=True)
+        similarities.append(util.cos_sim(emb_orig, emb_back).item())
+    return similarities
+
+
+def batched(orig_lines, trans_lines, src_lang, tgt_lang, sbert_model):
+    back_lines = translate_lines(trans_lines, tgt_lang, src_lang, memory=None)
+    return diagonal_cosine(encode_lines(sbert_model, orig_lines), encode_lines(sbert_model, back_lines)).tolist()
+
+
+def timed(fn, *args):
+    start = time.time()
+    result = fn(*args)
+    return result, time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-line vs batched similarity.")
+    parser.add_argument("original_srt", type=str)
+    parser.add_argument("translated_srt", type=str)
+    parser.add_argument("--src_lang", type=str, default="en")
+    parser.add_argument("--tgt_lang", type=str, default="es")
+    args = parser.parse_args()
+
+    orig_lines = [clean_line(s.text) for s in pysrt.open(args.original_srt)]
+    trans_lines = [clean_line(s.text) for s in pysrt.open(args.translated_srt)]
+    n = min(len(orig_lines), len(trans_lines))
+    orig_lines, trans_lines = orig_lines[:n], trans_lines[:n]
+
+    # Load models up front so neither path pays for it
+    sbert_model = get_registry().sentence_transformer(SBERT_MODEL_NAME)
+    get_registry().marian(marian_model_name(args.tgt_lang, args.src_lang))
+
+    old, old_seconds = timed(per_line, orig_lines, trans_lines, args.src_lang, args.tgt_lang, sbert_model)
+    new, new_seconds = timed(batched, orig_lines, trans_lines, args.src_lang, args.tgt_lang, sbert_model)
+
+    print(json.dumps({
+        "lines": n,
+        "per_line": {"seconds": round(old_seconds, 2), "lines_per_sec": round(n / old_seconds, 2) if old_seconds else None},
+        "batched": {"seconds": round(new_seconds, 2), "lines_per_sec": round(n / new_seconds, 2) if new_seconds else None},
+        "speedup": round(old_seconds / new_seconds, 2) if new_seconds else None,
+        "max_similarity_diff": round(max((abs(a - b) for a, b in zip(old, new)), default=0.0), 4)
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
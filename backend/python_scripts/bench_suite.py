@@ -0,0 +1,383 @@
+# bench_suite.py
+# Reproducible, offline benchmark of the translation and similarity paths:
+#   translate     translate.py's translate_srt (per-stage times from its metadata)
+#   hybrid        HybridSubtitleTranslatorCPUOptimized.translate_subtitles
+#   checker       SRTSimilarityCheckerCPUOptimized.compute_srt_similarity
+#   similarity    similarity.py
+# over backend/en.srt plus generated files (10k lines by default). Models are
+# tiny, randomly initialized Marian/SBERT checkpoints created locally from a
+# fixed seed and corpus (kept under ~/.cache/subtitle_bench_models unless
+# --models says otherwise) and loaded through SUBTITLE_MODEL_DIR, so runs need no network
+# and are comparable across machines only through the stored baseline of the
+# same host. Translation memory and embedding cache are disabled so every
+# run does the full work. Each case runs in a fresh process, which makes its
+# peak RSS (and model load time) its own.
+#
+#   python bench_suite.py ../en.srt --save-baseline bench_baseline.json
+#   python bench_suite.py ../en.srt --baseline bench_baseline.json [--tolerance 0.2]
+#
+# With --baseline, cases whose lines/sec drop or peak RSS grow by more than
+# the tolerance are listed under "regressions" and the exit status is 1.
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+SEED = 0
+SYNTHETIC_LINES = 10000
+CASES = ("translate", "hybrid", "checker", "similarity")
+
+# Every checkpoint the four paths load for en <-> es
+MARIAN_PAIRS = (("en", "es"), ("es", "en"))
+SBERT_MODELS = (
+    "paraphrase-MiniLM-L3-v2",                # translate.py
+    "paraphrase-multilingual-MiniLM-L12-v2",  # translate.py --pipeline, similarity.py
+    "distiluse-base-multilingual-cased-v2"    # my_similarity_checker.py
+)
+TINY_DIM = 32
+TINY_VOCAB = 800
+TINY_MAX_LENGTH = 48
+# Random weights never favour </s>, so every line would decode to the caller's
+# max_length (256); this bias ends lines after ~25 tokens, like real subtitles
+TINY_EOS_BIAS = 0.2
+
+_WORD = re.compile(r"[A-Za-z']+")
+
+
+# -------------------
+# Inputs and models
+# -------------------
+def source_lines(path):
+    import pysrt
+    return [s.text.replace("\n", " ").strip() for s in pysrt.open(path, encoding="utf-8-sig")]
+
+
+def synthetic_srt(path, lines, vocabulary, seed=SEED):
+    """A deterministic SRT of `lines` cues built from vocabulary words, with some sound cues."""
+    import pysrt
+    rng = random.Random(seed)
+    subs = pysrt.SubRipFile()
+    cursor = 1000
+    for i in range(lines):
+        if rng.random() < 0.03:
+            text = f"[{rng.choice(('MUSIC', 'APPLAUSE', 'LAUGHTER', 'DOOR CLOSES'))}]"
+        else:
+            words = [rng.choice(vocabulary) for _ in range(rng.randint(2, 14))]
+            text = " ".join(words).capitalize() + rng.choice((".", ".", "?", "!", ","))
+        duration = int(800 + 250 * len(text.split()) * rng.uniform(0.6, 1.4))
+        subs.append(pysrt.SubRipItem(
+            index=i + 1,
+            start=pysrt.SubRipTime.from_ordinal(cursor),
+            end=pysrt.SubRipTime.from_ordinal(cursor + duration),
+            text=text
+        ))
+        cursor += duration + rng.randint(200, 1500)
+    subs.save(path, encoding="utf-8")
+    return path
+
+
+def _local_dir(model_dir, model_name):
+    return os.path.join(model_dir, model_name.replace("/", "--"))
+
+
+def make_tiny_marian(path, corpus_file, seed=SEED):
+    """Random-weight Marian model with a SentencePiece vocabulary trained on the corpus."""
+    import sentencepiece as spm
+    import torch
+    from transformers import MarianConfig, MarianMTModel, MarianTokenizer
+
+    os.makedirs(path, exist_ok=True)
+    prefix = os.path.join(path, "spm")
+    spm.SentencePieceTrainer.train(
+        input=corpus_file, model_prefix=prefix, vocab_size=TINY_VOCAB, hard_vocab_limit=False,
+        character_coverage=1.0, shuffle_input_sentence=False, minloglevel=2
+    )
+    processor = spm.SentencePieceProcessor(model_file=prefix + ".model")
+    vocab = {processor.id_to_piece(i): i for i in range(processor.get_piece_size())}
+    vocab["<pad>"] = len(vocab)
+    vocab_file = os.path.join(path, "spm_vocab.json")
+    with open(vocab_file, "w", encoding="utf-8") as f:
+        json.dump(vocab, f, ensure_ascii=False)
+
+    tokenizer = MarianTokenizer(source_spm=prefix + ".model", target_spm=prefix + ".model", vocab=vocab_file)
+    config = MarianConfig(
+        vocab_size=len(vocab), d_model=TINY_DIM, encoder_layers=1, decoder_layers=1,
+        encoder_attention_heads=2, decoder_attention_heads=2, encoder_ffn_dim=2 * TINY_DIM,
+        decoder_ffn_dim=2 * TINY_DIM, max_position_embeddings=512, pad_token_id=vocab["<pad>"],
+        eos_token_id=vocab["</s>"], decoder_start_token_id=vocab["<pad>"], forced_eos_token_id=vocab["</s>"],
+        max_length=TINY_MAX_LENGTH
+    )
+    torch.manual_seed(seed)
+    model = MarianMTModel(config)
+    with torch.no_grad():
+        model.final_logits_bias[0, vocab["</s>"]] = TINY_EOS_BIAS
+    model.save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    for name in ("spm.model", "spm.vocab", "spm_vocab.json"):
+        os.remove(os.path.join(path, name))
+
+
+def make_tiny_sbert(path, vocabulary, seed=SEED):
+    """Mean-pooled random word embeddings in the SentenceTransformer format."""
+    import numpy as np
+    from sentence_transformers import SentenceTransformer, models
+    from sentence_transformers.models.tokenizer import WhitespaceTokenizer
+
+    rng = np.random.default_rng(seed)
+    words = sorted(set(w.lower() for w in vocabulary))
+    embeddings = models.WordEmbeddings(
+        tokenizer=WhitespaceTokenizer(words, do_lower_case=True),
+        embedding_weights=rng.standard_normal((len(words), TINY_DIM)).astype(np.float32)
+    )
+    pooling = models.Pooling(TINY_DIM, pooling_mode="mean")
+    SentenceTransformer(modules=[embeddings, pooling], device="cpu").save(path)
+
+
+def ensure_models(model_dir, corpus, seed=SEED):
+    """Create any missing tiny checkpoint under model_dir; returns the names created."""
+    from model_registry import marian_model_name
+    created = []
+    vocabulary = sorted(set(w for line in corpus for w in _WORD.findall(line)))
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", encoding="utf-8", delete=False) as f:
+        f.write("\n".join(corpus))
+        corpus_file = f.name
+    try:
+        for src, tgt in MARIAN_PAIRS:
+            name = marian_model_name(src, tgt)
+            if not os.path.isdir(_local_dir(model_dir, name)):
+                make_tiny_marian(_local_dir(model_dir, name), corpus_file, seed)
+                created.append(name)
+        for name in SBERT_MODELS:
+            if not os.path.isdir(_local_dir(model_dir, name)):
+                make_tiny_sbert(_local_dir(model_dir, name), vocabulary, seed)
+                created.append(name)
+    finally:
+        os.remove(corpus_file)
+    return created
+
+
+# -------------------
+# Cases (each runs in its own spawned process)
+# -------------------
+def _timed(fn, stage, timings):
+    def wrapper(*args, **kwargs):
+        start = time.time()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            timings[stage] = timings.get(stage, 0.0) + time.time() - start
+    return wrapper
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 1024 if sys.platform != "darwin" else peak / (1024 * 1024), 1)
+
+
+def run_case(case, srt_path, translated_srt, out_dir, src_lang, tgt_lang, threads):
+    from model_registry import configure_torch_threads, get_registry
+    configure_torch_threads(threads)
+    registry = get_registry()
+    stages = {}
+    out = {}
+
+    with contextlib.redirect_stdout(sys.stderr):  # the classes print progress messages
+        start = time.time()
+        if case == "translate":
+            from translate import SBERT_MODEL_NAME, translate_srt
+            registry.marian_pair(src_lang, tgt_lang)
+            registry.sentence_transformer(SBERT_MODEL_NAME)
+            load_seconds = time.time() - start
+            start = time.time()
+            result = translate_srt(srt_path, src_lang, tgt_lang, os.path.join(out_dir, "translate"))
+            stages = result["meta"]["stage_seconds"]
+            lines = result["meta"]["lines_translated"]
+            out["srt_file"] = result["srt_file"]
+        elif case == "hybrid":
+            import pysrt
+            from my_translator import HybridSubtitleTranslatorCPUOptimized
+            translator = HybridSubtitleTranslatorCPUOptimized(src_lang=src_lang, tgt_lang=tgt_lang)
+            load_seconds = time.time() - start
+            start = time.time()
+            subs = pysrt.open(srt_path, encoding="utf-8-sig")
+            stages["parse"] = time.time() - start
+            batch_translate = translator.batch_translate
+            forward = _timed(batch_translate, "forward", stages)
+            backward = _timed(batch_translate, "back_translation", stages)
+            translator.batch_translate = lambda texts, model=None, **kw: (
+                backward if model is translator.bt_model else forward
+            )(texts, model=model, **kw)
+            lines = len(translator.translate_subtitles(subs))
+        elif case == "checker":
+            from my_similarity_checker import SRTSimilarityCheckerCPUOptimized
+            checker = SRTSimilarityCheckerCPUOptimized(src_lang=src_lang, tgt_lang=tgt_lang)
+            load_seconds = time.time() - start
+            start = time.time()
+            checker.batch_translate = _timed(checker.batch_translate, "back_translation", stages)
+            checker.encode_in_batches = _timed(checker.encode_in_batches, "embedding", stages)
+            result = checker.compute_srt_similarity(
+                srt_path, translated_srt, out_json=os.path.join(out_dir, "checker.json")
+            )
+            lines = result["summary"]["total_lines"]
+        else:
+            import similarity
+            registry.marian(similarity.marian_model_name(tgt_lang, src_lang))
+            registry.sentence_transformer(similarity.SBERT_MODEL_NAME)
+            load_seconds = time.time() - start
+            start = time.time()
+            similarity.translate_lines = _timed(similarity.translate_lines, "back_translation", stages)
+            similarity.encode_lines = _timed(similarity.encode_lines, "embedding", stages)
+            out_json = os.path.join(out_dir, "similarity.json")
+            sys.argv = ["similarity.py", srt_path, translated_srt, "--src_lang", src_lang,
+                        "--tgt_lang", tgt_lang, "--out_json", out_json]
+            similarity.main()
+            with open(out_json, encoding="utf-8") as f:
+                lines = json.load(f)["summary"]["num_lines"]
+        seconds = time.time() - start
+
+    out.update({
+        "case": case,
+        "lines": lines,
+        "load_seconds": round(load_seconds, 3),
+        "seconds": round(seconds, 3),
+        "lines_per_sec": round(lines / seconds, 2) if seconds else None,
+        "stage_seconds": {stage: round(sec, 3) for stage, sec in stages.items()},
+        "peak_rss_mb": _peak_rss_mb()
+    })
+    return out
+
+
+def run_isolated(*args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(run_case, *args).result()
+
+
+# -------------------
+# Baseline comparison
+# -------------------
+def _case_key(result):
+    return f"{result['input']}:{result['case']}"
+
+
+def compare(results, baseline, tolerance):
+    """Per-case ratios against the baseline, plus the cases outside the tolerance."""
+    previous = {_case_key(r): r for r in baseline["results"]}
+    comparisons, regressions = [], []
+    for result in results:
+        old = previous.get(_case_key(result))
+        if old is None:
+            continue
+        entry = {
+            "key": _case_key(result),
+            "lines_per_sec_ratio": round(result["lines_per_sec"] / old["lines_per_sec"], 3)
+            if result["lines_per_sec"] and old["lines_per_sec"] else None,
+            "peak_rss_ratio": round(result["peak_rss_mb"] / old["peak_rss_mb"], 3) if old["peak_rss_mb"] else None,
+            "stage_ratios": {
+                stage: round(sec / old["stage_seconds"][stage], 3)
+                for stage, sec in result["stage_seconds"].items() if old["stage_seconds"].get(stage)
+            }
+        }
+        comparisons.append(entry)
+        speed, rss = entry["lines_per_sec_ratio"], entry["peak_rss_ratio"]
+        if (speed is not None and speed < 1 - tolerance) or (rss is not None and rss > 1 + tolerance):
+            regressions.append(entry["key"])
+    return comparisons, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of translate/similarity with tiny models.")
+    parser.add_argument("srts", nargs="*", default=[os.path.join(os.path.dirname(__file__), "..", "en.srt")],
+                        help="Real SRT files to include (default: backend/en.srt)")
+    parser.add_argument("--synthetic", type=str, default=str(SYNTHETIC_LINES),
+                        help="Comma-separated line counts of generated SRTs ('' for none)")
+    parser.add_argument("--cases", type=str, default=",".join(CASES))
+    parser.add_argument("--src_lang", type=str, default="en")
+    parser.add_argument("--tgt_lang", type=str, default="es")
+    parser.add_argument("--threads", type=int, default=None, help="Torch threads per case")
+    parser.add_argument("--models", type=str,
+                        default=os.path.join(os.path.expanduser("~"), ".cache", "subtitle_bench_models"),
+                        help="Where the tiny checkpoints are created and reused")
+    parser.add_argument("--baseline", type=str, default=None, help="Compare against this results file")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--save-baseline", type=str, default=None, help="Write the results here")
+    args = parser.parse_args()
+
+    cases = [c for c in args.cases.split(",") if c]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Inherited by the spawned case processes; set before anything reads them at import
+        os.environ["SUBTITLE_MODEL_DIR"] = os.path.abspath(args.models)
+        os.environ["SUBTITLE_TM_PATH"] = "off"
+        os.environ["SUBTITLE_EMBEDDING_CACHE"] = "off"
+        os.environ["SUBTITLE_CONVERTED_DIR"] = os.path.join(tmp, "converted")
+        if args.threads:
+            os.environ["SUBTITLE_TORCH_THREADS"] = str(args.threads)
+
+        inputs = [(os.path.basename(p), os.path.abspath(p)) for p in args.srts]
+        corpus = [line for _, path in inputs for line in source_lines(path)]
+        vocabulary = sorted(set(w for line in corpus for w in _WORD.findall(line))) or ["line"]
+        for count in [int(n) for n in args.synthetic.split(",") if n]:
+            name = f"synthetic_{count}.srt"
+            inputs.append((name, synthetic_srt(os.path.join(tmp, name), count, vocabulary)))
+        created = ensure_models(args.models, corpus or vocabulary)
+
+        results = []
+        for name, path in inputs:
+            out_dir = os.path.join(tmp, os.path.splitext(name)[0])
+            os.makedirs(out_dir)
+            translated_srt = None
+            for case in cases:
+                if case in ("checker", "similarity") and translated_srt is None:
+                    # Needs a translated counterpart; translate.py output is the realistic one
+                    translated_srt = run_isolated(
+                        "translate", path, None, out_dir, args.src_lang, args.tgt_lang, args.threads
+                    )["srt_file"]
+                result = run_isolated(case, path, translated_srt, out_dir, args.src_lang, args.tgt_lang,
+                                      args.threads)
+                if case == "translate":
+                    translated_srt = result["srt_file"]
+                result.pop("srt_file", None)
+                result["input"] = name
+                results.append(result)
+                print(f"{name} {case}: {result['lines_per_sec']} lines/sec", file=sys.stderr)
+
+    import torch
+    output = {
+        "environment": {
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "threads": args.threads,
+            "seed": SEED
+        },
+        "models_created": created,
+        "results": results
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            output["comparison"], regressions = compare(results, json.load(f), args.tolerance)
+        output["regressions"] = regressions
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({k: output[k] for k in ("environment", "results")}, f, indent=2)
+
+    print(json.dumps(output, indent=2))
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
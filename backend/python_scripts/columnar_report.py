@@ -0,0 +1,381 @@
+# columnar_report.py
+# Compact, column-oriented alternative to the indent=2 JSON reports written by
+# translate.py and similarity.py. A report is stored as one compressed .npz:
+#   __header__         JSON header (list key, row count, column kinds, and the
+#                      report's other top-level fields such as "metadata")
+#   <col>              numeric / bool columns as plain arrays
+#   <col>.data/.offsets text columns as one UTF-8 blob plus row offsets
+#   <col>.mask         rows that were None, for numeric / bool / text columns
+# Members are only decompressed when read, so analysis code that needs two
+# columns of a large archive doesn't parse the rest.
+#
+# Convert existing JSON reports (e.g. everything in backend/downloads):
+#   python columnar_report.py ../downloads [--remove-json]
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+import numpy as np
+
+FORMAT = "columnar-report"
+VERSION = 2  # 2: nullable columns with a .mask member
+LIST_KEYS = ("subtitles", "report")  # translate.py, similarity.py
+DTYPES = {"bool": np.bool_, "int": np.int64, "float": np.float64}
+PANDAS_DTYPES = {"bool": "boolean", "int": "Int64", "float": "Float64"}  # nullable, for masked columns
+
+
+def _column_kind(values):
+    """Kind of a column's non-None values ("null" if there are none)."""
+    if not values:
+        return "null"
+    if all(isinstance(v, bool) for v in values):
+        return "bool"
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+        return "int"
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+        return "float"
+    if all(isinstance(v, str) for v in values):
+        return "str"
+    return "json"  # mixed or nested values, stored as JSON text
+
+
+def _common_kind(kinds):
+    """The kind every chunk of a column can be stored as: ints widen to float, anything else mixed is JSON."""
+    kinds = set(kinds) - {"null"}
+    if len(kinds) == 1:
+        return kinds.pop()
+    if kinds == {"int", "float"}:
+        return "float"
+    return "json"
+
+
+def _pack_text(values):
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def as_list(values):
+    """A column from either reader as a list, with None for missing values."""
+    return values.tolist() if isinstance(values, np.ndarray) else list(values)
+
+
+def write_report(path, list_key, records, **fields):
+    """Write records (list of dicts) and top-level fields as a columnar report."""
+    writer = ColumnarReportWriter(path, list_key)
+    writer.add(records)
+    writer.close(**fields)
+    return path
+
+
+class ColumnarReportWriter:
+    """
+    Same add()/close(**fields) interface as srt_stream.JsonReportWriter.
+    Every add() (one window of a streamed job) is flushed to per-column .npy
+    chunks in a temporary directory next to the report, and close() streams
+    the chunks into the archive, so memory is bounded by the largest add().
+    Columns keep an explicit dtype: None values are masked (a <col>.mask
+    member) rather than turning ints into floats; a column whose chunks
+    disagree is widened to float (ints and floats) or stored as JSON.
+    """
+
+    def __init__(self, path, list_key):
+        self.path = path
+        self.list_key = list_key
+        self._tmp = tempfile.mkdtemp(prefix=".columns_", dir=os.path.dirname(os.path.abspath(path)))
+        self._columns = {}  # name -> chunks, in first-seen column order
+        self._count = 0
+        self._chunk_count = 0
+
+    def add(self, entries):
+        if not entries:
+            return
+        for entry in entries:
+            for name in entry:
+                if name not in self._columns:
+                    # Rows written before the column appeared are null
+                    self._columns[name] = [("null", self._count, None, True)] if self._count else []
+        for name, chunks in self._columns.items():
+            chunks.append(self._save_chunk([entry.get(name) for entry in entries]))
+        self._count += len(entries)
+
+    def close(self, **fields):
+        if self._tmp is None:
+            return
+        try:
+            kinds = {}
+            with zipfile.ZipFile(self.path, "w", zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+                for name, chunks in self._columns.items():
+                    kind = kinds[name] = _common_kind(chunk[0] for chunk in chunks)
+                    if kind == "null":
+                        kind = kinds[name] = "json"  # only None values
+                    chunks = [self._convert(chunk, kind) for chunk in chunks]
+                    if kind in DTYPES:
+                        _write_member(archive, name, DTYPES[kind], self._count,
+                                      (np.load(prefix + ".npy") for _, _, prefix, _ in chunks))
+                    else:
+                        size = sum(np.load(prefix + ".data.npy", mmap_mode="r").size for _, _, prefix, _ in chunks)
+                        _write_member(archive, f"{name}.data", np.uint8, size,
+                                      (np.load(prefix + ".data.npy") for _, _, prefix, _ in chunks))
+                        _write_member(archive, f"{name}.offsets", np.int64, self._count + 1,
+                                      _chunk_offsets(prefix for _, _, prefix, _ in chunks))
+                    if any(masked for _, _, _, masked in chunks):
+                        _write_member(archive, f"{name}.mask", np.bool_, self._count, (
+                            np.load(prefix + ".mask.npy") if masked else np.zeros(length, dtype=bool)
+                            for _, length, prefix, masked in chunks
+                        ))
+                header = {
+                    "format": FORMAT,
+                    "version": VERSION,
+                    "list_key": self.list_key,
+                    "length": self._count,
+                    "columns": kinds,
+                    "fields": fields
+                }
+                encoded = json.dumps(header, ensure_ascii=False).encode("utf-8")
+                _write_member(archive, "__header__", np.uint8, len(encoded), [np.frombuffer(encoded, dtype=np.uint8)])
+        finally:
+            shutil.rmtree(self._tmp, ignore_errors=True)
+            self._tmp = None
+
+    def _save_chunk(self, values, kind=None):
+        """Write one chunk of a column; returns (kind, length, file prefix, has nulls)."""
+        present = [v for v in values if v is not None]
+        kind = kind or _column_kind(present)
+        masked = len(present) < len(values) and kind != "json"
+        if kind == "null":
+            return kind, len(values), None, True
+        prefix = os.path.join(self._tmp, str(self._chunk_count))
+        self._chunk_count += 1
+        if kind in DTYPES:
+            fill = DTYPES[kind]()
+            np.save(prefix + ".npy", np.array([fill if v is None else v for v in values], dtype=DTYPES[kind]))
+        else:
+            texts = (["" if v is None else v for v in values] if kind == "str"
+                     else [json.dumps(v, ensure_ascii=False) for v in values])
+            data, offsets = _pack_text(texts)
+            np.save(prefix + ".data.npy", data)
+            np.save(prefix + ".offsets.npy", offsets)
+        if masked:
+            np.save(prefix + ".mask.npy", np.array([v is None for v in values], dtype=bool))
+        return kind, len(values), prefix, masked
+
+    def _convert(self, chunk, kind):
+        """chunk rewritten as kind, if it isn't already."""
+        if chunk[0] == kind:
+            return chunk
+        return self._save_chunk(_chunk_values(chunk), kind)
+
+
+def _chunk_values(chunk):
+    """A chunk's values back as Python objects."""
+    kind, length, prefix, masked = chunk
+    if kind == "null":
+        return [None] * length
+    if kind in DTYPES:
+        values = np.load(prefix + ".npy").tolist()
+    else:
+        data = np.load(prefix + ".data.npy").tobytes()
+        offsets = np.load(prefix + ".offsets.npy").tolist()
+        values = [data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(length)]
+        if kind == "json":
+            values = [json.loads(v) for v in values]
+    if masked:
+        values = [None if m else v for v, m in zip(values, np.load(prefix + ".mask.npy").tolist())]
+    return values
+
+
+def _chunk_offsets(prefixes):
+    """Row offsets of text chunks, shifted to index the concatenated data."""
+    base = 0
+    yield np.zeros(1, dtype=np.int64)
+    for prefix in prefixes:
+        offsets = np.load(prefix + ".offsets.npy")
+        yield offsets[1:] + base
+        base += int(offsets[-1])
+
+
+def _write_member(archive, name, dtype, length, chunks):
+    """Write a 1-d .npy member of length items chunk by chunk, as np.savez would have stored it."""
+    dtype = np.dtype(dtype)
+    with archive.open(name + ".npy", "w", force_zip64=True) as f:
+        np.lib.format.write_array_header_1_0(
+            f, {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": (length,)}
+        )
+        for chunk in chunks:
+            f.write(np.ascontiguousarray(chunk, dtype=dtype).tobytes())
+
+
+class ColumnarReport:
+    """Lazy reader: columns are decompressed on first access."""
+
+    def __init__(self, path):
+        self.path = path
+        self._npz = np.load(path, allow_pickle=False)
+        header = json.loads(self._npz["__header__"].tobytes().decode("utf-8"))
+        if header.get("format") != FORMAT:
+            raise ValueError(f"{path} is not a columnar report")
+        self.list_key = header["list_key"]
+        self.length = header["length"]
+        self.kinds = header["columns"]
+        self.fields = header["fields"]
+        self._cache = {}
+
+    @property
+    def columns(self):
+        return list(self.kinds)
+
+    def column(self, name):
+        """
+        A numpy array for numeric/bool columns (a masked array where the
+        column has None values), a list for text and JSON columns.
+        """
+        if name not in self._cache:
+            kind = self.kinds[name]
+            mask = self._npz[f"{name}.mask"] if f"{name}.mask" in self._npz.files else None
+            if kind in DTYPES:
+                values = self._npz[name]
+                if mask is not None:
+                    values = np.ma.MaskedArray(values, mask=mask)
+            else:
+                data = self._npz[f"{name}.data"].tobytes()
+                offsets = self._npz[f"{name}.offsets"].tolist()
+                values = [data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(self.length)]
+                if kind == "json":
+                    values = [json.loads(v) for v in values]
+                elif mask is not None:
+                    values = [None if m else v for v, m in zip(values, mask.tolist())]
+            self._cache[name] = values
+        return self._cache[name]
+
+    def records(self, columns=None):
+        names = columns or self.columns
+        values = [as_list(self.column(name)) for name in names]
+        for row in zip(*values):
+            yield dict(zip(names, row))
+
+    def to_dict(self):
+        """The report in its original JSON shape."""
+        return {self.list_key: list(self.records()), **self.fields}
+
+    def to_dataframe(self, columns=None):
+        """Masked numeric columns get pandas' nullable dtypes (Int64, ...), so ints with None stay ints."""
+        import pandas as pd
+        names = columns or self.columns
+        data = {}
+        for name in names:
+            values = self.column(name)
+            if isinstance(values, np.ma.MaskedArray):
+                values = pd.array(values.tolist(), dtype=PANDAS_DTYPES[self.kinds[name]])
+            data[name] = values
+        return pd.DataFrame(data, columns=names)
+
+    def close(self):
+        self._npz.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JsonReport:
+    """The ColumnarReport interface over an already-parsed JSON report."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, list):  # very old similarity files were a bare list
+            data = {"report": data}
+        self.list_key = next((k for k in LIST_KEYS if k in data), LIST_KEYS[0])
+        self._records = data.get(self.list_key, [])
+        self.length = len(self._records)
+        self.fields = {k: v for k, v in data.items() if k != self.list_key}
+
+    @property
+    def columns(self):
+        return list(dict.fromkeys(name for r in self._records for name in r))
+
+    def column(self, name):
+        return [r.get(name) for r in self._records]
+
+    def records(self, columns=None):
+        for r in self._records:
+            yield {name: r.get(name) for name in columns} if columns else dict(r)
+
+    def to_dict(self):
+        return {self.list_key: list(self._records), **self.fields}
+
+    def to_dataframe(self, columns=None):
+        import pandas as pd
+        return pd.DataFrame(self._records, columns=columns)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_report(path):
+    """Open a translate/similarity report in either format."""
+    return ColumnarReport(path) if path.endswith(".npz") else JsonReport(path)
+
+
+def convert_json(path, remove_json=False):
+    """Write <name>.npz next to a JSON report; returns the new path."""
+    report = JsonReport(path)
+    out_path = os.path.splitext(path)[0] + ".npz"
+    write_report(out_path, report.list_key, report._records, **report.fields)
+    if remove_json:
+        os.remove(path)
+    return out_path
+
+
+def report_files(paths):
+    """translated_*.json / similarity_*.json files named directly or found in directories."""
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith(".json") and name.startswith(("translated_", "similarity_")):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert JSON reports to the columnar .npz format.")
+    parser.add_argument("paths", nargs="+", help="Report files or directories (e.g. backend/downloads)")
+    parser.add_argument("--remove-json", action="store_true", help="Delete each JSON after converting it")
+    args = parser.parse_args()
+
+    converted = []
+    for path in report_files(args.paths):
+        json_bytes = os.path.getsize(path)
+        out_path = convert_json(path, remove_json=args.remove_json)
+        converted.append({
+            "json": path,
+            "npz": out_path,
+            "json_bytes": json_bytes,
+            "npz_bytes": os.path.getsize(out_path)
+        })
+    total_json = sum(c["json_bytes"] for c in converted)
+    total_npz = sum(c["npz_bytes"] for c in converted)
+    print(json.dumps({
+        "converted": converted,
+        "json_bytes": total_json,
+        "npz_bytes": total_npz,
+        "ratio": round(total_npz / total_json, 3) if total_json else None
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
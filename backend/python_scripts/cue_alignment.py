@@ -0,0 +1,240 @@
+# cue_alignment.py
+# Pairs the cues of an original and a translated SRT by time instead of by
+# position, so a translator splitting or merging one cue doesn't shift every
+# later pair. Both files are swept once, in start order, with two pointers:
+# every cue is linked to the cue of the other file it overlaps most, and
+# linked cues form groups: 1:1, 1:n, n:1, or unmatched when a cue overlaps
+# nothing. Consecutive cues of one file may overlap each other (rolling
+# auto-captions), so groups come from these links rather than from merging
+# overlapping spans.
+#
+# The sweep reads both files in start order with two pointers and keeps,
+# per file, the cues still "open" (not ended) at the sweep position. A cue
+# read from one file overlaps exactly the open cues of the other, so every
+# overlapping pair is scored once, when its later-starting cue is read, and
+# each cue keeps its best partner so far; a cue is settled once the other
+# file has been read past its end. Heaps by end time settle and close cues,
+# and groups merge smaller into larger, so two files with n cues in total
+# and k overlapping cross-file pairs align in O(n log n + k) with no cap on
+# how far cues may drift (k is O(n) for ordinary subtitles, rolling
+# captions and file-long cues alike). Groups are emitted in start order as soon as no unread or
+# unsettled cue can link into them, so only those cues stay buffered: a
+# handful for ordinary files, up to the whole file when one cue spans it.
+import heapq
+from collections import deque
+
+ALIGN_TOLERANCE_MS = 120  # overlaps shorter than this are timing jitter, not a match
+
+_INF = float("inf")
+
+
+def cue_interval(sub):
+    """(start_ms, end_ms) of a pysrt cue."""
+    return sub.start.ordinal, sub.end.ordinal
+
+
+class _Group:
+    __slots__ = ("members", "unresolved", "max_end")
+
+    def __init__(self, cue):
+        self.members = [cue]
+        self.unresolved = 1
+        self.max_end = [-_INF, -_INF]  # latest end per side
+        self.max_end[cue.side] = cue.end
+
+
+class _Cue:
+    __slots__ = ("side", "position", "sub", "start", "end", "min_overlap", "best", "best_key",
+                 "resolved", "emitted", "group")
+
+    def __init__(self, side, position, sub, tolerance_ms):
+        self.side = side
+        self.position = position
+        self.sub = sub
+        self.start, self.end = cue_interval(sub)
+        # Overlaps must beat the tolerance, or a quarter of the cue if it's shorter
+        self.min_overlap = min(tolerance_ms, max(0, self.end - self.start) // 4)
+        self.best = None
+        self.best_key = None
+        self.resolved = False
+        self.emitted = False
+        self.group = _Group(self)
+
+    def consider(self, other):
+        """
+        Keep other as the best partner if it overlaps this cue more, ties
+        going to the closest boundaries, then to the earliest cue.
+        """
+        overlap = min(self.end, other.end) - max(self.start, other.start)
+        if overlap <= self.min_overlap:
+            return
+        key = (overlap, -abs(self.start - other.start) - abs(self.end - other.end), -other.start, -other.position)
+        if self.best_key is None or key > self.best_key:
+            self.best, self.best_key = other, key
+
+
+def group_kind(original_indices, translated_indices):
+    if not original_indices or not translated_indices:
+        return "unmatched"
+    if len(original_indices) == 1:
+        return "1:1" if len(translated_indices) == 1 else "1:n"
+    return "n:1" if len(translated_indices) == 1 else "n:m"
+
+
+class AlignedPairs:
+    """
+    Iterates the aligned groups of two cue streams (pysrt cues in time
+    order, as SRT files store them) as pair dicts with the joined, clean()-ed
+    text of each side, the cues' stream positions and SRT indexes, and the
+    group kind. Cues that overlap nothing in the other stream are collected
+    in .unmatched, and .counts tallies the group kinds, as iteration goes.
+    """
+
+    def __init__(self, original_subs, translated_subs, clean, tolerance_ms=ALIGN_TOLERANCE_MS):
+        self.sources = (iter(original_subs), iter(translated_subs))
+        self.clean = clean
+        self.tolerance_ms = tolerance_ms
+        self.unmatched = {"original": [], "translated": []}
+        self.counts = {"unmatched_original": 0, "unmatched_translated": 0}
+        self._read = [0, 0]
+        self._next = [self._read_cue(0), self._read_cue(1)]
+        self._buffered = (deque(), deque())  # read, not yet emitted, in start order
+        self._unresolved = (deque(), deque())  # in start order; settled ones are dropped from the left
+        self._by_end = ([], [])  # heaps of (end, position, cue) still to settle
+        self._open = ({}, {})  # position -> cue whose end is past the sweep
+        self._open_by_end = ([], [])
+
+    def _read_cue(self, side):
+        sub = next(self.sources[side], None)
+        if sub is None:
+            return None
+        self._read[side] += 1
+        return _Cue(side, self._read[side] - 1, sub, self.tolerance_ms)
+
+    def _frontier(self, side):
+        # No unread cue of side starts before this
+        return self._next[side].start if self._next[side] is not None else _INF
+
+    def _add(self, cue):
+        side, other = cue.side, 1 - cue.side
+        # Open cues of the other file started no later than cue and end after its start
+        open_other, by_end = self._open[other], self._open_by_end[other]
+        while by_end and by_end[0][0] <= cue.start:
+            del open_other[heapq.heappop(by_end)[1]]
+        for candidate in open_other.values():
+            cue.consider(candidate)
+            candidate.consider(cue)
+        self._open[side][cue.position] = cue
+        heapq.heappush(self._open_by_end[side], (cue.end, cue.position))
+        self._buffered[side].append(cue)
+        self._unresolved[side].append(cue)
+        heapq.heappush(self._by_end[side], (cue.end, cue.position, cue))
+
+    def _resolve(self, cue):
+        cue.resolved = True
+        group = cue.group
+        group.unresolved -= 1
+        partner = cue.best
+        if partner is not None and partner.group is not group:
+            merged, absorbed = (group, partner.group) if len(group.members) >= len(partner.group.members) else \
+                (partner.group, group)
+            merged.members.extend(absorbed.members)
+            merged.unresolved += absorbed.unresolved
+            merged.max_end = [max(a, b) for a, b in zip(merged.max_end, absorbed.max_end)]
+            for member in absorbed.members:
+                member.group = merged
+
+    def _resolve_ready(self):
+        # A cue is settled once the other file has been read past its end
+        for side in (0, 1):
+            frontier, by_end = self._frontier(1 - side), self._by_end[side]
+            while by_end and by_end[0][0] <= frontier:
+                self._resolve(heapq.heappop(by_end)[2])
+            unresolved = self._unresolved[side]
+            while unresolved and unresolved[0].resolved:
+                unresolved.popleft()
+
+    def _limits(self):
+        # A cue of side can't gain links once no unresolved or unread cue of
+        # the other side starts before its end
+        return [
+            min(self._unresolved[other][0].start if self._unresolved[other] else _INF, self._frontier(other))
+            for other in (1, 0)
+        ]
+
+    def _oldest(self):
+        for queue in self._buffered:
+            while queue and queue[0].emitted:
+                queue.popleft()
+        heads = [queue[0] for queue in self._buffered if queue]
+        return min(heads, key=lambda c: (c.start, c.side)) if heads else None
+
+    def _emit_ready(self):
+        limits = self._limits()
+        while True:
+            oldest = self._oldest()
+            if oldest is None:
+                return
+            group = oldest.group
+            if group.unresolved or group.max_end[0] > limits[0] or group.max_end[1] > limits[1]:
+                return
+            yield self._pair(group.members)
+
+    def _pair(self, group):
+        for cue in group:
+            cue.emitted = True
+            cue.best = None  # let emitted cues go
+        orig = sorted((c for c in group if c.side == 0), key=lambda c: c.position)
+        trans = sorted((c for c in group if c.side == 1), key=lambda c: c.position)
+        kind = group_kind(orig, trans)
+        if kind == "unmatched":
+            side = "original" if orig else "translated"
+            self.counts[f"unmatched_{side}"] += len(group)
+            self.unmatched[side].extend(
+                {"index": c.sub.index, "start": str(c.sub.start), "end": str(c.sub.end),
+                 "text": self.clean(c.sub.text)}
+                for c in orig or trans
+            )
+            return None
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        return {
+            "original_positions": [c.position for c in orig],
+            "translated_positions": [c.position for c in trans],
+            "original_cues": [c.sub.index for c in orig],
+            "translated_cues": [c.sub.index for c in trans],
+            "original": " ".join(self.clean(c.sub.text) for c in orig),
+            "translated": " ".join(self.clean(c.sub.text) for c in trans),
+            "alignment": kind
+        }
+
+    def __iter__(self):
+        while self._next[0] is not None or self._next[1] is not None:
+            # Two-pointer merge: read whichever file's next cue starts first
+            side = 0 if self._next[1] is None or (
+                self._next[0] is not None and self._next[0].start <= self._next[1].start
+            ) else 1
+            self._add(self._next[side])
+            self._next[side] = self._read_cue(side)
+            self._resolve_ready()
+            for pair in self._emit_ready():
+                if pair is not None:
+                    yield pair
+        self._resolve_ready()
+        for pair in self._emit_ready():
+            if pair is not None:
+                yield pair
+
+
+def aligned_pairs(original_subs, translated_subs, clean, tolerance_ms=ALIGN_TOLERANCE_MS):
+    """AlignedPairs collected into (pairs, unmatched), for callers that want the whole file at once."""
+    stream = AlignedPairs(original_subs, translated_subs, clean, tolerance_ms)
+    return list(stream), stream.unmatched
+
+
+def alignment_counts(pairs, unmatched):
+    counts = {}
+    for pair in pairs:
+        counts[pair["alignment"]] = counts.get(pair["alignment"], 0) + 1
+    counts["unmatched_original"] = len(unmatched["original"])
+    counts["unmatched_translated"] = len(unmatched["translated"])
+    return counts
@@ -0,0 +1,156 @@
+# embedding_cache.py
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import numpy as np
+import torch
+
+# One directory per SentenceTransformer model under this root, each holding a
+# float16 vector file (read through np.memmap) and a SQLite key -> row index
+# per embedding dimension.
+# Set SUBTITLE_EMBEDDING_CACHE=off to disable the cache entirely.
+DEFAULT_CACHE_DIR = os.environ.get(
+    "SUBTITLE_EMBEDDING_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cache", "embeddings")
+)
+
+
+def normalize_text(text):
+    """Cache key text: whitespace-collapsed, otherwise unchanged."""
+    return " ".join(text.split())
+
+
+def make_key(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed float16 store for one model. Vectors are appended to a
+    flat file and only become visible once their rows are committed to the
+    index, so concurrent processes never read a half-written vector.
+    """
+
+    def __init__(self, model_name, dim, root=DEFAULT_CACHE_DIR):
+        self.model_name = model_name
+        self.dim = dim
+        self.dir = os.path.abspath(os.path.join(root, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)))
+        os.makedirs(self.dir, exist_ok=True)
+        self.vectors_path = os.path.join(self.dir, f"vectors_{dim}.f16")
+        open(self.vectors_path, "ab").close()
+        self._lock = threading.Lock()
+        self._map = None
+        self._map_rows = 0
+        # Autocommit mode; store() manages its own write transaction
+        self._conn = sqlite3.connect(
+            os.path.join(self.dir, f"index_{dim}.sqlite"), timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS rows (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+
+    def _vectors(self, rows_needed):
+        """Memory map covering at least rows_needed rows (remapped as the file grows)."""
+        if self._map is None or self._map_rows < rows_needed:
+            rows = os.path.getsize(self.vectors_path) // (2 * self.dim)
+            self._map = np.memmap(self.vectors_path, dtype=np.float16, mode="r", shape=(rows, self.dim))
+            self._map_rows = rows
+        return self._map
+
+    def _rows(self, keys):
+        found = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i+500]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(self._conn.execute(
+                f"SELECT key, row FROM rows WHERE key IN ({placeholders})", chunk
+            ).fetchall())
+        return found
+
+    def lookup(self, texts):
+        """Return {normalized text: float16 vector} for the texts already cached."""
+        keys = {make_key(t): normalize_text(t) for t in texts}
+        with self._lock:
+            rows = self._rows(list(keys))
+            if not rows:
+                return {}
+            vectors = self._vectors(max(rows.values()) + 1)
+            return {keys[key]: np.array(vectors[row]) for key, row in rows.items()}
+
+    def store(self, texts, vectors):
+        """Append vectors for texts not cached yet (by this or another process)."""
+        vectors = np.asarray(vectors, dtype=np.float16).reshape(-1, self.dim)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")  # serializes writers across processes
+            try:
+                existing = self._rows([make_key(t) for t in texts])
+                new = {}
+                for text, vector in zip(texts, vectors):
+                    key = make_key(text)
+                    if key not in existing and key not in new:
+                        new[key] = vector
+                if new:
+                    start = self._conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM rows").fetchone()[0]
+                    with open(self.vectors_path, "r+b") as f:
+                        f.seek(start * self.dim * 2)
+                        f.write(np.stack(list(new.values())).tobytes())
+                    self._conn.executemany(
+                        "INSERT INTO rows VALUES (?, ?)", [(key, start + i) for i, key in enumerate(new)]
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model_name, dim):
+    """Shared cache for this process and model, or None when disabled."""
+    if DEFAULT_CACHE_DIR.lower() == "off":
+        return None
+    with _caches_lock:
+        if (model_name, dim) not in _caches:
+            _caches[(model_name, dim)] = EmbeddingCache(model_name, dim, DEFAULT_CACHE_DIR)
+        return _caches[(model_name, dim)]
+
+
+def cached_encode(sbert_model, model_name, texts, stats=None, encode=None, hit_lines=None):
+    """
+    Embeddings of texts as a float32 tensor in input order. Only unique
+    normalized texts missing from the cache are encoded (with encode(batch),
+    default sbert_model.encode) and then stored. Fresh vectors are rounded
+    through float16 like cached ones, so results don't depend on cache state.
+    stats, if given, gets per-line "hits"/"misses" added; hit_lines, if
+    given, is a list that gets the positions of the texts found in the cache.
+    """
+    dim = sbert_model.get_sentence_embedding_dimension()
+    if not texts:
+        return torch.empty((0, dim))
+    if encode is None:
+        def encode(batch):
+            return sbert_model.encode(batch, convert_to_numpy=True, show_progress_bar=False)
+
+    cache = get_embedding_cache(model_name, dim)
+    normalized = [normalize_text(t) for t in texts]
+    known = cache.lookup(normalized) if cache is not None else {}
+    hits = sum(1 for t in normalized if t in known)
+    if hit_lines is not None:
+        hit_lines.extend(i for i, t in enumerate(normalized) if t in known)
+    missing = list(dict.fromkeys(t for t in normalized if t not in known))
+    if missing:
+        fresh = encode(missing)
+        if isinstance(fresh, torch.Tensor):
+            fresh = fresh.float().cpu().numpy()
+        fresh = np.asarray(fresh, dtype=np.float16)
+        if cache is not None:
+            cache.store(missing, fresh)
+        known.update(zip(missing, fresh))
+
+    if stats is not None:
+        stats["hits"] = stats.get("hits", 0) + hits
+        stats["misses"] = stats.get("misses", 0) + len(texts) - hits
+    return torch.from_numpy(np.stack([known[t] for t in normalized]).astype(np.float32))
@@ -0,0 +1,100 @@
+# inference_backend.py
+import os
+import torch
+from transformers import MarianMTModel, MarianTokenizer
+
+try:
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+except ImportError:  # optional; only needed for the "onnx" backend
+    ORTModelForSeq2SeqLM = None
+
+# torch: fp32 PyTorch (default)
+# int8:  PyTorch with dynamically int8-quantized Linear layers
+# onnx:  exported ONNX graph run by onnxruntime (needs optimum[onnxruntime])
+BACKENDS = ("torch", "int8", "onnx")
+DEFAULT_BACKEND = os.environ.get("SUBTITLE_INFERENCE_BACKEND", "torch")
+
+# Converted models are cached here so conversion only happens once per model
+CONVERTED_DIR = os.environ.get(
+    "SUBTITLE_CONVERTED_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cache", "converted_models")
+)
+
+
+# Directory of local checkpoints named like the hub ids with "/" -> "--"
+# (e.g. Helsinki-NLP--opus-mt-en-es); a model found there is loaded from it
+# instead of the hub. bench_suite.py points this at tiny offline models.
+LOCAL_MODEL_DIR = os.environ.get("SUBTITLE_MODEL_DIR")
+
+
+def model_path(model_name):
+    """Local checkpoint directory for model_name if LOCAL_MODEL_DIR has one, else model_name."""
+    if LOCAL_MODEL_DIR:
+        path = os.path.join(os.path.abspath(LOCAL_MODEL_DIR), model_name.replace("/", "--"))
+        if os.path.isdir(path):
+            return path
+    return model_name
+
+
+def converted_path(model_name, backend):
+    return os.path.join(os.path.abspath(CONVERTED_DIR), backend, model_name.replace("/", "--"))
+
+
+def memory_key(model_name, backend):
+    """Name used for translation-memory keys so backends never share entries."""
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+
+def _load_int8(model_name, device):
+    path = converted_path(model_name, "int8")
+    weights = os.path.join(path, "model.pt")
+    if os.path.exists(weights):
+        model = torch.load(weights, map_location=device, weights_only=False)
+    else:
+        model = MarianMTModel.from_pretrained(model_path(model_name))
+        model.eval()
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        os.makedirs(path, exist_ok=True)
+        torch.save(model, weights)
+    model.eval()
+    return model, os.path.getsize(weights)
+
+
+def _load_onnx(model_name):
+    if ORTModelForSeq2SeqLM is None:
+        raise RuntimeError("The onnx backend needs `pip install optimum[onnxruntime]`")
+    path = converted_path(model_name, "onnx")
+    if os.path.isdir(path) and any(f.endswith(".onnx") for f in os.listdir(path)):
+        model = ORTModelForSeq2SeqLM.from_pretrained(path)
+    else:
+        model = ORTModelForSeq2SeqLM.from_pretrained(model_path(model_name), export=True)
+        os.makedirs(path, exist_ok=True)
+        model.save_pretrained(path)
+    return model, _dir_size(path)
+
+
+def load_marian(model_name, backend=DEFAULT_BACKEND, device="cpu"):
+    """
+    Load (tokenizer, model, size_bytes) for a Marian checkpoint on the given
+    backend. Every backend exposes the same generate() interface.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKENDS}")
+
+    tokenizer = MarianTokenizer.from_pretrained(model_path(model_name))
+    if backend == "int8":
+        model, size = _load_int8(model_name, device)
+    elif backend == "onnx":
+        model, size = _load_onnx(model_name)
+    else:
+        model = MarianMTModel.from_pretrained(model_path(model_name)).to(device)
+        model.eval()
+        size = None  # measured from parameters by the caller
+    return tokenizer, model, size
@@ -1,25 +1,135 @@
 # manual_correction.py
-import sys, json
-import pysrt
+#
+#   python manual_correction.py <translated_srt> <corrections_json> [out_srt]
+#   python manual_correction.py <translated_srt> <corrections_json> [out_srt] --report <report_json|report_npz>
+#
+# With --report (a translate.py report, JSON or columnar .npz), only the corrected cues get a
+# fresh back-translation, embedding similarity and reading speed; the report
+# and its summary metadata are patched in place, and the SRT is patched in
+# place unless out_srt is given. A corrected cue's confidence (the forward
+# model's score of its own translation) no longer applies and becomes null;
+# avg_confidence averages the remaining model-scored cues.
+import argparse
+import json
 import os
+import time
+import pysrt
+from columnar_report import open_report, write_report
 
-if __name__ == "__main__":
-    translations_path = sys.argv[1]
-    corrections_path = sys.argv[2]
-    out_srt_path = sys.argv[3] if len(sys.argv) > 3 else translations_path.replace(".srt", "_corrected.srt")
-
-    subs = pysrt.open(translations_path)
+def load_corrections(corrections_path, num_subs):
+    """{position: corrected text} for valid entries; later entries win."""
     with open(corrections_path, "r", encoding="utf-8") as f:
         corrections = json.load(f)
 
+    changed = {}
     for c in corrections:
         idx = c.get("index", None)
         new_text = c.get("corrected_translation", None)
         if idx is None or new_text is None:
             continue
         i = idx - 1
-        if 0 <= i < len(subs):
-            subs[i].text = new_text
+        if 0 <= i < num_subs:
+            changed[i] = new_text
+    return changed
+
+def rescore_report(report, changed):
+    """Recompute per-cue quality data for the changed positions and refresh the summary."""
+    # Model code is imported lazily so plain corrections don't pay for it
+    import torch
+    from inference_backend import DEFAULT_BACKEND, memory_key
+    from model_registry import get_registry, marian_model_name
+    from translate import SBERT_MODEL_NAME, compute_cps, encode_texts, time_to_seconds, translate_text
+
+    meta = report["metadata"]
+    subtitles = report["subtitles"]
+    src_lang, tgt_lang = meta["src_lang"], meta["tgt_lang"]
+    backend = meta.get("backend", DEFAULT_BACKEND)
+    positions = sorted(i for i in changed if i < len(subtitles))
+    start_time = time.time()
+
+    registry = get_registry()
+    bt_model_name = marian_model_name(tgt_lang, src_lang)
+    bt_tokenizer, bt_model = registry.marian(bt_model_name, backend)
+    sbert_name = meta.get("sbert_model") or SBERT_MODEL_NAME
+    sbert_model = registry.sentence_transformer(sbert_name)
+
+    originals = [subtitles[i]["original"] for i in positions]
+    translations = [changed[i].replace("\n", " ").strip() for i in positions]
+    bt_texts = translate_text(translations, bt_model, bt_tokenizer, memory_key(bt_model_name, backend))
+    if positions:
+        # Through the embedding cache, like translate.py: the originals are usually already in it
+        orig_emb = encode_texts(sbert_model, originals, sbert_name)
+        bt_emb = encode_texts(sbert_model, bt_texts, sbert_name)
+        similarities = torch.nn.functional.cosine_similarity(orig_emb, bt_emb, dim=1).tolist()
+    else:
+        similarities = []
+
+    for i, translated, bt_match in zip(positions, translations, similarities):
+        entry = subtitles[i]
+        start_sec = time_to_seconds(pysrt.SubRipTime.from_string(entry["start"]))
+        end_sec = time_to_seconds(pysrt.SubRipTime.from_string(entry["end"]))
+        entry["translated"] = translated
+        entry["reading_speed_cps"] = round(compute_cps(translated, start_sec, end_sec), 2)
+        entry["back_translation_match"] = round(bt_match, 3)
+        entry["novelty"] = bt_match < 0.95
+        entry["confidence"] = None  # scored the model's translation, not this one
+        entry["manually_corrected"] = True
+
+    # Summary aggregates come from the stored per-cue numbers, no model work
+    count = max(1, len(subtitles))
+    meta["avg_cps"] = round(sum(s["reading_speed_cps"] for s in subtitles) / count, 2)
+    # Triaged reports leave unchecked lines at None
+    checked = [s["back_translation_match"] for s in subtitles if s.get("back_translation_match") is not None]
+    meta["avg_bt_match"] = round(sum(checked) / len(checked), 3) if checked else None
+    scored = [s["confidence"] for s in subtitles if s.get("confidence") is not None]
+    meta["avg_confidence"] = round(sum(scored) / len(scored), 3) if scored else None
+    meta["high_speed_count"] = sum(1 for s in subtitles if s["reading_speed_cps"] >= 20)
+    meta["corrected_lines"] = sorted(set(meta.get("corrected_lines", [])) | {subtitles[i]["index"] for i in positions})
+    meta["last_correction_seconds"] = round(time.time() - start_time, 2)
+    return positions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply manual corrections to a translated SRT.")
+    parser.add_argument("translations_path", type=str, help="Translated SRT file")
+    parser.add_argument("corrections_path", type=str, help="JSON list of {index, corrected_translation}")
+    parser.add_argument("out_srt_path", type=str, nargs="?", default=None, help="Output SRT path")
+    parser.add_argument("--report", type=str, default=None,
+                        help="translate.py report (.json or .npz) to update incrementally (patched in place)")
+    args = parser.parse_args(argv)
+
+    translations_path = args.translations_path
+    if args.out_srt_path:
+        out_srt_path = args.out_srt_path
+    elif args.report:
+        out_srt_path = translations_path
+    else:
+        out_srt_path = translations_path.replace(".srt", "_corrected.srt")
+
+    subs = pysrt.open(translations_path)
+    changed = load_corrections(args.corrections_path, len(subs))
+    for i, new_text in changed.items():
+        subs[i].text = new_text
 
     subs.save(out_srt_path, encoding="utf-8")
-    print(json.dumps({"corrected_srt": os.path.basename(out_srt_path)}))
+    output = {"corrected_srt": os.path.basename(out_srt_path)}
+
+    if args.report:
+        with open_report(args.report) as stored:
+            report = stored.to_dict()
+        positions = rescore_report(report, changed)
+        if args.report.endswith(".npz"):
+            fields = {k: v for k, v in report.items() if k != "subtitles"}
+            write_report(args.report, "subtitles", report["subtitles"], **fields)
+        else:
+            with open(args.report, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+        output["report"] = os.path.basename(args.report)
+        output["rescored_lines"] = len(positions)
+        output["summary"] = {
+            k: report["metadata"][k] for k in ("avg_cps", "avg_bt_match", "avg_confidence", "high_speed_count")
+        }
+
+    print(json.dumps(output))
+
+if __name__ == "__main__":
+    main()
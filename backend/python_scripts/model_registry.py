@@ -0,0 +1,215 @@
+# model_registry.py
+import functools
+import gc
+import os
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+import torch
+from sentence_transformers import SentenceTransformer
+from inference_backend import DEFAULT_BACKEND, load_marian, model_path
+
+try:
+    import psutil
+except ImportError:  # optional; falls back to /proc or model sizes
+    psutil = None
+
+# Budget for resident models, in MB of model weights (parameters and
+# buffers, or the quantized/ONNX size the backend reports). Override with
+# SUBTITLE_MODEL_BUDGET_MB when serving many language pairs.
+DEFAULT_BUDGET_MB = int(os.environ.get("SUBTITLE_MODEL_BUDGET_MB", "4096"))
+
+
+def marian_model_name(src_lang, tgt_lang):
+    return f"Helsinki-NLP/opus-mt-{src_lang}-{tgt_lang}"
+
+
+def configure_torch_threads(threads=None, default=None):
+    """
+    Size torch's intra-op thread pool. An explicit value wins, then the
+    SUBTITLE_TORCH_THREADS env var (set per worker by the job queue), then
+    default; with none of them the pool is left as torch sized it.
+    """
+    threads = threads or int(os.environ.get("SUBTITLE_TORCH_THREADS", "0") or 0) or default
+    if threads:
+        torch.set_num_threads(int(threads))
+    return torch.get_num_threads()
+
+
+def process_rss_bytes():
+    """Current resident set size of this process, or None if unavailable."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def model_size_bytes(model):
+    """Approximate memory held by a torch module's parameters and buffers."""
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+class ModelRegistry:
+    """
+    Process-wide LRU cache of MarianMT and SentenceTransformer models.
+    When the summed model sizes exceed budget_mb after a load, least-recently
+    used models are dropped until they fit again. RSS is only reported: it
+    rarely shrinks after a model is freed, so it can't tell when to stop.
+
+    Models in use are never dropped: acquire(key)/release(key) mark one
+    explicitly, and inside session() every model the thread fetches stays in
+    use until the block exits (a job runs in one session, see using_models).
+    A load that finds only in-use models over budget leaves the registry
+    over budget until they are released.
+    """
+
+    def __init__(self, budget_mb=DEFAULT_BUDGET_MB, device="cpu"):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.device = device
+        self._models = OrderedDict()  # key -> (value, size_bytes)
+        self._users = Counter()  # key -> acquire() calls not yet released
+        self._sessions = threading.local()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # -------------------
+    # Public loaders
+    # -------------------
+    def marian(self, model_name, backend=DEFAULT_BACKEND):
+        """Return (tokenizer, model) for a MarianMT checkpoint on an inference backend."""
+        def load():
+            tokenizer, model, size = load_marian(model_name, backend, self.device)
+            return (tokenizer, model), size if size is not None else model_size_bytes(model)
+        return self.get(("marian", model_name, backend), load)
+
+    def marian_pair(self, src_lang, tgt_lang, back=True, backend=DEFAULT_BACKEND):
+        """Return ((tok, model), (bt_tok, bt_model) or None) for a language pair."""
+        forward = self.marian(marian_model_name(src_lang, tgt_lang), backend)
+        backward = self.marian(marian_model_name(tgt_lang, src_lang), backend) if back else None
+        return forward, backward
+
+    def sentence_transformer(self, model_name):
+        def load():
+            model = SentenceTransformer(model_path(model_name), device=self.device)
+            return model, model_size_bytes(model)
+        return self.get(("sbert", model_name, None), load)
+
+    def stats(self):
+        with self._lock:
+            rss = process_rss_bytes()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "resident": [
+                    f"{name}@{backend}" if backend not in (None, "torch") else name
+                    for (_, name, backend) in self._models
+                ],
+                "in_use": sum(1 for key in self._models if self._users[key]),
+                "resident_mb": round(self._resident_bytes() / (1024 * 1024), 1),
+                "rss_mb": round(rss / (1024 * 1024), 1) if rss is not None else None,
+                "budget_mb": round(self.budget_bytes / (1024 * 1024), 1)
+            }
+
+    def get(self, key, loader):
+        """
+        Cached value for key, loading it with loader() -> (value, size_bytes)
+        on a miss. Inside a session() the model is in use until it exits.
+        """
+        with self._lock:
+            if key in self._models:
+                self.hits += 1
+                self._models.move_to_end(key)
+            else:
+                self.misses += 1
+                self._models[key] = loader()
+                self._evict(keep=key)
+            session = self._session()
+            if session is not None and key not in session:
+                session.add(key)
+                self._users[key] += 1
+            return self._models[key][0]
+
+    # -------------------
+    # In-use tracking
+    # -------------------
+    def acquire(self, key):
+        """Mark a resident model as in use until the matching release()."""
+        with self._lock:
+            if key not in self._models:
+                raise KeyError(key)
+            self._users[key] += 1
+
+    def release(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._users[key] -= 1
+                if self._users[key] <= 0:
+                    del self._users[key]
+            self._evict()
+
+    @contextmanager
+    def session(self):
+        """Models this thread fetches inside the block stay in use until it exits (sessions nest)."""
+        stack = self._sessions.__dict__.setdefault("stack", [])
+        stack.append(set())
+        try:
+            yield self
+        finally:
+            self.release(*stack.pop())
+
+    def in_use(self, key):
+        with self._lock:
+            return self._users[key] > 0
+
+    # -------------------
+    # Internals
+    # -------------------
+    def _session(self):
+        stack = getattr(self._sessions, "stack", None)
+        return stack[-1] if stack else None
+
+    def _resident_bytes(self):
+        return sum(size for _, size in self._models.values())
+
+    def _evict(self, keep=None):
+        used = self._resident_bytes()
+        evicted = False
+        for key in list(self._models):  # least recently used first
+            if used <= self.budget_bytes:
+                break
+            if key == keep or self._users[key]:
+                continue
+            used -= self._models.pop(key)[1]
+            self.evictions += 1
+            evicted = True
+        if evicted:
+            gc.collect()
+
+
+_registry = None
+
+
+def get_registry():
+    """Shared registry for this process."""
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry()
+    return _registry
+
+
+def using_models(func):
+    """Decorator: run func in a session() of the shared registry, so its models stay loaded while it runs."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with get_registry().session():
+            return func(*args, **kwargs)
+    return wrapper
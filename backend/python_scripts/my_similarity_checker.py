@@ -1,12 +1,14 @@
 # my_similarity_checker.py
-import pysrt
-import json
 import torch
-from transformers import MarianMTModel, MarianTokenizer
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import util
 from tqdm import tqdm
-import time
 import re
+from cue_alignment import AlignedPairs
+from embedding_cache import cached_encode
+from inference_backend import DEFAULT_BACKEND, memory_key
+from model_registry import configure_torch_threads, get_registry, marian_model_name
+from srt_stream import DEFAULT_WINDOW, JsonReportWriter, iter_srt, windows
+from translation_memory import cached_generate, get_translation_memory, hit_rate
 
 class SRTSimilarityCheckerCPUOptimized:
     def __init__(self, src_lang="es", tgt_lang="en", batch_size=128, back_translate=True):
@@ -15,7 +17,7 @@ class SRTSimilarityCheckerCPUOptimized:
         tgt_lang: target language (usually 'en')
         """
         self.device = "cpu"
-        torch.set_num_threads(max(4, torch.get_num_threads()))
+        configure_torch_threads(default=max(4, torch.get_num_threads()))
         print(f"Using {torch.get_num_threads()} CPU threads")
 
         self.src_lang = src_lang
@@ -23,16 +25,17 @@ class SRTSimilarityCheckerCPUOptimized:
         self.batch_size = batch_size
         self.back_translate = back_translate
 
+        registry = get_registry()
+
         # Load MarianMT for back-translation
-        self.model_name = f"Helsinki-NLP/opus-mt-{self.tgt_lang}-{self.src_lang}"
+        self.model_name = marian_model_name(self.tgt_lang, self.src_lang)
         print(f"Loading MarianMT model {self.model_name} on CPU")
-        self.tokenizer = MarianTokenizer.from_pretrained(self.model_name)
-        self.model = MarianMTModel.from_pretrained(self.model_name)
-        self.model.eval()
+        self.tokenizer, self.model = registry.marian(self.model_name)
 
         # Load better cross-lingual similarity model
-        print("Loading SentenceTransformer (distiluse-base-multilingual-cased-v2) on CPU")
-        self.sim_model = SentenceTransformer("distiluse-base-multilingual-cased-v2", device="cpu")
+        self.sim_model_name = "distiluse-base-multilingual-cased-v2"
+        print(f"Loading SentenceTransformer ({self.sim_model_name}) on CPU")
+        self.sim_model = registry.sentence_transformer(self.sim_model_name)
 
     @staticmethod
     def normalize_text(text):
@@ -41,52 +44,41 @@ class SRTSimilarityCheckerCPUOptimized:
         text = re.sub(r"\s+", " ", text).strip()
         return text
 
+    @staticmethod
+    def keep_line(text, min_len=2):
+        """False for very short lines or stage directions like [Music], [Applause]"""
+        text = text.strip()
+        return bool(text) and not text.startswith("[") and len(text.split()) >= min_len
+
     @staticmethod
     def preprocess_srt_lines(subs, min_len=2):
         """
         Filter out very short lines or stage directions like [Music], [Applause]
         """
-        cleaned = []
-        for sub in subs:
-            text = sub.text.strip()
-            if not text or text.startswith("[") or len(text.split()) < min_len:
-                continue
-            cleaned.append(text)
-        return cleaned
+        return [sub.text.strip() for sub in subs if SRTSimilarityCheckerCPUOptimized.keep_line(sub.text, min_len)]
 
     def batch_translate(self, texts, max_length=128):
-        translations = []
-        translation_cache = {}
-
-        for i in tqdm(range(0, len(texts), self.batch_size), desc="Back-translating"):
-            batch = [t for t in texts[i:i+self.batch_size] if t]
-            if not batch:
-                continue
-
-            uncached = [t for t in batch if t not in translation_cache]
-            if uncached:
-                inputs = self.tokenizer(
-                    uncached, return_tensors="pt", padding=True,
-                    truncation=True, max_length=max_length
-                )
-                with torch.inference_mode():
-                    outputs = self.model.generate(**inputs, max_length=max_length, num_beams=2)
-                decoded = self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
-                for o, d in zip(uncached, decoded):
-                    translation_cache[o] = d
-
-            translations += [translation_cache.get(t, "") for t in batch]
-            time.sleep(0.05)
+        # Persistent translation memory shared across calls and processes
+        self.tm_stats = {"hits": 0, "misses": 0}
+        texts = [t for t in texts if t]
+        translations = cached_generate(
+            texts, memory_key(self.model_name, DEFAULT_BACKEND), self.model, self.tokenizer,
+            memory=get_translation_memory(), stats=self.tm_stats,
+            max_batch_size=self.batch_size, max_length=max_length, num_beams=2
+        )
+        self.tm_stats["hit_rate"] = hit_rate(self.tm_stats)
         return translations
 
-    def encode_in_batches(self, texts):
+    def encode_in_batches(self, texts, stats=None):
+        # Embedding cache keyed by model + normalized text; only new lines are encoded
         embeddings = []
         for i in tqdm(range(0, len(texts), self.batch_size), desc="Encoding embeddings"):
             batch = [self.normalize_text(t) for t in texts[i:i+self.batch_size] if t]
             if not batch:
                 continue
-            emb = self.sim_model.encode(
-                batch, convert_to_tensor=True, show_progress_bar=False, batch_size=32
+            emb = cached_encode(
+                self.sim_model, self.sim_model_name, batch, stats=stats,
+                encode=lambda b: self.sim_model.encode(b, convert_to_numpy=True, show_progress_bar=False, batch_size=32)
             )
             embeddings.append(emb)
         if embeddings:
@@ -94,59 +86,112 @@ class SRTSimilarityCheckerCPUOptimized:
         else:
             return torch.empty((0, self.sim_model.get_sentence_embedding_dimension()))
 
-    def compute_srt_similarity(self, original_srt_path, translated_srt_path, threshold=0.7):
-        original_subs = pysrt.open(original_srt_path)
-        translated_subs = pysrt.open(translated_srt_path)
-
-        orig_texts = self.preprocess_srt_lines(original_subs)
-        trans_texts = self.preprocess_srt_lines(translated_subs)
-
-        n = min(len(orig_texts), len(trans_texts))
-        orig_texts = orig_texts[:n]
-        trans_texts = trans_texts[:n]
-
-        # Back-translate if enabled
-        back_texts = self.batch_translate(trans_texts) if self.back_translate else trans_texts
-
-        # Encode embeddings
-        orig_emb = self.encode_in_batches(orig_texts)
-        back_emb = self.encode_in_batches(back_texts)
-
-        if orig_emb.shape[0] == 0 or back_emb.shape[0] == 0:
-            similarities = torch.zeros(n)
+    def compute_srt_similarity(self, original_srt_path, translated_srt_path, threshold=0.7,
+                               window=DEFAULT_WINDOW, out_json=None, align=False):
+        """
+        The filtered cues of both SRTs are streamed and paired by position
+        (align=True aligns them by timestamps instead) and compared `window`
+        pairs at a time, so the back-translation and embedding tensors never
+        cover the whole file. With out_json the report is also written there
+        as windows finish and left out of the returned dict, keeping memory
+        flat on very long files. With align, cues that overlap nothing in the
+        other file are listed under "unmatched".
+        """
+        if align:
+            # Split or merged cues are compared as one group (cue_alignment.py)
+            aligned = AlignedPairs(
+                (sub for sub in iter_srt(original_srt_path) if self.keep_line(sub.text)),
+                (sub for sub in iter_srt(translated_srt_path) if self.keep_line(sub.text)),
+                str.strip
+            )
+            pairs = ((group["original"], group["translated"], group) for group in aligned)
         else:
-            similarities = util.cos_sim(orig_emb, back_emb).diagonal()
-
-        # Build report
+            # Filtered lines are paired by position; zip stops at the shorter file
+            aligned = None
+            pairs = (
+                (orig, trans, None) for orig, trans in zip(
+                    self.preprocess_srt_lines(iter_srt(original_srt_path)),
+                    self.preprocess_srt_lines(iter_srt(translated_srt_path))
+                )
+            )
+        report_writer = JsonReportWriter(out_json, "report") if out_json else None
         report = []
-        low_accuracy_lines = []
-        for i in range(n):
-            sim_score = similarities[i].item() if i < len(similarities) else 0.0
-            entry = {
-                "index": i + 1,
-                "original": orig_texts[i],
-                "translated": trans_texts[i],
-                "back_translated": back_texts[i] if i < len(back_texts) else "",
-                "similarity": sim_score
-            }
-            report.append(entry)
-            if sim_score < threshold:
-                low_accuracy_lines.append(entry)
-
-        overall_similarity = similarities.mean().item() if n > 0 else 0
+        tm_stats = {"hits": 0, "misses": 0}
+        emb_stats = {"hits": 0, "misses": 0}
+        n = 0
+        below_threshold = 0
+        similarity_sum = 0.0
+
+        for pair_window in windows(pairs, window):
+            orig_texts = [orig for orig, _, _ in pair_window]
+            trans_texts = [trans for _, trans, _ in pair_window]
+
+            # Back-translate if enabled
+            back_texts = self.batch_translate(trans_texts) if self.back_translate else trans_texts
+            if self.back_translate:
+                tm_stats["hits"] += self.tm_stats["hits"]
+                tm_stats["misses"] += self.tm_stats["misses"]
+
+            # Encode embeddings
+            orig_emb = self.encode_in_batches(orig_texts, emb_stats)
+            back_emb = self.encode_in_batches(back_texts, emb_stats)
+
+            if orig_emb.shape[0] == 0 or back_emb.shape[0] == 0:
+                similarities = torch.zeros(len(pair_window))
+            else:
+                similarities = util.cos_sim(orig_emb, back_emb).diagonal()
+
+            # Build report
+            entries = []
+            for i in range(len(pair_window)):
+                sim_score = similarities[i].item() if i < len(similarities) else 0.0
+                entry = {
+                    "index": n + i + 1,
+                    "original": orig_texts[i],
+                    "translated": trans_texts[i],
+                    "back_translated": back_texts[i] if i < len(back_texts) else "",
+                    "similarity": sim_score
+                }
+                group = pair_window[i][2]
+                if group is not None:
+                    entry["original_cues"] = group["original_cues"]
+                    entry["translated_cues"] = group["translated_cues"]
+                    entry["alignment"] = group["alignment"]
+                entries.append(entry)
+                if sim_score < threshold:
+                    below_threshold += 1
+            similarity_sum += sum(similarities.tolist())
+            n += len(pair_window)
+            if report_writer is not None:
+                report_writer.add(entries)
+            else:
+                report.extend(entries)
+
+        overall_similarity = similarity_sum / n if n > 0 else 0
         summary = {
             "total_lines": n,
-            "below_threshold": len(low_accuracy_lines),
+            "below_threshold": below_threshold,
             "threshold": threshold,
             "overall_similarity": overall_similarity
         }
-
-        return {"summary": summary, "report": report}
+        if self.back_translate:
+            tm_stats["hit_rate"] = hit_rate(tm_stats)
+            summary["translation_memory"] = tm_stats
+        emb_stats["hit_rate"] = hit_rate(emb_stats)
+        summary["embedding_cache"] = emb_stats
+        extra = {}
+        if aligned is not None:
+            summary["alignment"] = aligned.counts
+            extra["unmatched"] = aligned.unmatched
+
+        if report_writer is not None:
+            report_writer.close(summary=summary, **extra)
+            return {"summary": summary, "json_file": out_json}
+        return {"summary": summary, "report": report, **extra}
 
 # Example usage for testing
 if __name__ == "__main__":
     import sys
-    import json
     if len(sys.argv) < 3:
         print("Usage: python my_similarity_checker.py <original_srt> <translated_srt>")
         sys.exit(1)
@@ -155,11 +200,8 @@ if __name__ == "__main__":
     translated_srt = sys.argv[2]
 
     checker = SRTSimilarityCheckerCPUOptimized(src_lang="es", tgt_lang="en")
-    result = checker.compute_srt_similarity(original_srt, translated_srt, threshold=0.7)
-
     output_file = f"{translated_srt}_similarity.json"
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(result, f, indent=2, ensure_ascii=False)
+    checker.compute_srt_similarity(original_srt, translated_srt, threshold=0.7, out_json=output_file)
     print(f"✅ Saved similarity report to {output_file}")
 
 
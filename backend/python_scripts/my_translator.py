@@ -1,34 +1,35 @@
+import math
 import os
 import pysrt
 import json
 from datetime import datetime
 from tqdm import tqdm
 import torch
-from transformers import MarianMTModel, MarianTokenizer
 from difflib import SequenceMatcher
+from batching import iter_token_batches, sequence_log_probs
+from inference_backend import DEFAULT_BACKEND
+from model_registry import configure_torch_threads, get_registry, marian_model_name
 
 class HybridSubtitleTranslatorCPUOptimized:
-    def __init__(self, src_lang="en", tgt_lang="es", batch_size=32, max_cps=15):
+    def __init__(self, src_lang="en", tgt_lang="es", batch_size=32, max_cps=15, max_batch_tokens=2048,
+                 backend=DEFAULT_BACKEND):
         self.device = "cpu"
         self.src_lang = src_lang
         self.tgt_lang = tgt_lang
-        self.batch_size = batch_size
+        self.batch_size = batch_size  # upper bound on lines per batch
+        self.max_batch_tokens = max_batch_tokens
         self.max_cps = max_cps
 
-        # Load forward translation model
-        self.model_name = f"Helsinki-NLP/opus-mt-{src_lang}-{tgt_lang}"
-        print(f"Loading MarianMT model {self.model_name} on CPU")
-        self.tokenizer = MarianTokenizer.from_pretrained(self.model_name)
-        self.model = MarianMTModel.from_pretrained(self.model_name)
-        self.model.eval()
+        # Forward and back-translation (evaluation) models from the shared registry
+        self.model_name = marian_model_name(src_lang, tgt_lang)
+        self.bt_model_name = marian_model_name(tgt_lang, src_lang)
+        self.backend = backend
+        print(f"Loading MarianMT model {self.model_name} on CPU ({backend} backend)")
+        (self.tokenizer, self.model), (self.bt_tokenizer, self.bt_model) = \
+            get_registry().marian_pair(src_lang, tgt_lang, backend=backend)
 
-        # Load back-translation model for evaluation
-        self.bt_model_name = f"Helsinki-NLP/opus-mt-{tgt_lang}-{src_lang}"
-        self.bt_tokenizer = MarianTokenizer.from_pretrained(self.bt_model_name)
-        self.bt_model = MarianMTModel.from_pretrained(self.bt_model_name)
-        self.bt_model.eval()
-
-        torch.set_num_threads(os.cpu_count())
+        # SUBTITLE_TORCH_THREADS (set by the job queue) overrides the all-cores default
+        configure_torch_threads(default=os.cpu_count())
         print(f"Using {torch.get_num_threads()} CPU threads")
 
     def clean_text(self, text):
@@ -42,6 +43,12 @@ class HybridSubtitleTranslatorCPUOptimized:
         """Compute text similarity for back-translation comparison."""
         return SequenceMatcher(None, a.lower(), b.lower()).ratio()
 
+    def _time_to_seconds(self, t):
+        """'HH:MM:SS,mmm' (str(SubRipTime)) to seconds."""
+        hms, _, ms = t.partition(",")
+        h, m, sec = (int(x) for x in hms.split(":"))
+        return h * 3600 + m * 60 + sec + int(ms or 0) / 1000.0
+
     def _paraphrase_trim(self, text):
         """Heuristic to shorten overly long translations."""
         words = text.split()
@@ -50,16 +57,17 @@ class HybridSubtitleTranslatorCPUOptimized:
         return text
 
     def batch_translate(self, texts, model=None, tokenizer=None, max_length=128):
-        """Translate in batches and compute average confidence."""
+        """Translate in length-bucketed batches; returns (text, confidence) pairs."""
         if not texts:
             return []
         model = model or self.model
         tokenizer = tokenizer or self.tokenizer
-        translations = []
-        for i in tqdm(range(0, len(texts), self.batch_size), desc="Translating"):
-            batch = texts[i:i+self.batch_size]
-            if not batch:
-                continue
+        translations = [None] * len(texts)
+        batches = list(iter_token_batches(
+            texts, tokenizer, max_tokens=self.max_batch_tokens,
+            max_batch_size=self.batch_size, max_length=max_length
+        ))
+        for indices, batch in tqdm(batches, desc="Translating"):
             inputs = tokenizer(
                 batch, return_tensors="pt", padding=True,
                 truncation=True, max_length=max_length
@@ -73,13 +81,10 @@ class HybridSubtitleTranslatorCPUOptimized:
                     output_scores=True
                 )
             decoded = tokenizer.batch_decode(outputs.sequences, skip_special_tokens=True)
-            # approximate average log-prob confidence
-            if outputs.scores:
-                avg_score = float(sum(s.mean().item() for s in outputs.scores) / len(outputs.scores))
-            else:
-                avg_score = 0.0
-            for text in decoded:
-                translations.append((text, avg_score))
+            # exp(mean token log-prob) of each row's own tokens
+            log_probs = sequence_log_probs(model, outputs, tokenizer.pad_token_id)
+            for i, text, log_prob in zip(indices, decoded, log_probs):
+                translations[i] = (text, math.exp(log_prob))
         return translations
 
     def _group_context(self, subs):
@@ -103,50 +108,56 @@ class HybridSubtitleTranslatorCPUOptimized:
         translated_subs = []
         grouped_subs = self._group_context(subs)
 
-        for group in grouped_subs:
-            texts = [self.clean_text(s.text) for s in group]
-            merged_text = " ".join(texts)
-            is_cue = all(self.is_sound_cue(t) for t in texts)
-
-            # Forward translation
-            (fwd_trans, fwd_conf) = self.batch_translate([merged_text])[0]
-
-            # Back-translation for evaluation
-            (bt_text, _) = self.batch_translate(
-                [fwd_trans],
-                model=self.bt_model,
-                tokenizer=self.bt_tokenizer
-            )[0]
-            sim_score = self._similarity(merged_text, bt_text)
-
-            # Reading speed calculation
-            start_sec = self._time_to_seconds(str(group[0].start))
-            end_sec = self._time_to_seconds(str(group[-1].end))
-            duration = max(1e-3, end_sec - start_sec)
-            cps = len(fwd_trans) / duration
-
-            if cps > self.max_cps:
-                fwd_trans = self._paraphrase_trim(fwd_trans)
-
-            if is_cue:
-                fwd_trans = f"[{fwd_trans.strip('[]')}]"
-
-            for s in group:
-                translated_subs.append({
-                    "index": s.index,
-                    "original": s.text.strip(),
-                    "translated": fwd_trans,
-                    "start": str(s.start),
-                    "end": str(s.end),
-                    "reading_speed_cps": round(cps, 2),
-                    "reading_speed_ok": cps <= self.max_cps,
-                    "confidence": round(fwd_conf, 3),
-                    "back_translation_match": round(sim_score, 3),
-                    "duration_sec": round(duration, 2)
-                })
+        # Phase 1: build every context group up front
+        group_texts = [[self.clean_text(s.text) for s in group] for group in grouped_subs]
+        merged_texts = [" ".join(texts) for texts in group_texts]
+
+        # Phase 2: forward-translate all groups, then back-translate all results
+        # for evaluation, each in large length-bucketed batches
+        forward = self.batch_translate(merged_texts)
+        backward = self.batch_translate(
+            [fwd_trans for fwd_trans, _ in forward],
+            model=self.bt_model,
+            tokenizer=self.bt_tokenizer
+        )
+
+        for group, texts, merged_text, (fwd_trans, fwd_conf), (bt_text, _) in zip(
+            grouped_subs, group_texts, merged_texts, forward, backward
+        ):
+            translated_subs.extend(self._group_entries(group, texts, merged_text, fwd_trans, fwd_conf, bt_text))
 
         return translated_subs
 
+    def _group_entries(self, group, texts, merged_text, fwd_trans, fwd_conf, bt_text):
+        """Per-subtitle output for one translated context group."""
+        is_cue = all(self.is_sound_cue(t) for t in texts)
+        sim_score = self._similarity(merged_text, bt_text)
+
+        # Reading speed calculation
+        start_sec = self._time_to_seconds(str(group[0].start))
+        end_sec = self._time_to_seconds(str(group[-1].end))
+        duration = max(1e-3, end_sec - start_sec)
+        cps = len(fwd_trans) / duration
+
+        if cps > self.max_cps:
+            fwd_trans = self._paraphrase_trim(fwd_trans)
+
+        if is_cue:
+            fwd_trans = f"[{fwd_trans.strip('[]')}]"
+
+        return [{
+            "index": s.index,
+            "original": s.text.strip(),
+            "translated": fwd_trans,
+            "start": str(s.start),
+            "end": str(s.end),
+            "reading_speed_cps": round(cps, 2),
+            "reading_speed_ok": cps <= self.max_cps,
+            "confidence": round(fwd_conf, 3),
+            "back_translation_match": round(sim_score, 3),
+            "duration_sec": round(duration, 2)
+        } for s in group]
+
     def generate_summary(self, subs):
         """Aggregate translation quality summary for web display."""
         if not subs:
@@ -0,0 +1,111 @@
+# parallel_translate.py
+# Process-pool execution of translate.py's stages for very long SRT files.
+# One torch intra-op pool stops scaling well before a large host's core count,
+# so the parsed lines are split into contiguous chunks and handed to worker
+# processes that each load their own models and use a fixed thread count.
+# Results are merged back in file order.
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import torch
+
+# Chunks per worker: more than one so a slow chunk doesn't leave the others idle
+CHUNKS_PER_WORKER = 4
+
+_settings = None  # per-process translate_lines() settings, set by _init_worker
+
+
+def chunk_bounds(n, chunks):
+    """[(start, end)] for `chunks` contiguous, near-equal slices of n lines."""
+    if n == 0:
+        return []
+    size = -(-n // max(1, chunks))
+    return [(start, min(start + size, n)) for start in range(0, n, size)]
+
+
+def _init_worker(threads, settings):
+    global _settings
+    from model_registry import configure_torch_threads, get_registry
+    configure_torch_threads(threads)
+    _settings = settings
+
+    # Load models once per worker rather than on its first chunk
+    registry = get_registry()
+    back = not settings["skip_back_translation"]
+    registry.marian_pair(settings["src_lang"], settings["tgt_lang"], back=back, backend=settings["backend"])
+    if back:
+        registry.sentence_transformer(settings["sbert_name"])
+
+
+def _translate_chunk(start, texts, cues, durations, line_offset):
+    from translate import translate_lines
+    tm_stats = {"forward": {"hits": 0, "misses": 0}, "back_translation": {"hits": 0, "misses": 0},
+                "embedding": {"hits": 0, "misses": 0}}
+    result = translate_lines(texts, cues, tm_stats=tm_stats, durations=durations, line_offset=line_offset,
+                             **_settings)
+    for key in ("orig_emb", "bt_emb"):
+        if result[key] is not None:
+            result[key] = result[key].cpu().numpy()
+    return start, result, tm_stats
+
+
+def parallel_translate(texts, cues, workers, threads_per_worker, reporter=None, tm_stats=None,
+                       durations=None, chunks_per_worker=CHUNKS_PER_WORKER, line_offset=0, **settings):
+    """
+    translate_lines() over contiguous chunks in `workers` processes. Takes the
+    same settings and returns the same dict; reporter, if given, advances a
+    "chunks" stage as each chunk finishes and tm_stats gets every chunk's counts.
+    line_offset is the file index of texts[0] (chunks pass on their own).
+    """
+    if not texts:
+        from translate import translate_lines
+        return translate_lines(texts, cues, tm_stats=tm_stats, durations=durations, line_offset=line_offset,
+                               **settings)
+
+    bounds = chunk_bounds(len(texts), workers * chunks_per_worker)
+    if reporter is not None:
+        reporter.start_stage("chunks", len(texts))
+
+    # spawn, not fork: forking a process whose OpenMP pool is already running can deadlock
+    executor = ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker, initargs=(threads_per_worker, settings)
+    )
+    results = {}
+    try:
+        futures = [
+            executor.submit(
+                _translate_chunk, a, texts[a:b], cues[a:b], durations[a:b] if durations else None, line_offset + a
+            )
+            for a, b in bounds
+        ]
+        for future in as_completed(futures):
+            start, result, chunk_stats = future.result()
+            results[start] = (result, chunk_stats)
+            if reporter is not None:
+                reporter.advance(len(result["translated"]))  # may raise to cancel the job
+    except BaseException:
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+    if reporter is not None:
+        reporter.end_stage()
+
+    ordered = [results[a] for a, _ in bounds]
+    if tm_stats is not None:
+        for _, chunk_stats in ordered:
+            for stage, counts in chunk_stats.items():
+                merged = tm_stats.setdefault(stage, {})
+                for key, value in counts.items():
+                    merged[key] = merged.get(key, 0) + value
+
+    merged = {}
+    for key, first in ordered[0][0].items():
+        parts = [result[key] for result, _ in ordered]
+        if first is None:
+            merged[key] = None
+        elif isinstance(first, np.ndarray):
+            merged[key] = torch.from_numpy(np.concatenate(parts))
+        else:
+            merged[key] = [value for part in parts for value in part]
+    return merged
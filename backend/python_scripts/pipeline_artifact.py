@@ -0,0 +1,93 @@
+# pipeline_artifact.py
+# Back-translations and embeddings computed by `translate.py --pipeline`,
+# stored next to the output JSON so similarity.py can reuse them instead of
+# back-translating and encoding the same lines again.
+import hashlib
+import json
+import os
+import numpy as np
+
+
+def clean_line(text):
+    return text.replace("\n", " ").strip()
+
+
+def source_key(src_lang, tgt_lang, original_lines):
+    """
+    Artifacts are found by language pair + original SRT text, which doesn't
+    change when translations are edited. original_lines may be any iterable;
+    it is hashed line by line.
+    """
+    digest = hashlib.sha256(f"{src_lang}\x1f{tgt_lang}\x1f".encode("utf-8"))
+    for i, line in enumerate(original_lines):
+        digest.update((("\x1e" if i else "") + clean_line(line)).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def artifact_path(directory, key):
+    return os.path.join(directory, f"pipeline_{key}.npz")
+
+
+def save_artifact(directory, src_lang, tgt_lang, original, translated, back_translated,
+                  orig_emb, bt_emb, sbert_model, bt_model, bt_decode):
+    """Write the artifact and return its path. bt_decode is the back-translation's generate() settings."""
+    key = source_key(src_lang, tgt_lang, original)
+    path = artifact_path(directory, key)
+    meta = {
+        "key": key,
+        "src_lang": src_lang,
+        "tgt_lang": tgt_lang,
+        "sbert_model": sbert_model,
+        "bt_model": bt_model,
+        "bt_decode": bt_decode
+    }
+    np.savez_compressed(
+        path,
+        meta=np.array(json.dumps(meta)),
+        original=np.array([clean_line(t) for t in original], dtype=str),
+        translated=np.array([clean_line(t) for t in translated], dtype=str),
+        back_translated=np.array(back_translated, dtype=str),
+        orig_emb=np.asarray(orig_emb, dtype=np.float32),
+        bt_emb=np.asarray(bt_emb, dtype=np.float32)
+    )
+    return path
+
+
+def find_artifact(directory, src_lang, tgt_lang, original_lines):
+    """Load the artifact for these original lines, or None if there isn't one."""
+    path = artifact_path(directory, source_key(src_lang, tgt_lang, original_lines))
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return {
+            "path": path,
+            "meta": json.loads(str(data["meta"])),
+            "original": data["original"].tolist(),
+            "translated": data["translated"].tolist(),
+            "back_translated": data["back_translated"].tolist(),
+            "orig_emb": data["orig_emb"],
+            "bt_emb": data["bt_emb"]
+        }
+
+
+def reusable_lines(artifact, original_lines, translated_lines, sbert_model, bt_decode, offset=0, positions=None):
+    """
+    Indices whose original and translated text match the artifact, i.e. lines
+    whose stored back-translation and embeddings are still valid. Nothing is
+    reused unless the artifact came from the same SentenceTransformer and its
+    back-translations were decoded with bt_decode (num_beams, max_length). offset is the
+    file position of the first line, for callers working in windows; returned
+    indices are file positions too. positions, if given, is each line's file
+    position instead (None for lines with no stored counterpart).
+    """
+    meta = artifact["meta"] if artifact is not None else {}
+    if meta.get("sbert_model") != sbert_model or meta.get("bt_decode") != bt_decode:
+        return set()
+    if positions is None:
+        positions = range(offset, offset + len(original_lines))
+    stored_orig, stored_trans = artifact["original"], artifact["translated"]
+    return {
+        pos for pos, orig, trans in zip(positions, original_lines, translated_lines)
+        if pos is not None and pos < len(stored_orig)
+        and (stored_orig[pos], stored_trans[pos]) == (clean_line(orig), clean_line(trans))
+    }
@@ -0,0 +1,62 @@
+# progress.py
+# NDJSON progress events for translate.py jobs. A job is a list of weighted
+# stages; every finished batch advances the current stage and emits
+#   {"event": "progress", "stage": "forward", "lines_done": 120,
+#    "lines_total": 800, "progress": 0.07, "eta_seconds": 41.5}
+# to the callback (the worker protocol or stdout, see worker.py).
+import time
+
+
+class ProgressReporter:
+    """Turns per-batch line counts into progress events with an overall ETA."""
+
+    # "chunks", "windows" and "batches" are the single stage of --workers N,
+    # --window N and --overlap runs
+    STAGE_WEIGHTS = {"forward": 0.5, "back_translation": 0.35, "embedding": 0.15, "escalation": 0.15,
+                     "chunks": 1.0, "windows": 1.0, "batches": 1.0}
+
+    def __init__(self, callback, stages):
+        self.callback = callback
+        total = sum(self.STAGE_WEIGHTS[s] for s in stages)
+        self.weights = {s: self.STAGE_WEIGHTS[s] / total for s in stages}
+        self.completed = 0.0
+        self.start_time = time.time()
+        self.stage = None
+        self.lines_total = 0
+        self.lines_done = 0
+
+    def start_stage(self, stage, lines_total):
+        self.stage = stage
+        self.lines_total = lines_total
+        self.lines_done = 0
+        self._emit()
+
+    def advance(self, lines):
+        self.lines_done += lines
+        self._emit()
+
+    def end_stage(self):
+        self.completed += self.weights[self.stage]
+
+    def _emit(self):
+        if self.callback is None:
+            return
+        fraction = self.lines_done / self.lines_total if self.lines_total else 1.0
+        progress = min(0.99, self.completed + self.weights[self.stage] * fraction)
+        elapsed = time.time() - self.start_time
+        eta = elapsed / progress * (1 - progress) if progress > 0 else None
+        self.callback({
+            "event": "progress",
+            "stage": self.stage,
+            "lines_done": self.lines_done,
+            "lines_total": self.lines_total,
+            "progress": round(progress, 4),
+            "eta_seconds": round(eta, 1) if eta is not None else None
+        })
+
+
+def pipeline_stages(skip_back_translation=False, adaptive=False):
+    """Stages of a sequential translate_lines() run, in order."""
+    if skip_back_translation:
+        return ["forward"]
+    return ["forward", "back_translation", "embedding"] + (["escalation"] if adaptive else [])
@@ -0,0 +1,90 @@
+# quality_guard.py
+# Checks that a quantized / ONNX backend keeps back-translation similarity
+# close to the fp32 PyTorch baseline on a reference SRT. Exits with status 1
+# when the similarity drop exceeds --max_drop.
+#
+#   python quality_guard.py --backend int8
+#   python quality_guard.py --backend onnx --reference ../en.srt --src_lang en --tgt_lang es
+import argparse
+import json
+import os
+import sys
+import time
+import pysrt
+from sentence_transformers import util
+from batching import batched_generate
+from inference_backend import BACKENDS
+from model_registry import get_registry
+
+DEFAULT_REFERENCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "en.srt")
+SBERT_MODEL_NAME = "paraphrase-MiniLM-L3-v2"  # same model translate.py scores with
+
+
+def load_reference(path):
+    texts = [s.text.replace("\n", " ").strip() for s in pysrt.open(path)]
+    return [t for t in texts if t and not (t.startswith("[") and t.endswith("]"))]
+
+
+def evaluate(texts, src_lang, tgt_lang, backend, sbert_model):
+    """Round-trip the reference through one backend; returns (stats, forward translations)."""
+    (tok, model), (bt_tok, bt_model) = get_registry().marian_pair(src_lang, tgt_lang, backend=backend)
+
+    # Translation memory is bypassed on purpose so every backend really runs
+    start = time.time()
+    forward = batched_generate(texts, model, tok, max_length=256, num_beams=4)
+    back = batched_generate(forward, bt_model, bt_tok, max_length=256, num_beams=4)
+    elapsed = time.time() - start
+
+    orig_emb = sbert_model.encode(texts, convert_to_tensor=True, show_progress_bar=False)
+    back_emb = sbert_model.encode(back, convert_to_tensor=True, show_progress_bar=False)
+    similarities = util.cos_sim(orig_emb, back_emb).diagonal()
+
+    return {
+        "backend": backend,
+        "avg_similarity": round(similarities.mean().item(), 4),
+        "min_similarity": round(similarities.min().item(), 4),
+        "seconds": round(elapsed, 2),
+        "lines_per_sec": round(len(texts) / elapsed, 2) if elapsed > 0 else None
+    }, forward
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a Marian inference backend against fp32.")
+    parser.add_argument("--backend", type=str, required=True, choices=[b for b in BACKENDS if b != "torch"])
+    parser.add_argument("--reference", type=str, default=DEFAULT_REFERENCE, help="Reference SRT file")
+    parser.add_argument("--src_lang", type=str, default="en")
+    parser.add_argument("--tgt_lang", type=str, default="es")
+    parser.add_argument("--max_drop", type=float, default=0.02,
+                        help="Largest allowed drop in average back-translation similarity")
+    args = parser.parse_args()
+
+    texts = load_reference(args.reference)
+    if not texts:
+        print(json.dumps({"error": f"No usable lines in {args.reference}"}))
+        sys.exit(1)
+    sbert_model = get_registry().sentence_transformer(SBERT_MODEL_NAME)
+
+    baseline, baseline_fwd = evaluate(texts, args.src_lang, args.tgt_lang, "torch", sbert_model)
+    candidate, candidate_fwd = evaluate(texts, args.src_lang, args.tgt_lang, args.backend, sbert_model)
+
+    drop = baseline["avg_similarity"] - candidate["avg_similarity"]
+    result = {
+        "reference": os.path.abspath(args.reference),
+        "lines": len(texts),
+        "baseline": baseline,
+        "candidate": candidate,
+        "similarity_drop": round(drop, 4),
+        "identical_translations": round(
+            sum(a == b for a, b in zip(baseline_fwd, candidate_fwd)) / len(texts), 4
+        ),
+        "speedup": round(baseline["seconds"] / candidate["seconds"], 2) if candidate["seconds"] else None,
+        "max_drop": args.max_drop,
+        "passed": drop <= args.max_drop
+    }
+    print(json.dumps(result, indent=2))
+    if not result["passed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
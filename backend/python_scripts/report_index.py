@@ -0,0 +1,283 @@
+# report_index.py
+# Incremental SQLite index over the translate/similarity reports in
+# backend/downloads. Each report is read once, when it is added (jobs add
+# their own report as they finish) or when update() finds a new or changed
+# file; queries then run against the index instead of every report.
+#
+#   python report_index.py ../downloads update
+#   python report_index.py ../downloads add <report>
+#   python report_index.py ../downloads distribution [--kind similarity] [--src_lang en] [--tgt_lang es]
+#   python report_index.py ../downloads slowest [--limit 10]
+#   python report_index.py ../downloads high-cps [--bucket day|week|month]
+import argparse
+import json
+import os
+import re
+import sys
+import sqlite3
+import time
+from datetime import datetime
+from columnar_report import as_list, open_report
+
+INDEX_NAME = "report_index.sqlite"
+HISTOGRAM_BINS = 20  # similarity histogram bins over [0, 1]
+HIGH_CPS = 20  # same threshold as translate.py's high_speed_count
+
+_FILE_RE = re.compile(r"^(translated|similarity)_(\d{13})_.*\.(json|npz)$")
+
+
+def report_kind(name):
+    """'translate' / 'similarity' for report file names, else None."""
+    match = _FILE_RE.match(name)
+    if not match:
+        return None
+    return "translate" if match.group(1) == "translated" else "similarity"
+
+
+def histogram(values, bins=HISTOGRAM_BINS):
+    counts = [0] * bins
+    for v in values:
+        if v is None:
+            continue
+        counts[min(bins - 1, max(0, int(float(v) * bins)))] += 1
+    return counts
+
+
+def _created(name, fields, mtime):
+    """Job time: metadata timestamp, else the epoch-ms in the file name, else mtime."""
+    stamp = fields.get("metadata", {}).get("timestamp")
+    if stamp:
+        try:
+            return datetime.strptime(stamp, "%Y%m%d_%H%M%S").timestamp()
+        except ValueError:
+            pass
+    match = _FILE_RE.match(name)
+    return int(match.group(2)) / 1000.0 if match else mtime
+
+
+def summarize_report(path):
+    """One index row plus the similarity histogram for a report file."""
+    name = os.path.basename(path)
+    kind = report_kind(name)
+    stat = os.stat(path)
+    with open_report(path) as report:
+        fields = report.fields
+        columns = report.columns
+        if kind == "translate":
+            meta = fields.get("metadata", {})
+            scores = as_list(report.column("back_translation_match")) if "back_translation_match" in columns else []
+            high_cps_count = meta.get("high_speed_count")
+            if high_cps_count is None and "reading_speed_cps" in columns:
+                # Older reports without the metadata count: only then is the cps column read
+                cps = as_list(report.column("reading_speed_cps"))
+                high_cps_count = sum(1 for c in cps if c is not None and c >= HIGH_CPS)
+            row = {
+                "src_lang": meta.get("src_lang"),
+                "tgt_lang": meta.get("tgt_lang"),
+                "model": meta.get("model"),
+                "lines": meta.get("lines_translated", report.length),
+                "elapsed_seconds": meta.get("elapsed_seconds"),
+                "avg_similarity": meta.get("avg_bt_match"),
+                "avg_cps": meta.get("avg_cps"),
+                "high_cps_count": high_cps_count
+            }
+        else:
+            summary = fields.get("summary", {})
+            scores = as_list(report.column("similarity")) if "similarity" in columns else []
+            row = {
+                "src_lang": summary.get("src_lang"),
+                "tgt_lang": summary.get("tgt_lang"),
+                "model": None,
+                "lines": report.length,
+                "elapsed_seconds": summary.get("elapsed_seconds"),
+                "avg_similarity": summary.get("average_similarity"),
+                "avg_cps": None,
+                "high_cps_count": None
+            }
+    row.update({
+        "path": name,
+        "kind": kind,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "created": _created(name, fields, stat.st_mtime)
+    })
+    return row, histogram(scores)
+
+
+class ReportIndex:
+    """SQLite index stored next to the reports it covers."""
+
+    def __init__(self, directory, path=None):
+        self.directory = os.path.abspath(directory)
+        self.path = path or os.path.join(self.directory, INDEX_NAME)
+        self._conn = sqlite3.connect(self.path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS reports ("
+            " path TEXT PRIMARY KEY, kind TEXT NOT NULL, src_lang TEXT, tgt_lang TEXT, model TEXT,"
+            " lines INTEGER, elapsed_seconds REAL, avg_similarity REAL, avg_cps REAL,"
+            " high_cps_count INTEGER, created REAL, size INTEGER, mtime REAL);"
+            "CREATE TABLE IF NOT EXISTS similarity_bins ("
+            " path TEXT NOT NULL, bin INTEGER NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (path, bin));"
+            "CREATE INDEX IF NOT EXISTS reports_pair ON reports (kind, src_lang, tgt_lang);"
+            "CREATE INDEX IF NOT EXISTS reports_created ON reports (created);"
+        )
+        self._conn.commit()
+
+    # -------------------
+    # Maintenance
+    # -------------------
+    def add(self, report_path):
+        """Index (or re-index) one report file."""
+        row, bins = summarize_report(report_path)
+        columns = list(row)
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO reports ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            [row[c] for c in columns]
+        )
+        self._conn.execute("DELETE FROM similarity_bins WHERE path = ?", (row["path"],))
+        self._conn.executemany(
+            "INSERT INTO similarity_bins VALUES (?, ?, ?)",
+            [(row["path"], b, count) for b, count in enumerate(bins) if count]
+        )
+        self._conn.commit()
+
+    def update(self):
+        """Index new or changed reports and drop deleted ones; returns counts."""
+        known = {
+            path: (size, mtime)
+            for path, size, mtime in self._conn.execute("SELECT path, size, mtime FROM reports")
+        }
+        seen = set()
+        added = 0
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or report_kind(entry.name) is None:
+                continue
+            seen.add(entry.name)
+            stat = entry.stat()
+            if known.get(entry.name) == (stat.st_size, stat.st_mtime):
+                continue
+            try:
+                self.add(entry.path)
+                added += 1
+            except (ValueError, KeyError, OSError):
+                continue  # unreadable or half-written report; retried next update
+        removed = [path for path in known if path not in seen]
+        for path in removed:
+            self._conn.execute("DELETE FROM reports WHERE path = ?", (path,))
+            self._conn.execute("DELETE FROM similarity_bins WHERE path = ?", (path,))
+        self._conn.commit()
+        return {"indexed": added, "removed": len(removed), "total": len(seen)}
+
+    # -------------------
+    # Queries
+    # -------------------
+    def latest(self, kind):
+        row = self._conn.execute(
+            "SELECT path FROM reports WHERE kind = ? ORDER BY created DESC LIMIT 1", (kind,)
+        ).fetchone()
+        return os.path.join(self.directory, row[0]) if row else None
+
+    def similarity_distribution(self, kind="similarity", src_lang=None, tgt_lang=None):
+        """Summed similarity histograms per language pair."""
+        where, params = ["r.kind = ?"], [kind]
+        if src_lang:
+            where.append("r.src_lang = ?")
+            params.append(src_lang)
+        if tgt_lang:
+            where.append("r.tgt_lang = ?")
+            params.append(tgt_lang)
+        rows = self._conn.execute(
+            "SELECT r.src_lang, r.tgt_lang, b.bin, SUM(b.count) FROM similarity_bins b"
+            " JOIN reports r ON r.path = b.path"
+            f" WHERE {' AND '.join(where)} GROUP BY r.src_lang, r.tgt_lang, b.bin",
+            params
+        ).fetchall()
+        pairs = {}
+        for src, tgt, b, count in rows:
+            pair = pairs.setdefault(f"{src}-{tgt}", [0] * HISTOGRAM_BINS)
+            pair[b] = count
+        return {
+            pair: {
+                "bins": [round(b / HISTOGRAM_BINS, 3) for b in range(HISTOGRAM_BINS)],
+                "counts": counts,
+                "lines": sum(counts)
+            }
+            for pair, counts in pairs.items()
+        }
+
+    def slowest_jobs(self, limit=10, kind="translate"):
+        rows = self._conn.execute(
+            "SELECT path, src_lang, tgt_lang, lines, elapsed_seconds FROM reports"
+            " WHERE kind = ? AND elapsed_seconds IS NOT NULL ORDER BY elapsed_seconds DESC LIMIT ?",
+            (kind, limit)
+        ).fetchall()
+        return [
+            {
+                "path": path, "src_lang": src, "tgt_lang": tgt, "lines": lines, "elapsed_seconds": elapsed,
+                "lines_per_sec": round(lines / elapsed, 2) if lines and elapsed else None
+            }
+            for path, src, tgt, lines, elapsed in rows
+        ]
+
+    def high_cps_over_time(self, bucket="day"):
+        formats = {"day": "%Y-%m-%d", "week": "%Y-W%W", "month": "%Y-%m"}
+        rows = self._conn.execute(
+            f"SELECT strftime('{formats[bucket]}', created, 'unixepoch') AS period,"
+            " COUNT(*), SUM(lines), SUM(high_cps_count) FROM reports"
+            " WHERE kind = 'translate' AND high_cps_count IS NOT NULL GROUP BY period ORDER BY period"
+        ).fetchall()
+        return [
+            {"period": period, "jobs": jobs, "lines": lines, "high_cps_count": high}
+            for period, jobs, lines, high in rows
+        ]
+
+    def close(self):
+        self._conn.close()
+
+
+def index_report(report_path):
+    """Add a just-written report to its directory's index. Never raises: the job already succeeded."""
+    try:
+        index = ReportIndex(os.path.dirname(os.path.abspath(report_path)))
+        try:
+            index.add(report_path)
+        finally:
+            index.close()
+        return True
+    except Exception as e:
+        print(f"report_index: could not index {report_path}: {e!r}", file=sys.stderr)
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the downloads report index.")
+    parser.add_argument("directory", type=str, help="Downloads directory")
+    parser.add_argument("command", choices=["update", "add", "distribution", "slowest", "high-cps"])
+    parser.add_argument("report", nargs="?", help="Report file for 'add'")
+    parser.add_argument("--kind", type=str, default="similarity", choices=["similarity", "translate"])
+    parser.add_argument("--src_lang", type=str, default=None)
+    parser.add_argument("--tgt_lang", type=str, default=None)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--bucket", type=str, default="day", choices=["day", "week", "month"])
+    args = parser.parse_args()
+
+    index = ReportIndex(args.directory)
+    start = time.time()
+    if args.command == "add":
+        index.add(args.report)
+        result = {"indexed": 1}
+    elif args.command == "update":
+        result = index.update()
+    elif args.command == "distribution":
+        result = index.similarity_distribution(args.kind, args.src_lang, args.tgt_lang)
+    elif args.command == "slowest":
+        result = index.slowest_jobs(args.limit)
+    else:
+        result = index.high_cps_over_time(args.bucket)
+    index.close()
+    print(json.dumps({"result": result, "query_seconds": round(time.time() - start, 4)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
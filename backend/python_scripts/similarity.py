@@ -1,27 +1,60 @@
 # python_scripts/similarity.py
 import argparse
 import json
+import time
 from pathlib import Path
-import pysrt
-from transformers import MarianMTModel, MarianTokenizer
-from sentence_transformers import SentenceTransformer, util
-
-def translate_lines(lines, src_lang, tgt_lang, max_length=128):
+import torch
+from batching import DEFAULT_MAX_TOKENS
+from cue_alignment import AlignedPairs
+from embedding_cache import cached_encode
+from inference_backend import DEFAULT_BACKEND, memory_key
+from model_registry import configure_torch_threads, get_registry, marian_model_name, using_models
+from pipeline_artifact import clean_line, find_artifact, reusable_lines
+from progress import ProgressReporter
+from report_index import index_report
+from srt_stream import DEFAULT_WINDOW, JsonReportWriter, count_cues, iter_srt, windows
+from translation_memory import cached_generate, get_translation_memory, hit_rate
+
+SBERT_MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
+# Back-translation decode settings; translate.py --pipeline uses the same, and
+# its artifact's back-translations are only reused when they were decoded so
+BACK_TRANSLATION_DECODE = {"num_beams": 2, "max_length": 128}
+
+def translate_lines(lines, src_lang, tgt_lang, max_length=BACK_TRANSLATION_DECODE["max_length"],
+                    max_tokens=DEFAULT_MAX_TOKENS, memory=None, num_beams=BACK_TRANSLATION_DECODE["num_beams"]):
+    """
+    Translate a list of lines from src_lang -> tgt_lang using MarianMT, in
+    token-budgeted, length-sorted batches. Lines found in the translation
+    memory (if given) skip generation.
     """
-    Translate a list of lines from src_lang -> tgt_lang using MarianMT.
+    model_name = marian_model_name(src_lang, tgt_lang)
+    tokenizer, model = get_registry().marian(model_name)
+    return cached_generate(
+        lines, memory_key(model_name, DEFAULT_BACKEND), model, tokenizer, memory=memory,
+        max_tokens=max_tokens, max_length=max_length, num_beams=num_beams
+    )
+
+def encode_lines(sbert_model, lines, batch_size=64, model_name=None, stats=None):
     """
-    model_name = f"Helsinki-NLP/opus-mt-{src_lang}-{tgt_lang}"
-    tokenizer = MarianTokenizer.from_pretrained(model_name)
-    model = MarianMTModel.from_pretrained(model_name)
-    model.eval()
-
-    translated_lines = []
-    for line in lines:
-        inputs = tokenizer(line, return_tensors="pt", padding=True, truncation=True)
-        outputs = model.generate(**inputs, max_length=max_length, num_beams=2)
-        translated_text = tokenizer.decode(outputs[0], skip_special_tokens=True)
-        translated_lines.append(translated_text)
-    return translated_lines
+    All lines in one vectorized encode call (empty input gives a 0 x dim
+    tensor). With model_name, lines already in the embedding cache skip it.
+    """
+    if not lines:
+        return torch.empty((0, sbert_model.get_sentence_embedding_dimension()))
+    if model_name is not None:
+        return cached_encode(
+            sbert_model, model_name, lines, stats=stats,
+            encode=lambda batch: sbert_model.encode(
+                batch, convert_to_numpy=True, batch_size=batch_size, show_progress_bar=False
+            )
+        )
+    return sbert_model.encode(lines, convert_to_tensor=True, batch_size=batch_size, show_progress_bar=False)
+
+def diagonal_cosine(a, b):
+    """Cosine similarity of row i of a with row i of b, for all rows at once."""
+    if a.shape[0] == 0:
+        return torch.empty(0)
+    return torch.nn.functional.cosine_similarity(a, b, dim=1)
 
 def main():
     parser = argparse.ArgumentParser(description="Compute similarity between original and translated SRT files.")
@@ -31,55 +64,166 @@ def main():
     parser.add_argument("--tgt_lang", type=str, default="es", help="Target language code")
     parser.add_argument("--threshold", type=float, default=0.7, help="Similarity threshold (0-1)")
     parser.add_argument("--out_json", type=str, required=True, help="Output JSON file path")
+    parser.add_argument("--artifacts_dir", type=str, default=None,
+                        help="Directory with translate.py --pipeline artifacts to reuse")
 
-    args = parser.parse_args()
-
-    # Load SRTs
-    orig_subs = pysrt.open(args.original_srt)
-    trans_subs = pysrt.open(args.translated_srt)
-
-    # Extract lines
-    orig_lines = [sub.text for sub in orig_subs]
-    trans_lines = [sub.text for sub in trans_subs]
-
-    # Back-translate: tgt_lang -> src_lang
-    back_trans_lines = translate_lines(trans_lines, args.tgt_lang, args.src_lang)
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW,
+                        help="Cue pairs processed (and written) at a time; 0 for the whole file at once")
+    parser.add_argument("--align", action="store_true",
+                        help="Pair cues by timestamps (split/merged cues as groups) instead of by position")
 
-    # Initialize multilingual SBERT
-    sbert_model = SentenceTransformer("paraphrase-multilingual-MiniLM-L12-v2")
+    args = parser.parse_args()
+    configure_torch_threads()
+    result = compute_similarity(
+        args.original_srt, args.translated_srt, args.out_json, src_lang=args.src_lang, tgt_lang=args.tgt_lang,
+        threshold=args.threshold, artifacts_dir=args.artifacts_dir, window=args.window, align=args.align
+    )
 
-    report = []
-    for idx, (orig, trans, back_trans) in enumerate(zip(orig_lines, trans_lines, back_trans_lines), 1):
-        emb_orig = sbert_model.encode(orig, convert_to_tensor=True)
-        emb_back = sbert_model.encode(back_trans, convert_to_tensor=True)
-        similarity = util.cos_sim(emb_orig, emb_back).item()
+    # Print the summary for Node.js consumption (the full report is in out_json)
+    print(json.dumps(result, ensure_ascii=False))
 
-        report.append({
-            "index": idx,
-            "original": orig,
-            "translated": trans,
-            "back_translated": back_trans,
-            "similarity": round(similarity, 3),
-            "reading_speed_ok": True  # optional, keep for frontend consistency
-        })
+@using_models
+def compute_similarity(original_srt, translated_srt, out_json, src_lang="en", tgt_lang="es", threshold=0.7,
+                       artifacts_dir=None, window=DEFAULT_WINDOW, align=False, progress=None):
+    """
+    Write the similarity report of a translated SRT to out_json and return
+    {"summary", "json_file"}. Also run in translate.py's warm worker, where
+    the models stay loaded between jobs; progress, if given, is called with a
+    progress event (see progress.py) after every window, counting original
+    cues, and may raise to cancel the job.
+    """
+    start_time = time.time()
+
+    # Lines whose original and translation are unchanged since a pipeline
+    # translate job reuse its stored back-translation and embeddings
+    artifact = find_artifact(
+        artifacts_dir, src_lang, tgt_lang,
+        (clean_line(sub.text) for sub in iter_srt(original_srt))
+    ) if artifacts_dir else None
+
+    sbert_model = get_registry().sentence_transformer(SBERT_MODEL_NAME)
+    dim = sbert_model.get_sentence_embedding_dimension()
+    memory = get_translation_memory()
+
+    # Cues are paired by position (zip stops at the shorter file); --align
+    # pairs them by timestamps instead (cue_alignment.py), so split or merged
+    # cues pair with their counterparts. Both stream the two SRTs, and each
+    # window of pairs is back-translated, encoded and appended to the report.
+    if not align:
+        pairs = (
+            (orig, trans, None) for orig, trans in zip(
+                (clean_line(sub.text) for sub in iter_srt(original_srt)),
+                (clean_line(sub.text) for sub in iter_srt(translated_srt))
+            )
+        )
+        aligned = None
+    else:
+        aligned = AlignedPairs(iter_srt(original_srt), iter_srt(translated_srt), clean_line)
+        pairs = ((group["original"], group["translated"], group) for group in aligned)
+    out_path = Path(out_json)
+    report_writer = JsonReportWriter(out_path, "report")
+    reporter = ProgressReporter(progress, ["windows"])
+    if progress is not None:
+        total = count_cues(original_srt)
+        reporter.start_stage("windows", total if align else min(total, count_cues(translated_srt)))
+    offset = 0
+    similarity_sum = 0.0
+    reused_count = 0
+    unmatched_done = 0
+    emb_stats = {"hits": 0, "misses": 0}
+    for pair_window in windows(pairs, window or None):
+        orig_lines = [orig for orig, _, _ in pair_window]
+        trans_lines = [trans for _, trans, _ in pair_window]
+        groups = [group for _, _, group in pair_window]
+        n = len(pair_window)
+        # Artifact lines are per original cue, so only 1:1 groups can reuse them
+        positions = [
+            offset + i if group is None else
+            group["original_positions"][0] if group["alignment"] == "1:1" else None
+            for i, group in enumerate(groups)
+        ]
+        reusable = reusable_lines(
+            artifact, orig_lines, trans_lines, SBERT_MODEL_NAME, BACK_TRANSLATION_DECODE, positions=positions
+        )
+        reused = {i for i in range(n) if positions[i] in reusable}
+        todo = [i for i in range(n) if i not in reused]
+
+        # Back-translate: tgt_lang -> src_lang (changed lines only)
+        back_trans_todo = translate_lines(
+            [trans_lines[i] for i in todo], tgt_lang, src_lang, memory=memory
+        )
+        back_trans_lines = [None] * n
+        for i in reused:
+            back_trans_lines[i] = artifact["back_translated"][positions[i]]
+        for i, back in zip(todo, back_trans_todo):
+            back_trans_lines[i] = back
+
+        # Encode each side of the window in one call
+        orig_emb = torch.empty((n, dim))
+        back_emb = torch.empty((n, dim))
+        if todo:
+            orig_emb[todo] = encode_lines(
+                sbert_model, [orig_lines[i] for i in todo], model_name=SBERT_MODEL_NAME, stats=emb_stats
+            ).float().cpu()
+            back_emb[todo] = encode_lines(
+                sbert_model, [back_trans_lines[i] for i in todo], model_name=SBERT_MODEL_NAME, stats=emb_stats
+            ).float().cpu()
+        if reused:
+            reused_idx = sorted(reused)
+            stored_idx = [positions[i] for i in reused_idx]
+            orig_emb[reused_idx] = torch.from_numpy(artifact["orig_emb"][stored_idx])
+            back_emb[reused_idx] = torch.from_numpy(artifact["bt_emb"][stored_idx])
+        similarities = diagonal_cosine(orig_emb, back_emb).tolist()
+
+        report = []
+        for i in range(n):
+            entry = {
+                "index": offset + i + 1,
+                "original": orig_lines[i],
+                "translated": trans_lines[i],
+                "back_translated": back_trans_lines[i],
+                "similarity": round(similarities[i], 3),
+                "reading_speed_ok": True  # optional, keep for frontend consistency
+            }
+            if groups[i] is not None:
+                entry["original_cues"] = groups[i]["original_cues"]
+                entry["translated_cues"] = groups[i]["translated_cues"]
+                entry["alignment"] = groups[i]["alignment"]
+            report.append(entry)
+            similarity_sum += round(similarities[i], 3)
+        report_writer.add(report)
+        reused_count += len(reused)
+        offset += n
+        if aligned is None:
+            reporter.advance(n)
+        else:
+            # Original cues consumed, including the ones that matched nothing
+            unmatched = aligned.counts["unmatched_original"]
+            reporter.advance(sum(len(g["original_positions"]) for g in groups) + unmatched - unmatched_done)
+            unmatched_done = unmatched
 
     # Compute summary
-    similarities = [r["similarity"] for r in report]
     summary = {
-        "num_lines": len(report),
-        "average_similarity": round(sum(similarities) / len(similarities), 3),
-        "threshold": args.threshold
+        "num_lines": offset,
+        "average_similarity": round(similarity_sum / offset, 3) if offset else 0.0,
+        "threshold": threshold,
+        "src_lang": src_lang,
+        "tgt_lang": tgt_lang,
+        "elapsed_seconds": round(time.time() - start_time, 2),
+        "reused_lines": reused_count,
+        "artifact": Path(artifact["path"]).name if artifact else None,
+        "embedding_cache": dict(emb_stats, hit_rate=hit_rate(emb_stats)),
+        "alignment": aligned.counts if aligned is not None else None
     }
 
-    result = {"summary": summary, "report": report}
-
-    # Save JSON
-    out_path = Path(args.out_json)
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(result, f, indent=2, ensure_ascii=False)
+    # The report was written window by window; the summary (and unmatched cues) close it
+    if aligned is not None:
+        report_writer.close(summary=summary, unmatched=aligned.unmatched)
+    else:
+        report_writer.close(summary=summary)
+    index_report(str(out_path))
 
-    # Print JSON for Node.js consumption
-    print(json.dumps(result, ensure_ascii=False))
+    return {"summary": summary, "json_file": str(out_path)}
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,97 @@
+# srt_stream.py
+# Constant-memory SRT handling: read cues one at a time, process them in
+# fixed-size windows, and append each finished window to the output SRT and
+# JSON report instead of holding the whole file in memory.
+import json
+import os
+import pysrt
+
+DEFAULT_WINDOW = 512
+
+
+def iter_srt(path, encoding="utf-8-sig"):
+    """Yield pysrt.SubRipItem cues as they are parsed (utf-8-sig also strips a BOM)."""
+    with open(path, encoding=encoding, newline="") as f:
+        yield from pysrt.SubRipFile.stream(f)
+
+
+def count_cues(path, encoding="utf-8-sig"):
+    """Number of cues in an SRT, without keeping any of them."""
+    return sum(1 for _ in iter_srt(path, encoding))
+
+
+def detect_eol(path, encoding="utf-8-sig"):
+    """Line ending used by the file, so rewritten SRTs keep it (like pysrt.open + save)."""
+    with open(path, encoding=encoding, newline="") as f:
+        first_line = f.readline()
+    for eol in ("\r\n", "\r", "\n"):
+        if first_line.endswith(eol):
+            return eol
+    return os.linesep
+
+
+def windows(items, size=DEFAULT_WINDOW):
+    """Group any iterable into lists of at most `size` items (one list if size is None)."""
+    window = []
+    for item in items:
+        window.append(item)
+        if size and len(window) >= size:
+            yield window
+            window = []
+    if window:
+        yield window
+
+
+class SrtWriter:
+    """Appends cues to an SRT file, formatted exactly like pysrt's save()."""
+
+    def __init__(self, path, eol=os.linesep, encoding="utf-8"):
+        self.path = path
+        self.eol = eol
+        self._file = open(path, "w", encoding=encoding, newline="")
+
+    def write(self, items):
+        pysrt.SubRipFile(list(items), eol=self.eol).write_into(self._file)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JsonReportWriter:
+    """
+    Writes {"<list_key>": [entries...], <fields>} incrementally: entries are
+    appended as they are produced and the remaining top-level fields (e.g.
+    metadata, which is only known at the end) are written by close().
+    The layout matches json.dump(..., indent=2).
+    """
+
+    def __init__(self, path, list_key, encoding="utf-8"):
+        self.path = path
+        self._file = open(path, "w", encoding=encoding)
+        self._file.write("{\n" + f"  {json.dumps(list_key)}: [")
+        self._count = 0
+
+    @staticmethod
+    def _indent(value, level):
+        text = json.dumps(value, indent=2, ensure_ascii=False)
+        return text.replace("\n", "\n" + " " * level)
+
+    def add(self, entries):
+        for entry in entries:
+            self._file.write(("," if self._count else "") + "\n    " + self._indent(entry, 4))
+            self._count += 1
+        self._file.flush()
+
+    def close(self, **fields):
+        self._file.write("\n  ]" if self._count else "]")
+        for key, value in fields.items():
+            self._file.write(f",\n  {json.dumps(key)}: " + self._indent(value, 2))
+        self._file.write("\n}")
+        self._file.close()
@@ -0,0 +1,249 @@
+# stage_pipeline.py
+# Overlapped execution of translate.py's three stages. Batches of lines flow
+# through bounded queues:
+#   forward (thread) -> back-translation (thread) -> embedding (caller's thread)
+# so batch k is back-translated and embedded while batch k+1 is still being
+# forward-translated. The forward batches are exactly the token-budgeted,
+# length-bucketed generate() batches of the sequential path (translation
+# memory hits first), so forward translations are identical. Back-translation
+# and embedding then run per forward batch instead of over the whole file,
+# which groups and pads their inputs differently: results can differ from
+# the sequential path in the last digits (bench_overlap.py reports how much).
+#
+# torch's intra-op pool size is process-wide with the default OpenMP
+# backend, so the stages cannot get separate budgets: overlap_threads is one
+# torch.set_num_threads() for the whole process, set once for the run and
+# shared by all three concurrently busy stages (default: a third of the
+# budget, so the three together roughly fill it). The caller's thread count
+# is restored afterwards.
+import math
+import queue
+import threading
+import time
+import torch
+
+QUEUE_SIZE = 2  # batches buffered between two stages
+STAGES = ("forward", "back_translation", "embedding")
+
+_POLL_SECONDS = 0.1
+
+
+def default_overlap_threads(total=None):
+    """Process-wide torch thread count for an overlapped run: the budget over the concurrent stages."""
+    total = total or torch.get_num_threads()
+    return max(1, total // len(STAGES))
+
+
+def parse_overlap_threads(value):
+    """Positive process-wide torch thread count for --overlap-threads."""
+    threads = int(value)
+    if threads < 1:
+        raise ValueError("Overlap threads must be a positive integer")
+    return threads
+
+
+def _put(q, item, stop):
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, stop, errors):
+    while True:
+        if errors:
+            raise errors[0]
+        try:
+            return q.get(timeout=_POLL_SECONDS)
+        except queue.Empty:
+            if stop.is_set() and not errors:
+                return None
+
+
+def overlapped_translate(texts, cues, overlap_threads=None, reporter=None, tm_stats=None, queue_size=QUEUE_SIZE,
+                         durations=None, **settings):
+    """
+    translate_lines() with the forward, back-translation and embedding stages
+    overlapped. Takes the same settings and returns the same dict; reporter,
+    if given, advances a "batches" stage as each batch leaves the pipeline.
+    tm_stats gets the usual counts plus per-stage busy time in "overlap".
+    """
+    from translate import (BEAM_SIZE, CACHE_STAGES, add_stage_seconds, count_line_lookups, encode_texts,
+                           iter_translate_text, translate_lines, translate_text)
+    from inference_backend import memory_key
+    from model_registry import get_registry, marian_model_name
+    from sentence_transformers import util
+
+    if settings.get("adaptive_threshold") is not None or settings.get("triage_rate") is not None:
+        raise ValueError("--overlap can't be combined with --adaptive or --triage")
+    if settings.get("skip_back_translation") or not texts:
+        return translate_lines(texts, cues, tm_stats=tm_stats, durations=durations, **settings)
+
+    src_lang, tgt_lang = settings["src_lang"], settings["tgt_lang"]
+    backend, sbert_name = settings["backend"], settings["sbert_name"]
+    overlap_threads = overlap_threads or default_overlap_threads()
+    if tm_stats is None:
+        tm_stats = {"forward": {"hits": 0, "misses": 0}, "back_translation": {"hits": 0, "misses": 0},
+                    "embedding": {"hits": 0, "misses": 0}}
+
+    registry = get_registry()
+    (tokenizer, model), (bt_tokenizer, bt_model) = registry.marian_pair(src_lang, tgt_lang, backend=backend)
+    sbert_model = registry.sentence_transformer(sbert_name)
+    forward_key = memory_key(marian_model_name(src_lang, tgt_lang), backend)
+    bt_key = memory_key(marian_model_name(tgt_lang, src_lang), backend)
+
+    non_cue = [i for i in range(len(texts)) if not cues[i]]
+    translated_q = queue.Queue(maxsize=queue_size)
+    back_q = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+    busy = dict.fromkeys(STAGES, 0.0)
+    batch_count = [0]
+    lookups = [{stage: [0, 0] for stage in CACHE_STAGES} for _ in texts] if settings.get("line_stats") else None
+
+    def record(stage, lines, hit_lines):  # each stage only touches its own counters
+        if lookups is not None:
+            count_line_lookups(lookups, stage, lines, hit_lines)
+
+    def forward_stage():
+        # Sound cues are kept as-is and only go through the later stages
+        cue_lines = [i for i in range(len(texts)) if cues[i]]
+        if cue_lines and not _put(translated_q, (cue_lines, [texts[i] for i in cue_lines], [1.0] * len(cue_lines)),
+                                  stop):
+            return
+        hits = []
+        batches = iter_translate_text(
+            [texts[i] for i in non_cue], model, tokenizer, forward_key, tm_stats["forward"],
+            num_beams=BEAM_SIZE, with_scores=True, hit_lines=hits
+        )
+        while True:
+            start = time.time()
+            batch = next(batches, None)
+            busy["forward"] += time.time() - start
+            if batch is None:
+                record("forward", non_cue, hits)
+                break
+            indices, outputs = batch
+            lines = [non_cue[i] for i in indices]
+            item = (lines, [text for text, _ in outputs], [math.exp(log_prob) for _, log_prob in outputs])
+            if not _put(translated_q, item, stop):
+                return
+        _put(translated_q, None, stop)
+
+    def back_translation_stage():
+        while True:
+            item = _get(translated_q, stop, [])
+            if item is None:
+                break
+            start = time.time()
+            hits = []
+            bt_texts = translate_text(
+                item[1], bt_model, bt_tokenizer, bt_key, tm_stats["back_translation"], hit_lines=hits,
+                **(settings.get("bt_decode") or {})
+            )
+            record("back_translation", item[0], hits)
+            busy["back_translation"] += time.time() - start
+            if not _put(back_q, item + (bt_texts,), stop):
+                return
+        _put(back_q, None, stop)
+
+    def run(stage):  # errors surface in the caller's thread
+        try:
+            stage()
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+    threads = [threading.Thread(target=run, args=(stage,), daemon=True)
+               for stage in (forward_stage, back_translation_stage)]
+    caller_threads = torch.get_num_threads()
+    wall_start = time.time()
+    if reporter is not None:
+        reporter.start_stage("batches", len(texts))
+    results = []
+    try:
+        torch.set_num_threads(overlap_threads)  # once, before any stage runs
+        for thread in threads:
+            thread.start()
+        while True:
+            item = _get(back_q, stop, errors)
+            if item is None:
+                break
+            lines, trans, confidences, bt_texts = item
+            start = time.time()
+            orig_hits, bt_hits = [], []
+            orig_emb = encode_texts(
+                sbert_model, [texts[i] for i in lines], sbert_name, tm_stats["embedding"], hit_lines=orig_hits
+            )
+            bt_emb = encode_texts(sbert_model, bt_texts, sbert_name, tm_stats["embedding"], hit_lines=bt_hits)
+            record("embedding", lines, orig_hits)
+            record("embedding", lines, bt_hits)
+            busy["embedding"] += time.time() - start
+            results.append((lines, trans, confidences, bt_texts, orig_emb, bt_emb))
+            batch_count[0] += 1
+            if reporter is not None:
+                reporter.advance(len(lines))  # may raise to cancel the job
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        torch.set_num_threads(caller_threads)
+    if errors:
+        raise errors[0]
+    if reporter is not None:
+        reporter.end_stage()
+    wall_seconds = time.time() - wall_start
+
+    for stage, seconds in busy.items():
+        add_stage_seconds(tm_stats, stage, seconds)
+    overlap_stats = tm_stats.setdefault("overlap", {})
+    for key, value in [("wall_seconds", wall_seconds), ("batches", batch_count[0])] + \
+            [(f"{s}_busy_seconds", busy[s]) for s in STAGES]:
+        overlap_stats[key] = overlap_stats.get(key, 0) + value
+
+    # Batches finish in length order; put every line back at its position
+    translated, confidences, back_translated = [None] * len(texts), [None] * len(texts), [None] * len(texts)
+    for lines, trans, confs, bt_texts, _, _ in results:
+        for i, text, confidence, bt_text in zip(lines, trans, confs, bt_texts):
+            translated[i], confidences[i], back_translated[i] = text, confidence, bt_text
+    order = [i for r in results for i in r[0]]
+    orig_emb = results[0][4].new_empty((len(texts), results[0][4].shape[1]))
+    bt_emb = torch.empty_like(orig_emb)
+    orig_emb[order] = torch.cat([r[4] for r in results])
+    bt_emb[order] = torch.cat([r[5] for r in results])
+    result = {
+        "translated": translated,
+        "confidences": confidences,
+        "back_translated": back_translated,
+        "orig_emb": orig_emb,
+        "bt_emb": bt_emb,
+        "similarities": util.cos_sim(orig_emb, bt_emb).diagonal().tolist(),
+        "escalated": [False] * len(texts)
+    }
+    if lookups is not None:
+        result["lookups"] = lookups
+    return result
+
+
+def overlap_summary(stats, overlap_threads):
+    """Process-wide torch threads, batches, and each stage's busy time and utilization (busy / pipeline wall time)."""
+    if not stats:
+        return None
+    wall = stats["wall_seconds"]
+    return {
+        "overlap_threads": overlap_threads,
+        "batches": stats["batches"],
+        "wall_seconds": round(wall, 2),
+        "stages": {
+            stage: {
+                "busy_seconds": round(stats[f"{stage}_busy_seconds"], 2),
+                "utilization": round(stats[f"{stage}_busy_seconds"] / wall, 3) if wall else None
+            }
+            for stage in STAGES
+        },
+        # How much of the sequential time (sum of stages) the overlap hid
+        "overlap_factor": round(sum(stats[f"{s}_busy_seconds"] for s in STAGES) / wall, 2) if wall else None
+    }
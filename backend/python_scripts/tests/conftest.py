@@ -0,0 +1,44 @@
+# The scripts import each other as top-level modules (python translate.py ...)
+import os
+import sys
+
+import pytest
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPTS_DIR)
+
+EN_SRT = os.path.join(SCRIPTS_DIR, "..", "en.srt")
+
+
+@pytest.fixture(scope="session")
+def tiny_model_dir(tmp_path_factory):
+    """Tiny random-weight checkpoints of every model the scripts load, built once by bench_suite.py."""
+    pytest.importorskip("sentencepiece")
+    import bench_suite
+    model_dir = str(tmp_path_factory.mktemp("models"))
+    bench_suite.ensure_models(model_dir, bench_suite.source_lines(EN_SRT))
+    return model_dir
+
+
+@pytest.fixture
+def tiny_models(tiny_model_dir, tmp_path, monkeypatch):
+    """Load models from tiny_model_dir, with a fresh registry and the translation memory and embedding cache off."""
+    import embedding_cache
+    import inference_backend
+    import model_registry
+    import translation_memory
+    monkeypatch.setattr(inference_backend, "LOCAL_MODEL_DIR", tiny_model_dir)
+    monkeypatch.setattr(inference_backend, "CONVERTED_DIR", str(tmp_path / "converted"))
+    monkeypatch.setattr(translation_memory, "DEFAULT_TM_PATH", "off")
+    monkeypatch.setattr(translation_memory, "_memory", None)
+    monkeypatch.setattr(embedding_cache, "DEFAULT_CACHE_DIR", "off")
+    monkeypatch.setattr(model_registry, "_registry", None)
+    return tiny_model_dir
+
+
+@pytest.fixture
+def srt_file(tmp_path):
+    """A 30-cue SRT from backend/en.srt's vocabulary."""
+    import bench_suite
+    vocabulary = sorted(set(w for line in bench_suite.source_lines(EN_SRT) for w in bench_suite._WORD.findall(line)))
+    return bench_suite.synthetic_srt(str(tmp_path / "input.srt"), 30, vocabulary)
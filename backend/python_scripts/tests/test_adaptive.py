@@ -0,0 +1,78 @@
+import pytest
+
+from translate import adaptive_summary, is_sound_cue, translate_lines
+
+TEXTS = [
+    "I want you to hit me as hard as you can.",
+    "[MUSIC]",
+    "Where are you going?",
+    "Stop right there.",
+    "We need to talk about the club.",
+    "Nobody knows.",
+]
+
+
+def stats(**overrides):
+    values = {"lines": 10, "escalated": 4, "improved": 2, "greedy_decoded": 10, "beam_decoded": 4,
+              "greedy_seconds": 1.0, "beam_seconds": 2.0, "rescoring_seconds": 0.5}
+    values.update(overrides)
+    return values
+
+
+def test_summary_extrapolates_from_decoded_lines():
+    summary = adaptive_summary(stats(), 0.8)
+    # 0.5 s per beam-decoded line over the 10 decoded lines, against 3.5 s spent
+    assert summary["estimated_full_beam_seconds"] == 5.0
+    assert summary["estimated_seconds_saved"] == 1.5
+
+
+def test_summary_ignores_translation_memory_hits():
+    # Half the lines came from the translation memory in both passes
+    summary = adaptive_summary(stats(greedy_decoded=5, beam_decoded=2, beam_seconds=1.0), 0.8)
+    assert summary["estimated_full_beam_seconds"] == 2.5
+
+
+def test_summary_without_decoded_escalations():
+    # Every escalated line was a memory hit: there is no beam time to extrapolate from
+    summary = adaptive_summary(stats(beam_decoded=0, beam_seconds=0.001), 0.8)
+    assert summary["escalated"] == 4
+    assert summary["estimated_full_beam_seconds"] is None
+    assert summary["estimated_seconds_saved"] is None
+    assert adaptive_summary(None, 0.8) is None
+
+
+def adaptive_run(threshold):
+    cues = [is_sound_cue(t) for t in TEXTS]
+    tm_stats = {"forward": {"hits": 0, "misses": 0}, "back_translation": {"hits": 0, "misses": 0},
+                "embedding": {"hits": 0, "misses": 0}}
+    result = translate_lines(TEXTS, cues, "en", "es", adaptive_threshold=threshold, tm_stats=tm_stats)
+    return result, tm_stats["adaptive"]
+
+
+def test_escalates_exactly_the_lines_below_the_threshold(tiny_models):
+    # Nothing is below -2, so these are the greedy similarities
+    greedy, greedy_stats = adaptive_run(-2.0)
+    assert greedy["escalated"] == [False] * len(TEXTS)
+    assert greedy_stats["escalated"] == 0 and greedy_stats["lines"] == 5
+
+    spoken = [sim for text, sim in zip(TEXTS, greedy["similarities"]) if not is_sound_cue(text)]
+    threshold = sorted(spoken)[len(spoken) // 2]
+    result, adaptive = adaptive_run(threshold)
+    expected = [not is_sound_cue(t) and sim < threshold for t, sim in zip(TEXTS, greedy["similarities"])]
+    assert result["escalated"] == expected
+    assert adaptive["escalated"] == sum(expected) == adaptive["beam_decoded"]
+    for i, escalated in enumerate(expected):
+        if escalated:
+            # The better-scoring of the greedy and beam translations is kept
+            assert result["similarities"][i] >= greedy["similarities"][i] - 1e-6
+            assert result["improved"][i] == (result["translated"][i] != greedy["translated"][i])
+        else:
+            assert result["translated"][i] == greedy["translated"][i]
+            assert result["similarities"][i] == pytest.approx(greedy["similarities"][i])
+
+
+def test_every_line_escalates_above_any_similarity(tiny_models):
+    result, adaptive = adaptive_run(2.0)
+    assert result["escalated"] == [not is_sound_cue(t) for t in TEXTS]
+    assert adaptive["escalated"] == adaptive["lines"] == 5
+    assert result["translated"][1] == "[MUSIC]"
@@ -0,0 +1,38 @@
+from batching import fixed_batches, padding_stats, token_budget_batches
+
+
+def test_every_index_once():
+    lengths = [5, 1, 9, 3, 3, 7, 2]
+    batches = token_budget_batches(lengths, max_tokens=12, max_batch_size=4)
+    assert sorted(i for b in batches for i in b) == list(range(len(lengths)))
+
+
+def test_batches_are_length_sorted_and_within_budget():
+    lengths = [5, 1, 9, 3, 3, 7, 2, 4]
+    batches = token_budget_batches(lengths, max_tokens=12, max_batch_size=4)
+    flat = [lengths[i] for b in batches for i in b]
+    assert flat == sorted(flat)
+    for b in batches:
+        assert len(b) <= 4
+        assert len(b) == 1 or max(lengths[i] for i in b) * len(b) <= 12
+
+
+def test_overlong_line_gets_its_own_batch():
+    assert token_budget_batches([2, 50, 2], max_tokens=10) == [[0, 2], [1]]
+
+
+def test_max_batch_size_closes_batches():
+    assert token_budget_batches([1] * 5, max_tokens=100, max_batch_size=2) == [[0, 1], [2, 3], [4]]
+
+
+def test_empty():
+    assert token_budget_batches([]) == []
+
+
+def test_padding_stats():
+    lengths = [1, 4, 1, 4]
+    bucketed = padding_stats(lengths, token_budget_batches(lengths, max_tokens=8))
+    fixed = padding_stats(lengths, fixed_batches(len(lengths), 2))
+    assert bucketed["real_tokens"] == fixed["real_tokens"] == 10
+    assert bucketed["padded_tokens"] == 10 and bucketed["padding_ratio"] == 0.0
+    assert fixed["padded_tokens"] == 16
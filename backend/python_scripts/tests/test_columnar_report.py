@@ -0,0 +1,129 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from columnar_report import ColumnarReport, ColumnarReportWriter, JsonReport, convert_json, open_report, write_report
+
+RECORDS = [
+    {"index": 1, "original": "Hello", "translated": "Hola", "confidence": 0.9, "novelty": False,
+     "back_translation_match": 0.95},
+    {"index": 2, "original": "Ünïcode ✓", "translated": "", "confidence": 1, "novelty": True,
+     "back_translation_match": None, "escalated": True},
+]
+METADATA = {"src_lang": "en", "tgt_lang": "es", "lines_translated": 2}
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "translated_1.npz")
+    write_report(path, "subtitles", RECORDS, metadata=METADATA)
+    with ColumnarReport(path) as report:
+        assert report.length == 2
+        assert report.fields == {"metadata": METADATA}
+        data = report.to_dict()
+    # Columns missing from a record come back as None
+    assert data["subtitles"][0] == dict(RECORDS[0], escalated=None)
+    assert data["subtitles"][1] == RECORDS[1]
+    assert data["metadata"] == METADATA
+
+
+def test_column_kinds(tmp_path):
+    path = str(tmp_path / "r.npz")
+    write_report(path, "subtitles", RECORDS)
+    with ColumnarReport(path) as report:
+        assert report.kinds["index"] == "int"
+        assert report.kinds["confidence"] == "float"
+        assert report.kinds["novelty"] == "bool"
+        assert report.kinds["original"] == "str"
+        assert report.kinds["back_translation_match"] == "float"  # None is masked, not a kind
+        assert report.kinds["escalated"] == "bool"
+        assert isinstance(report.column("index"), np.ndarray)
+        assert report.column("back_translation_match").tolist() == [0.95, None]
+        assert report.column("original") == ["Hello", "Ünïcode ✓"]
+        assert list(report.records(["index"])) == [{"index": 1}, {"index": 2}]
+
+
+def test_nullable_int_keeps_its_dtype(tmp_path):
+    path = str(tmp_path / "r.npz")
+    write_report(path, "report", [{"n": 1}, {"n": None}, {"n": 3}])
+    with ColumnarReport(path) as report:
+        column = report.column("n")
+        assert report.kinds["n"] == "int"
+        assert column.dtype == np.int64
+        assert column.mask.tolist() == [False, True, False]
+        assert [r["n"] for r in report.records()] == [1, None, 3]
+        assert all(isinstance(r["n"], (int, type(None))) for r in report.records())
+
+
+def test_writer_flushes_each_add(tmp_path):
+    path = str(tmp_path / "r.npz")
+    writer = ColumnarReportWriter(path, "subtitles")
+    writer.add([{"index": 1, "score": 1, "text": "a"}, {"index": 2, "score": None, "text": "b"}])
+    writer.add([{"index": 3, "score": 0.5, "text": None, "escalated": True}])
+    writer.add([{"index": 4, "score": 2, "text": "d"}])
+    tmp = writer._tmp
+    assert os.listdir(tmp)  # windows are on disk, not in the writer
+    writer.close(metadata={"lines": 4})
+    assert not os.path.exists(tmp)
+    with ColumnarReport(path) as report:
+        assert report.kinds == {"index": "int", "score": "float", "text": "str", "escalated": "bool"}
+        assert report.column("index").tolist() == [1, 2, 3, 4]
+        assert report.column("score").tolist() == [1.0, None, 0.5, 2.0]  # ints widened to the float chunk
+        assert report.column("text") == ["a", "b", None, "d"]
+        assert report.column("escalated").tolist() == [None, None, True, None]
+        assert report.fields == {"metadata": {"lines": 4}}
+
+
+def test_writer_falls_back_to_json_for_mixed_chunks(tmp_path):
+    path = str(tmp_path / "r.npz")
+    writer = ColumnarReportWriter(path, "report")
+    writer.add([{"value": 1}])
+    writer.add([{"value": "two"}, {"value": None}])
+    writer.add([{"value": [3]}])
+    writer.close()
+    with ColumnarReport(path) as report:
+        assert report.kinds["value"] == "json"
+        assert report.column("value") == [1, "two", None, [3]]
+
+
+def test_dataframe_uses_nullable_dtypes(tmp_path):
+    pd = pytest.importorskip("pandas")
+    path = str(tmp_path / "r.npz")
+    write_report(path, "report", [{"n": 1, "x": 1.5}, {"n": None, "x": 2.5}])
+    with ColumnarReport(path) as report:
+        frame = report.to_dataframe()
+    assert str(frame["n"].dtype) == "Int64" and pd.isna(frame["n"][1])
+    assert frame["x"].dtype == np.float64
+
+
+def test_empty_report(tmp_path):
+    path = str(tmp_path / "r.npz")
+    write_report(path, "report", [], summary={"num_lines": 0})
+    with ColumnarReport(path) as report:
+        assert report.to_dict() == {"report": [], "summary": {"num_lines": 0}}
+
+
+def test_rejects_other_npz(tmp_path):
+    path = str(tmp_path / "other.npz")
+    np.savez(path, __header__=np.frombuffer(json.dumps({"format": "x"}).encode(), dtype=np.uint8))
+    with pytest.raises(ValueError):
+        ColumnarReport(path)
+
+
+def test_convert_json_and_open_report(tmp_path):
+    json_path = tmp_path / "similarity_1.json"
+    json_path.write_text(json.dumps({"report": RECORDS, "summary": {"num_lines": 2}}), encoding="utf-8")
+    npz_path = convert_json(str(json_path), remove_json=False)
+    assert npz_path.endswith("similarity_1.npz") and json_path.exists()
+    with open_report(str(json_path)) as as_json, open_report(npz_path) as as_npz:
+        assert isinstance(as_json, JsonReport) and isinstance(as_npz, ColumnarReport)
+        assert as_npz.to_dict()["summary"] == as_json.to_dict()["summary"]
+        assert as_npz.column("original") == as_json.column("original")
+
+
+def test_json_report_accepts_bare_list(tmp_path):
+    path = tmp_path / "similarity_old.json"
+    path.write_text(json.dumps(RECORDS), encoding="utf-8")
+    report = JsonReport(str(path))
+    assert report.list_key == "report" and report.length == 2
@@ -0,0 +1,175 @@
+import random
+
+import pysrt
+
+from cue_alignment import (
+    ALIGN_TOLERANCE_MS, AlignedPairs, aligned_pairs, alignment_counts, cue_interval, group_kind
+)
+
+
+def cues(*spans):
+    """pysrt cues from (start_ms, end_ms[, text]) tuples, numbered from 1."""
+    items = []
+    for i, span in enumerate(spans):
+        start, end = span[:2]
+        text = span[2] if len(span) > 2 else f"line {i + 1}"
+        items.append(pysrt.SubRipItem(i + 1, pysrt.SubRipTime(milliseconds=start),
+                                      pysrt.SubRipTime(milliseconds=end), text))
+    return items
+
+
+def align(original, translated, **kwargs):
+    stream = AlignedPairs(original, translated, str.strip, **kwargs)
+    return list(stream), stream
+
+
+def kinds(pairs):
+    return [p["alignment"] for p in pairs]
+
+
+def test_group_kind():
+    assert group_kind([1], [1]) == "1:1"
+    assert group_kind([1], [1, 2]) == "1:n"
+    assert group_kind([1, 2], [1]) == "n:1"
+    assert group_kind([1, 2], [1, 2]) == "n:m"
+    assert group_kind([], [1]) == "unmatched"
+
+
+def test_one_to_one_with_jitter():
+    pairs, _ = align(cues((0, 1000, "a"), (1000, 2000, "b")), cues((0, 1050, "A"), (1050, 2000, "B")))
+    assert kinds(pairs) == ["1:1", "1:1"]
+    assert [(p["original"], p["translated"]) for p in pairs] == [("a", "A"), ("b", "B")]
+    assert [p["original_positions"] for p in pairs] == [[0], [1]]
+
+
+def test_split_and_merge():
+    original = cues((0, 4000, "one long line"), (5000, 6000, "x"), (6000, 7000, "y"))
+    translated = cues((0, 2000, "first half"), (2000, 4000, "second half"), (5000, 7000, "xy"))
+    pairs, stream = align(original, translated)
+    assert kinds(pairs) == ["1:n", "n:1"]
+    assert pairs[0]["translated"] == "first half second half"
+    assert pairs[0]["translated_cues"] == [1, 2]
+    assert pairs[1]["original_cues"] == [2, 3]
+    assert stream.counts == {"1:n": 1, "n:1": 1, "unmatched_original": 0, "unmatched_translated": 0}
+
+
+def test_unmatched_cues():
+    original = cues((0, 1000), (3000, 4000))
+    translated = cues((0, 1000), (1500, 2500, "extra"), (3000, 4000))
+    pairs, stream = align(original, translated)
+    assert kinds(pairs) == ["1:1", "1:1"]
+    assert [c["text"] for c in stream.unmatched["translated"]] == ["extra"]
+    assert stream.unmatched["original"] == []
+    assert alignment_counts(pairs, stream.unmatched) == stream.counts
+
+
+def test_rolling_captions_do_not_chain():
+    # Auto-captions overlap their neighbours; each still pairs with its own counterpart
+    original = cues((0, 2000), (1500, 3500), (3000, 5000))
+    translated = cues((0, 2000), (1500, 3500), (3000, 5000))
+    pairs, _ = align(original, translated)
+    assert kinds(pairs) == ["1:1", "1:1", "1:1"]
+    assert [p["translated_positions"] for p in pairs] == [[0], [1], [2]]
+
+
+def test_empty_side():
+    pairs, stream = align(cues((0, 1000)), [])
+    assert pairs == [] and stream.counts["unmatched_original"] == 1
+
+
+def test_streams_lazily():
+    read = [0]
+
+    def counted(items):
+        for item in items:
+            read[0] += 1
+            yield item
+
+    spans = [(i * 1000, i * 1000 + 900) for i in range(1000)]
+    stream = iter(AlignedPairs(counted(cues(*spans)), counted(cues(*spans)), str.strip))
+    assert next(stream)["alignment"] == "1:1"
+    assert read[0] < 10  # the first pair comes out long before the files are read
+
+
+def reference_groups(original, translated, tolerance_ms=ALIGN_TOLERANCE_MS):
+    """Every cue linked to its best partner by comparing all pairs; groups as sets of (side, position)."""
+    sides = [[cue_interval(sub) for sub in original], [cue_interval(sub) for sub in translated]]
+    parent = {(side, i): (side, i) for side in (0, 1) for i in range(len(sides[side]))}
+
+    def find(node):
+        while parent[node] != node:
+            node = parent[node]
+        return node
+    for side in (0, 1):
+        for i, (start, end) in enumerate(sides[side]):
+            min_overlap = min(tolerance_ms, max(0, end - start) // 4)
+            best, best_key = None, None
+            for j, (other_start, other_end) in enumerate(sides[1 - side]):
+                overlap = min(end, other_end) - max(start, other_start)
+                key = (overlap, -abs(start - other_start) - abs(end - other_end), -other_start, -j)
+                if overlap > min_overlap and (best_key is None or key > best_key):
+                    best, best_key = j, key
+            if best is not None:
+                parent[find((side, i))] = find((1 - side, best))
+    groups = {}
+    for node in parent:
+        groups.setdefault(find(node), set()).add(node)
+    return sorted(sorted(group) for group in groups.values())
+
+
+def streamed_groups(original, translated):
+    pairs, stream = align(original, translated)
+    groups = [[(0, i) for i in p["original_positions"]] + [(1, i) for i in p["translated_positions"]]
+              for p in pairs]
+    positions = [{sub.index: i for i, sub in enumerate(subs)} for subs in (original, translated)]
+    for side, name in ((0, "original"), (1, "translated")):
+        groups.extend([(side, positions[side][c["index"]])] for c in stream.unmatched[name])
+    return sorted(sorted(group) for group in groups), pairs
+
+
+def test_matches_all_pairs_reference():
+    rng = random.Random(1)
+    for _ in range(200):
+        def random_spans(n):
+            start, spans = 0, []
+            for _ in range(n):
+                start += rng.randint(0, 1500)
+                # now and then a cue that runs far past its neighbours
+                length = rng.randint(5000, 40000) if rng.random() < 0.05 else rng.randint(50, 3000)
+                spans.append((start, start + length))
+            return spans
+        original, translated = cues(*random_spans(rng.randint(0, 40))), cues(*random_spans(rng.randint(0, 40)))
+        groups, pairs = streamed_groups(original, translated)
+        assert groups == reference_groups(original, translated)
+        # Groups come out in order of their earliest cue
+        firsts = [min([(original[i].start.ordinal, 0) for i in p["original_positions"]] +
+                      [(translated[i].start.ordinal, 1) for i in p["translated_positions"]]) for p in pairs]
+        assert firsts == sorted(firsts)
+
+
+def test_long_cue_is_aligned_exactly():
+    # A whole-file caption links with its best partner however far the file runs; no cue is settled early
+    spans = [(i * 1000, i * 1000 + 900) for i in range(1000)]
+    original = cues((0, 1000000, "caption"), *spans)
+    translated = cues(*spans)
+    groups, pairs = streamed_groups(original, translated)
+    assert groups == reference_groups(original, translated)
+    assert len(pairs) == 1000 and kinds(pairs).count("1:1") == 999
+
+
+def test_every_cue_accounted_for_once():
+    rng = random.Random(0)
+    for _ in range(50):
+        def random_spans(n):
+            start, spans = 0, []
+            for _ in range(n):
+                start += rng.randint(0, 1500)
+                spans.append((start, start + rng.randint(100, 3000)))
+            return spans
+        original, translated = cues(*random_spans(30)), cues(*random_spans(25))
+        pairs, unmatched = aligned_pairs(original, translated, str.strip)
+        seen_original = [i for p in pairs for i in p["original_cues"]] + [c["index"] for c in unmatched["original"]]
+        seen_translated = [i for p in pairs for i in p["translated_cues"]] + \
+            [c["index"] for c in unmatched["translated"]]
+        assert sorted(seen_original) == list(range(1, 31))
+        assert sorted(seen_translated) == list(range(1, 26))
@@ -0,0 +1,97 @@
+import pytest
+import torch
+
+from embedding_cache import normalize_text
+from translate_jobs import DedupResults
+
+TEXTS = ["Hello", "[Music]", "See you"]  # unique lines of a batch, in first-seen order
+CUES = [False, True, False]
+
+
+def lookups(forward, back_translation, embedding):
+    return {"forward": forward, "back_translation": back_translation, "embedding": embedding}
+
+
+def shared_result(adaptive=False):
+    result = {
+        "translated": ["Hola", "[Music]", "Nos vemos"],
+        "confidences": [0.9, 1.0, 0.8],
+        "back_translated": ["Hello", "[Music]", "See you"],
+        "orig_emb": torch.arange(6, dtype=torch.float32).reshape(3, 2),
+        "bt_emb": None,
+        "similarities": [0.95, 1.0, 0.6],
+        "escalated": [False, False, adaptive],
+        "lookups": [
+            lookups([1, 0], [0, 1], [1, 1]),  # forward from memory, the rest computed
+            lookups([0, 0], [1, 0], [2, 0]),  # cue: never forward-translated
+            lookups([0, 2], [0, 2], [0, 4]) if adaptive else lookups([0, 1], [0, 1], [0, 2]),
+        ]
+    }
+    if adaptive:
+        result["improved"] = [False, False, True]
+    return result
+
+
+def empty_stats():
+    return {stage: {"hits": 0, "misses": 0} for stage in ("forward", "back_translation", "embedding")}
+
+
+def test_lookup_matches_a_translate_lines_result():
+    shared = DedupResults([normalize_text(t) for t in TEXTS], shared_result(), CUES)
+    out = shared.lookup(["See  you", "Hello", "See you"])  # whitespace differences share a line
+    assert out["translated"] == ["Nos vemos", "Hola", "Nos vemos"]
+    assert out["similarities"] == [0.6, 0.95, 0.6]
+    assert out["bt_emb"] is None
+    assert torch.equal(out["orig_emb"], torch.tensor([[4.0, 5.0], [0.0, 1.0], [4.0, 5.0]]))
+
+
+def test_unknown_line_raises():
+    shared = DedupResults([normalize_text(t) for t in TEXTS], shared_result(), CUES)
+    with pytest.raises(KeyError):
+        shared.lookup(["Not in the batch"])
+
+
+def test_cache_stats_go_to_first_occurrence_and_repeats_are_hits():
+    shared = DedupResults([normalize_text(t) for t in TEXTS], shared_result(), CUES)
+    first, second = empty_stats(), empty_stats()
+    shared.lookup(["Hello", "[Music]", "Hello"], first)
+    shared.lookup(["See you", "Hello"], second)
+    assert first == {
+        "forward": {"hits": 2, "misses": 0},
+        "back_translation": {"hits": 2, "misses": 1},
+        "embedding": {"hits": 5, "misses": 1},
+    }
+    assert second == {
+        "forward": {"hits": 1, "misses": 1},
+        "back_translation": {"hits": 1, "misses": 1},
+        "embedding": {"hits": 2, "misses": 2},
+    }
+    # Over the batch, misses add up to the shared run's
+    total = sum(line[stage][1] for line in shared_result()["lookups"] for stage in line)
+    assert total == sum(s["misses"] for stats in (first, second) for s in stats.values())
+
+
+def test_no_attribution_without_tm_stats_or_lookups():
+    result = shared_result()
+    del result["lookups"]
+    shared = DedupResults([normalize_text(t) for t in TEXTS], result, CUES)
+    stats = empty_stats()
+    shared.lookup(["Hello"], stats)
+    assert stats == empty_stats()
+    assert "adaptive" not in stats
+
+
+def test_adaptive_stats_are_split_per_file():
+    adaptive = {"lines": 2, "escalated": 1, "improved": 1, "greedy_decoded": 2, "beam_decoded": 1,
+                "greedy_seconds": 2.0, "beam_seconds": 3.0, "rescoring_seconds": 1.0}
+    shared = DedupResults([normalize_text(t) for t in TEXTS], shared_result(adaptive=True), CUES, adaptive)
+    first, second = empty_stats(), empty_stats()
+    shared.lookup(["Hello", "[Music]", "See you"], first)
+    shared.lookup(["See you"], second)
+    assert first["adaptive"] == {"lines": 2, "escalated": 1, "improved": 1, "greedy_decoded": 2.0,
+                                 "beam_decoded": 1.0, "greedy_seconds": 2.0, "beam_seconds": 3.0,
+                                 "rescoring_seconds": 1.0}
+    # The repeat reuses the escalated result without decoding or spending any time
+    assert second["adaptive"] == {"lines": 1, "escalated": 1, "improved": 1, "greedy_decoded": 0,
+                                  "beam_decoded": 0, "greedy_seconds": 0.0, "beam_seconds": 0.0,
+                                  "rescoring_seconds": 0.0}
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+import torch
+
+import embedding_cache
+from embedding_cache import EmbeddingCache, cached_encode, normalize_text
+
+DIM = 8
+
+
+class FakeModel:
+    """Deterministic vectors per text, counting what gets encoded."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def get_sentence_embedding_dimension(self):
+        return DIM
+
+    def encode(self, texts, **_):
+        self.encoded.extend(texts)
+        return np.stack([np.random.default_rng(len(t) * 7919 + sum(map(ord, t))).standard_normal(DIM)
+                         for t in texts]).astype(np.float32)
+
+
+@pytest.fixture
+def cache_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "DEFAULT_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(embedding_cache, "_caches", {})
+    return str(tmp_path)
+
+
+def test_memmap_round_trip(tmp_path):
+    vectors = np.random.default_rng(0).standard_normal((3, DIM)).astype(np.float16)
+    EmbeddingCache("model", DIM, root=str(tmp_path)).store(["a", "b", "c"], vectors)
+    # A new instance (another process) reads the same rows back through the memory map
+    found = EmbeddingCache("model", DIM, root=str(tmp_path)).lookup(["c", "a", "missing"])
+    assert set(found) == {"a", "c"}
+    np.testing.assert_array_equal(found["a"], vectors[0])
+    np.testing.assert_array_equal(found["c"], vectors[2])
+
+
+def test_remaps_after_another_writer_appends(tmp_path):
+    reader = EmbeddingCache("model", DIM, root=str(tmp_path))
+    writer = EmbeddingCache("model", DIM, root=str(tmp_path))
+    writer.store(["a"], np.ones((1, DIM)))
+    assert set(reader.lookup(["a"])) == {"a"}
+    writer.store(["b"], np.full((1, DIM), 2.0))
+    np.testing.assert_array_equal(reader.lookup(["b"])["b"], np.full(DIM, 2.0, dtype=np.float16))
+
+
+def test_store_skips_cached_texts(tmp_path):
+    cache = EmbeddingCache("model", DIM, root=str(tmp_path))
+    cache.store(["a", "a"], np.stack([np.ones(DIM), np.zeros(DIM)]))
+    cache.store(["a"], np.zeros((1, DIM)))
+    np.testing.assert_array_equal(cache.lookup(["a"])["a"], np.ones(DIM, dtype=np.float16))
+
+
+def test_cached_encode_float16_tolerance(cache_root):
+    model = FakeModel()
+    texts = ["Hello there.", "Where are you?"]
+    exact = torch.from_numpy(FakeModel().encode(texts))
+    fresh = cached_encode(model, "fake", texts)
+    cached = cached_encode(model, "fake", texts)
+    assert fresh.dtype == cached.dtype == torch.float32
+    # Fresh vectors go through float16 too, so results don't depend on cache state
+    assert torch.equal(fresh, cached)
+    assert torch.allclose(fresh, exact, atol=1e-2, rtol=1e-3)
+    assert not torch.equal(fresh, exact)
+
+
+def test_cached_encode_hits_and_normalization(cache_root):
+    model = FakeModel()
+    stats = {}
+    cached_encode(model, "fake", ["Hello  there.", "Bye"], stats=stats)
+    hit_lines = []
+    cached_encode(model, "fake", ["Hello there.", "Bye", "New line", "New line"], stats=stats, hit_lines=hit_lines)
+    assert model.encoded == ["Hello there.", "Bye", "New line"]  # duplicates and whitespace variants encode once
+    assert hit_lines == [0, 1]
+    assert stats == {"hits": 2, "misses": 4}
+
+
+def test_invalidation_by_text_model_and_dimension(cache_root):
+    model = FakeModel()
+    cached_encode(model, "fake", ["Hello there."])
+    # Any change beyond whitespace is a different key
+    cached_encode(model, "fake", ["Hello there!"])
+    # Another model, or the same name at another dimension, has its own store
+    cached_encode(model, "other", ["Hello there."])
+    assert model.encoded == ["Hello there.", "Hello there!", "Hello there."]
+    assert EmbeddingCache("fake", DIM * 2, root=cache_root).lookup(["Hello there."]) == {}
+    assert normalize_text(" Hello \n there. ") == "Hello there."
+
+
+def test_disabled_cache_encodes_every_time(cache_root, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "DEFAULT_CACHE_DIR", "off")
+    model = FakeModel()
+    cached_encode(model, "fake", ["a b"])
+    cached_encode(model, "fake", ["a b"])
+    assert model.encoded == ["a b", "a b"]
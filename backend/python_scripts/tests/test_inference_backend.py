@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+import inference_backend
+from batching import batched_generate
+from inference_backend import converted_path, load_marian, memory_key
+
+MODEL = "Helsinki-NLP/opus-mt-en-es"
+TEXTS = ["Where are you going?", "I want you to hit me as hard as you can.", "Nobody knows."]
+
+
+def backend_or_skip(backend):
+    if backend == "onnx":
+        pytest.importorskip("optimum.onnxruntime")
+    return backend
+
+
+@pytest.mark.parametrize("backend", ["int8", "onnx"])
+@pytest.mark.parametrize("num_beams", [1, 2])
+def test_converted_backend_keeps_the_generate_interface(tiny_models, backend, num_beams):
+    tokenizer, model, size = load_marian(MODEL, backend_or_skip(backend))
+    assert size > 0  # converted models report their on-disk size
+
+    # The exact calls translate.py makes: plain, and scored from the same generate()
+    plain = batched_generate(TEXTS, model, tokenizer, num_beams=num_beams, max_length=16)
+    scored = batched_generate(TEXTS, model, tokenizer, num_beams=num_beams, max_length=16, with_scores=True)
+    assert len(plain) == len(scored) == len(TEXTS)
+    assert all(isinstance(text, str) for text in plain)
+    assert [text for text, _ in scored] == plain
+    assert all(log_prob <= 0.0 for _, log_prob in scored)
+
+
+@pytest.mark.parametrize("backend", ["int8", "onnx"])
+def test_conversion_is_cached(tiny_models, backend):
+    tokenizer, model, size = load_marian(MODEL, backend_or_skip(backend))
+    path = converted_path(MODEL, backend)
+    assert os.path.isdir(path)
+    before = {name: os.path.getmtime(os.path.join(path, name)) for name in os.listdir(path)}
+    _, reloaded, reloaded_size = load_marian(MODEL, backend)
+    assert reloaded_size == size
+    assert {name: os.path.getmtime(os.path.join(path, name)) for name in os.listdir(path)} == before
+    assert batched_generate(TEXTS, reloaded, tokenizer, num_beams=1, max_length=16) == \
+        batched_generate(TEXTS, model, tokenizer, num_beams=1, max_length=16)
+
+
+def test_backends_are_kept_apart(tiny_models):
+    assert memory_key(MODEL, "torch") == MODEL
+    assert memory_key(MODEL, "int8") != memory_key(MODEL, "onnx")
+    with pytest.raises(ValueError):
+        load_marian(MODEL, "cuda")
+
+
+def test_onnx_without_optimum_explains_the_install(tiny_models, monkeypatch):
+    monkeypatch.setattr(inference_backend, "ORTModelForSeq2SeqLM", None)
+    with pytest.raises(RuntimeError, match="optimum"):
+        load_marian(MODEL, "onnx")
+
+
+@pytest.mark.parametrize("backend", ["int8", "onnx"])
+def test_translate_lines_runs_on_converted_backends(tiny_models, backend):
+    from translate import is_sound_cue, translate_lines
+    texts = TEXTS + ["[MUSIC]"]
+    result = translate_lines(texts, [is_sound_cue(t) for t in texts], "en", "es", backend=backend_or_skip(backend))
+    assert len(result["translated"]) == len(result["similarities"]) == len(texts)
+    assert result["translated"][-1] == "[MUSIC]"
+    assert all(0.0 < confidence <= 1.0 for confidence in result["confidences"])
@@ -0,0 +1,49 @@
+import json
+
+import pysrt
+import pytest
+
+import manual_correction
+from columnar_report import open_report
+from translate import translate_srt
+
+
+@pytest.mark.parametrize("report_format", ["json", "npz"])
+def test_report_rescoring(tiny_models, srt_file, tmp_path, capsys, report_format):
+    result = translate_srt(srt_file, "en", "es", str(tmp_path / "out"), report_format=report_format)
+    with open_report(result["json_file"]) as stored:
+        before = stored.to_dict()
+    corrections = tmp_path / "corrections.json"
+    corrections.write_text(json.dumps([
+        {"index": 2, "corrected_translation": "Hola"},
+        {"index": 5, "corrected_translation": " ".join(["palabra"] * 40)},
+        {"index": 99, "corrected_translation": "out of range"},
+    ]), encoding="utf-8")
+
+    manual_correction.main([result["srt_file"], str(corrections), "--report", result["json_file"]])
+    output = json.loads(capsys.readouterr().out)
+    assert output["rescored_lines"] == 2
+
+    with open_report(result["json_file"]) as stored:
+        after = stored.to_dict()
+    subtitles, meta = after["subtitles"], after["metadata"]
+    for i, text in ((1, "Hola"), (4, " ".join(["palabra"] * 40))):
+        entry = subtitles[i]
+        assert entry["translated"] == text and entry["manually_corrected"]
+        assert entry["confidence"] is None  # the model never produced this text
+        assert -1.0 <= entry["back_translation_match"] <= 1.0
+    assert subtitles[4]["reading_speed_cps"] > before["subtitles"][4]["reading_speed_cps"]
+    # Untouched cues keep their scores (a columnar report stores manually_corrected as null for them)
+    for i in (0, 2, 3, 5):
+        entry = dict(subtitles[i])
+        assert not entry.pop("manually_corrected", None)
+        assert entry == before["subtitles"][i]
+
+    scored = [s["confidence"] for s in subtitles if s["confidence"] is not None]
+    assert len(scored) == len(subtitles) - 2
+    assert meta["avg_confidence"] == pytest.approx(sum(scored) / len(scored), abs=1e-3)
+    assert meta["avg_cps"] == pytest.approx(sum(s["reading_speed_cps"] for s in subtitles) / len(subtitles), abs=0.01)
+    assert meta["corrected_lines"] == [subtitles[1]["index"], subtitles[4]["index"]]
+    assert output["summary"]["avg_confidence"] == meta["avg_confidence"]
+    # The SRT is patched in place when there's a report
+    assert pysrt.open(result["srt_file"])[1].text == "Hola"
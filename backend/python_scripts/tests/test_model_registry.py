@@ -0,0 +1,94 @@
+import threading
+
+import pytest
+
+from model_registry import ModelRegistry
+
+MB = 1024 * 1024
+
+
+def loader(name, size_mb=1):
+    return lambda: (f"model {name}", size_mb * MB)
+
+
+def resident(registry):
+    return [name for _, name, _ in registry._models]
+
+
+def key(name):
+    return ("marian", name, "torch")
+
+
+def test_hits_and_misses():
+    registry = ModelRegistry(budget_mb=10)
+    assert registry.get(key("a"), loader("a")) == "model a"
+    assert registry.get(key("a"), loader("a")) == "model a"
+    assert (registry.hits, registry.misses) == (1, 1)
+
+
+def test_least_recently_used_is_evicted_first():
+    registry = ModelRegistry(budget_mb=2)
+    registry.get(key("a"), loader("a"))
+    registry.get(key("b"), loader("b"))
+    registry.get(key("a"), loader("a"))  # a is now the most recently used
+    registry.get(key("c"), loader("c"))
+    assert resident(registry) == ["a", "c"]
+    assert registry.evictions == 1
+    assert registry.stats()["resident_mb"] == 2.0
+
+
+def test_budget_counts_model_sizes():
+    registry = ModelRegistry(budget_mb=5)
+    registry.get(key("big"), loader("big", 3))
+    registry.get(key("small"), loader("small", 2))
+    assert resident(registry) == ["big", "small"]  # exactly at budget
+    registry.get(key("more"), loader("more", 1))
+    assert resident(registry) == ["small", "more"]
+
+
+def test_model_in_use_is_never_evicted():
+    registry = ModelRegistry(budget_mb=2)
+    registry.get(key("a"), loader("a"))
+    registry.acquire(key("a"))
+    registry.get(key("b"), loader("b"))
+    registry.get(key("c"), loader("c"))
+    assert resident(registry) == ["a", "c"]
+    registry.get(key("d"), loader("d"))
+    assert "a" in resident(registry)
+    registry.release(key("a"))
+    assert not registry.in_use(key("a"))
+    registry.get(key("e"), loader("e"))
+    assert "a" not in resident(registry)
+
+
+def test_session_keeps_its_models_until_exit():
+    registry = ModelRegistry(budget_mb=1)
+    with registry.session():
+        registry.get(key("a"), loader("a"))
+        registry.get(key("b"), loader("b"))  # over budget, but a is in use
+        assert resident(registry) == ["a", "b"]
+        assert registry.stats()["in_use"] == 2
+    # Leaving the session releases both and evicts back to the budget
+    assert resident(registry) == ["b"]
+    assert registry.stats()["in_use"] == 0
+
+
+def test_sessions_nest_and_are_per_thread():
+    registry = ModelRegistry(budget_mb=1)
+    with registry.session():
+        registry.get(key("a"), loader("a"))
+        with registry.session():
+            registry.get(key("a"), loader("a"))
+        assert registry.in_use(key("a"))  # still held by the outer session
+
+        # Another thread's fetch outside a session doesn't pin anything
+        thread = threading.Thread(target=registry.get, args=(key("b"), loader("b")))
+        thread.start()
+        thread.join()
+        assert not registry.in_use(key("b"))
+    assert not registry.in_use(key("a"))
+
+
+def test_acquire_unknown_model():
+    with pytest.raises(KeyError):
+        ModelRegistry().acquire(key("missing"))
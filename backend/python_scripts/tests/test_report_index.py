@@ -0,0 +1,95 @@
+import json
+import os
+
+import pytest
+
+from columnar_report import ColumnarReport, write_report
+from report_index import ReportIndex, histogram, index_report, report_kind, summarize_report
+
+
+def write_translate(directory, stamp_ms, src="en", tgt="es", elapsed=2.0, matches=(0.91, 0.42, None), npz=False,
+                    high_speed_count=1):
+    name = f"translated_{stamp_ms}_x.{'npz' if npz else 'json'}"
+    subtitles = [{"back_translation_match": m, "reading_speed_cps": 21.0 if i == 0 else 10.0}
+                 for i, m in enumerate(matches)]
+    metadata = {"src_lang": src, "tgt_lang": tgt, "lines_translated": len(matches),
+                "elapsed_seconds": elapsed}
+    if high_speed_count is not None:
+        metadata["high_speed_count"] = high_speed_count
+    path = os.path.join(directory, name)
+    if npz:
+        write_report(path, "subtitles", subtitles, metadata=metadata)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"subtitles": subtitles, "metadata": metadata}, f)
+    return path
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = ReportIndex(str(tmp_path))
+    yield index
+    index.close()
+
+
+def test_report_kind():
+    assert report_kind("translated_1700000000000_movie.json") == "translate"
+    assert report_kind("similarity_1700000000000_movie.npz") == "similarity"
+    assert report_kind("summary_1700000000000.json") is None
+    assert report_kind("report_index.sqlite") is None
+
+
+def test_histogram():
+    counts = histogram([0.0, 0.049, 0.05, 1.0, None], bins=20)
+    assert counts[0] == 2 and counts[1] == 1 and counts[19] == 1 and sum(counts) == 4
+
+
+def test_update_adds_changes_and_removes(tmp_path, index):
+    first = write_translate(str(tmp_path), 1700000000000)
+    write_translate(str(tmp_path), 1700000100000, elapsed=5.0, npz=True)
+    assert index.update() == {"indexed": 2, "removed": 0, "total": 2}
+    assert index.update() == {"indexed": 0, "removed": 0, "total": 2}  # unchanged files are skipped
+    os.remove(first)
+    assert index.update() == {"indexed": 0, "removed": 1, "total": 1}
+
+
+def test_queries(tmp_path, index):
+    write_translate(str(tmp_path), 1700000000000, elapsed=2.0)
+    write_translate(str(tmp_path), 1700000100000, elapsed=6.0, npz=True)
+    write_translate(str(tmp_path), 1700000200000, tgt="fr", elapsed=4.0)
+    index.update()
+
+    slowest = index.slowest_jobs(limit=2)
+    assert [job["elapsed_seconds"] for job in slowest] == [6.0, 4.0]
+    assert slowest[0]["lines_per_sec"] == 0.5
+
+    distribution = index.similarity_distribution(kind="translate", tgt_lang="es")
+    assert list(distribution) == ["en-es"]
+    assert distribution["en-es"]["lines"] == 4  # two checked lines per report
+    assert index.latest("translate").endswith("translated_1700000200000_x.json")
+    assert sum(row["high_cps_count"] for row in index.high_cps_over_time()) == 3
+
+
+def test_index_report_never_raises(tmp_path):
+    path = write_translate(str(tmp_path), 1700000000000)
+    assert index_report(path) is True
+
+
+def test_index_report_logs_failures(tmp_path, capsys):
+    assert index_report(str(tmp_path / "translated_1700000000001_missing.json")) is False
+    assert "translated_1700000000001_missing.json" in capsys.readouterr().err
+
+
+def test_high_cps_count_reads_cps_only_without_metadata(tmp_path, monkeypatch):
+    read = []
+    column = ColumnarReport.column
+    monkeypatch.setattr(ColumnarReport, "column", lambda self, name: read.append(name) or column(self, name))
+
+    row, _ = summarize_report(write_translate(str(tmp_path), 1700000000000, npz=True, high_speed_count=7))
+    assert row["high_cps_count"] == 7
+    assert "reading_speed_cps" not in read
+
+    # Reports from before the metadata count are counted from the column
+    row, _ = summarize_report(write_translate(str(tmp_path), 1700000000001, npz=True, high_speed_count=None))
+    assert row["high_cps_count"] == 1
+    assert "reading_speed_cps" in read
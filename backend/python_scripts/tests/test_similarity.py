@@ -0,0 +1,73 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from pipeline_artifact import find_artifact, reusable_lines, save_artifact
+from similarity import BACK_TRANSLATION_DECODE, SBERT_MODEL_NAME, compute_similarity
+from translate import PIPELINE_BT_DECODE, translate_srt
+
+ORIGINAL = ["Hello there.", "Where are you?"]
+TRANSLATED = ["Hola.", "¿Dónde estás?"]
+
+
+def artifact(tmp_path, bt_decode):
+    save_artifact(
+        str(tmp_path), "en", "es", ORIGINAL, TRANSLATED, ["Hello.", "Where are you?"],
+        np.zeros((2, 4)), np.zeros((2, 4)), sbert_model=SBERT_MODEL_NAME, bt_model="bt", bt_decode=bt_decode
+    )
+    return find_artifact(str(tmp_path), "en", "es", ORIGINAL)
+
+
+def test_pipeline_decodes_like_similarity():
+    assert PIPELINE_BT_DECODE == BACK_TRANSLATION_DECODE
+
+
+def test_reuse_needs_matching_decode_settings(tmp_path):
+    stored = artifact(tmp_path, dict(BACK_TRANSLATION_DECODE))
+    assert stored["meta"]["bt_decode"] == BACK_TRANSLATION_DECODE
+    assert reusable_lines(stored, ORIGINAL, TRANSLATED, SBERT_MODEL_NAME, BACK_TRANSLATION_DECODE) == {0, 1}
+    beam4 = {"num_beams": 4, "max_length": 256}
+    assert reusable_lines(stored, ORIGINAL, TRANSLATED, SBERT_MODEL_NAME, beam4) == set()
+    assert reusable_lines(stored, ORIGINAL, TRANSLATED, "other-model", BACK_TRANSLATION_DECODE) == set()
+    # Edited translations are recomputed
+    edited = [TRANSLATED[0], "¿Adónde vas?"]
+    assert reusable_lines(stored, ORIGINAL, edited, SBERT_MODEL_NAME, BACK_TRANSLATION_DECODE) == {0}
+
+
+def test_artifacts_without_decode_settings_are_not_reused(tmp_path):
+    stored = artifact(tmp_path, None)
+    assert reusable_lines(stored, ORIGINAL, TRANSLATED, SBERT_MODEL_NAME, BACK_TRANSLATION_DECODE) == set()
+
+
+def report(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize("align", [False, True])
+def test_pipeline_artifact_gives_the_same_similarities(tiny_models, srt_file, tmp_path, align):
+    translated = translate_srt(srt_file, "en", "es", str(tmp_path / "translated"), pipeline=True)
+    assert translated["meta"]["artifact"]
+
+    fresh = compute_similarity(srt_file, translated["srt_file"], str(tmp_path / "fresh.json"), align=align)
+    reused = compute_similarity(srt_file, translated["srt_file"], str(tmp_path / "reused.json"),
+                                artifacts_dir=str(tmp_path), align=align)
+    assert fresh["summary"]["reused_lines"] == 0
+    # Alignment is opt-in: positional pairing reports no alignment counts
+    assert (fresh["summary"]["alignment"] is not None) == align
+    assert reused["summary"]["reused_lines"] == reused["summary"]["num_lines"] == 30
+    for a, b in zip(report(fresh["json_file"])["report"], report(reused["json_file"])["report"]):
+        assert a["back_translated"] == b["back_translated"]
+        assert a["similarity"] == pytest.approx(b["similarity"], abs=2e-3)  # stored embeddings are float32
+
+
+def test_progress_events(tiny_models, srt_file, tmp_path):
+    events = []
+    compute_similarity(srt_file, srt_file, str(tmp_path / "similarity.json"), window=8, progress=events.append)
+    assert [e["lines_done"] for e in events] == [0, 8, 16, 24, 30]
+    assert all(e["lines_total"] == 30 and e["stage"] == "windows" for e in events)
+    progress = [e["progress"] for e in events]
+    assert progress == sorted(progress) and 0.9 < progress[-1] < 1.0
+    assert os.path.exists(tmp_path / "similarity.json")
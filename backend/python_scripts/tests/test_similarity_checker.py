@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+from my_similarity_checker import SRTSimilarityCheckerCPUOptimized
+
+
+@pytest.fixture
+def checker(tiny_models):
+    return SRTSimilarityCheckerCPUOptimized(src_lang="en", tgt_lang="es")
+
+
+@pytest.mark.parametrize("align", [True, False])
+def test_window_streaming_matches_whole_file(checker, srt_file, tmp_path, align):
+    whole = checker.compute_srt_similarity(srt_file, srt_file, window=None, align=align)
+    out_json = str(tmp_path / "windowed.json")
+    windowed = checker.compute_srt_similarity(srt_file, srt_file, window=7, out_json=out_json, align=align)
+    with open(out_json, encoding="utf-8") as f:
+        streamed = json.load(f)
+
+    assert windowed == {"summary": streamed["summary"], "json_file": out_json}
+    assert len(streamed["report"]) == len(whole["report"]) == whole["summary"]["total_lines"] > 7
+    for a, b in zip(whole["report"], streamed["report"]):
+        assert {k: v for k, v in a.items() if k != "similarity"} == {k: v for k, v in b.items() if k != "similarity"}
+        assert a["similarity"] == pytest.approx(b["similarity"], abs=1e-4)
+    for key in ("total_lines", "below_threshold", "threshold"):
+        assert streamed["summary"][key] == whole["summary"][key]
+    assert streamed["summary"]["overall_similarity"] == pytest.approx(whole["summary"]["overall_similarity"], abs=1e-4)
+    assert streamed.get("unmatched") == whole.get("unmatched")
@@ -0,0 +1,39 @@
+import json
+
+import pytest
+import torch
+
+from stage_pipeline import default_overlap_threads, parse_overlap_threads
+from translate import translate_srt
+
+
+def report(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["subtitles"]
+
+
+def test_overlap_matches_sequential(tiny_models, srt_file, tmp_path):
+    sequential = translate_srt(srt_file, "en", "es", str(tmp_path / "sequential"))
+    threads = torch.get_num_threads()
+    overlapped = translate_srt(srt_file, "en", "es", str(tmp_path / "overlap"), overlap=True, overlap_threads=1)
+    assert torch.get_num_threads() == threads  # the process-wide count is restored
+
+    assert overlapped["meta"]["overlap"]["overlap_threads"] == 1
+    expected, actual = report(sequential["json_file"]), report(overlapped["json_file"])
+    assert len(actual) == len(expected) == 30
+    for want, got in zip(expected, actual):
+        # Same forward batches, so identical translations; back-translation and
+        # embedding batch per forward batch and may differ in the last digits
+        assert got["translated"] == want["translated"]
+        if want["back_translation_match"] is None:
+            assert got["back_translation_match"] is None
+        else:
+            assert got["back_translation_match"] == pytest.approx(want["back_translation_match"], abs=1e-3)
+
+
+def test_overlap_threads_share_the_budget():
+    assert default_overlap_threads(12) == 4
+    assert default_overlap_threads(2) == 1
+    assert parse_overlap_threads("3") == 3
+    with pytest.raises(ValueError):
+        parse_overlap_threads("0")
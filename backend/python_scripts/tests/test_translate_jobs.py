@@ -0,0 +1,63 @@
+import json
+import os
+import shutil
+
+import pysrt
+import pytest
+
+from translate import is_sound_cue, translate_srt
+from translate_jobs import SharedSource, translate_srt_multi
+
+
+@pytest.fixture
+def en_fr_models(tiny_models):
+    """A second target for the tiny en-es pair: the same checkpoints under the en-fr names."""
+    for name, copy_of in (("en-fr", "en-es"), ("fr-en", "es-en")):
+        path = os.path.join(tiny_models, f"Helsinki-NLP--opus-mt-{name}")
+        if not os.path.isdir(path):
+            shutil.copytree(os.path.join(tiny_models, f"Helsinki-NLP--opus-mt-{copy_of}"), path)
+    return tiny_models
+
+
+def report(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["subtitles"]
+
+
+def test_multi_target_matches_single_target_runs(en_fr_models, srt_file, tmp_path, monkeypatch):
+    windows_read = []
+    iter_windows = SharedSource.iter_windows
+
+    def counting(self):
+        for window in iter_windows(self):
+            windows_read.append(len(window[0]))
+            yield window
+    monkeypatch.setattr(SharedSource, "iter_windows", counting)
+
+    result = translate_srt_multi(srt_file, "en", ["es", "fr"], str(tmp_path / "multi"), window=8)
+    assert windows_read == [8, 8, 8, 6]  # the file is read once, not once per target
+
+    for tgt_lang in ("es", "fr"):
+        single = translate_srt(srt_file, "en", tgt_lang, str(tmp_path / f"single_{tgt_lang}"), window=8)
+        multi = result["targets"][tgt_lang]
+        assert os.path.basename(multi["srt_file"]).startswith(f"multi_{tgt_lang}_")
+        assert ([s.text for s in pysrt.open(multi["srt_file"], encoding="utf-8")] ==
+                [s.text for s in pysrt.open(single["srt_file"], encoding="utf-8")])
+        for a, b in zip(report(multi["json_file"]), report(single["json_file"])):
+            assert a["translated"] == b["translated"]
+            assert a["back_translation_match"] == pytest.approx(b["back_translation_match"], abs=1e-3)
+
+
+def test_multi_target_reuses_source_embeddings(en_fr_models, srt_file, tmp_path):
+    result = translate_srt_multi(srt_file, "en", ["es", "fr"], str(tmp_path / "multi"), window=8)
+    spoken = sum(1 for s in pysrt.open(srt_file, encoding="utf-8") if not is_sound_cue(s.text))
+    # The second target takes every source embedding from the first
+    assert result["summary"]["source_embeddings_reused"] == spoken
+    assert result["summary"]["lines"] == 30
+    assert set(result["summary"]["targets"]) == {"es", "fr"}
+    assert os.path.exists(result["summary_file"])
+
+
+def test_multi_target_rejects_the_source_language(en_fr_models, srt_file, tmp_path):
+    with pytest.raises(ValueError):
+        translate_srt_multi(srt_file, "en", ["es", "en"], str(tmp_path / "multi"))
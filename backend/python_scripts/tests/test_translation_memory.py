@@ -0,0 +1,64 @@
+import pytest
+
+from translation_memory import TranslationMemory, cached_generate, hit_rate, make_key
+
+MODEL = "Helsinki-NLP/opus-mt-en-es"
+
+
+@pytest.fixture
+def memory(tmp_path):
+    return TranslationMemory(str(tmp_path / "tm.sqlite"))
+
+
+def test_key_depends_on_decode_settings():
+    assert make_key(MODEL, "Hello", 4, 256) == make_key(MODEL, "Hello", 4, 256)
+    assert make_key(MODEL, "Hello", 4, 256) != make_key(MODEL, "Hello", 1, 256)
+    assert make_key(MODEL, "Hello", 4, 256) != make_key(MODEL, "Hello", 4, 128)
+    assert make_key(MODEL, "Hello", 4, 256) != make_key("other", "Hello", 4, 256)
+
+
+def test_store_and_lookup(memory):
+    memory.store(MODEL, [("Hello", "Hola"), ("Bye", "Adiós")], 4, 256)
+    assert memory.lookup(MODEL, ["Hello", "Bye", "New"], 4, 256) == {"Hello": "Hola", "Bye": "Adiós"}
+    assert memory.lookup(MODEL, ["Hello"], 1, 256) == {}
+
+
+def test_with_scores_skips_unscored_entries(memory):
+    memory.store(MODEL, [("Hello", "Hola")], 4, 256, scores=[-0.5])
+    memory.store(MODEL, [("Bye", "Adiós")], 4, 256)
+    assert memory.lookup(MODEL, ["Hello", "Bye"], 4, 256, with_scores=True) == {"Hello": ("Hola", -0.5)}
+
+
+def test_storing_again_replaces_translation(memory):
+    memory.store(MODEL, [("Hello", "Hola")], 4, 256)
+    memory.store(MODEL, [("Hello", "Buenas")], 4, 256)
+    assert memory.lookup(MODEL, ["Hello"], 4, 256) == {"Hello": "Buenas"}
+
+
+def test_persists_across_connections(tmp_path):
+    path = str(tmp_path / "tm.sqlite")
+    TranslationMemory(path).store(MODEL, [("Hello", "Hola")], 4, 256)
+    assert TranslationMemory(path).lookup(MODEL, ["Hello"], 4, 256) == {"Hello": "Hola"}
+
+
+def test_cached_generate_all_hits_skips_generation(memory):
+    memory.store(MODEL, [("Hello", "Hola"), ("Bye", "Adiós")], 4, 256)
+    stats = {"hits": 0, "misses": 0}
+    hit_lines = []
+    # No model needed: every line comes from memory
+    out = cached_generate(
+        ["Bye", "Hello", "Bye"], MODEL, None, None, memory=memory, stats=stats, num_beams=4, max_length=256,
+        hit_lines=hit_lines
+    )
+    assert out == ["Adiós", "Hola", "Adiós"]
+    assert stats == {"hits": 3, "misses": 0}
+    assert sorted(hit_lines) == [0, 1, 2]
+    assert hit_rate(stats) == 1.0
+
+
+def test_unscored_store_keeps_recorded_score(memory):
+    memory.store(MODEL, [("Hello", "Hola")], 4, 256, scores=[-0.5])
+    memory.store(MODEL, [("Hello", "Hola")], 4, 256)
+    assert memory.lookup(MODEL, ["Hello"], 4, 256, with_scores=True) == {"Hello": ("Hola", -0.5)}
+    memory.store(MODEL, [("Hello", "Hola")], 4, 256, scores=[-0.25])
+    assert memory.lookup(MODEL, ["Hello"], 4, 256, with_scores=True) == {"Hello": ("Hola", -0.25)}
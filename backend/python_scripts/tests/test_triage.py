@@ -0,0 +1,82 @@
+import math
+
+import pytest
+
+import translate
+from translate import TRIAGE_SEED, translate_srt, triage_reasons, triage_sample, triage_summary
+
+
+def test_plain_line_is_not_risky():
+    assert triage_reasons("see you later", "hasta luego", 0.9, 3.0) == []
+
+
+@pytest.mark.parametrize("original, translated, confidence, duration, reason", [
+    (" ".join(["word"] * 13), "palabra", 0.9, 10.0, "long"),
+    ("talk fast", " ".join(["rápido"] * 25), 0.9, 1.0, "high_cps"),
+    ("maybe", "quizás", 0.3, 2.0, "low_confidence"),
+    ("it costs 20 dollars", "cuesta 20 dólares", 0.9, 3.0, "numbers_names"),
+    ("ask Maria tomorrow", "pregunta a María mañana", 0.9, 3.0, "numbers_names"),
+])
+def test_reasons(original, translated, confidence, duration, reason):
+    assert reason in triage_reasons(original, translated, confidence, duration)
+
+
+@pytest.mark.parametrize("original", [
+    "Later then",
+    "Stop. Where are you going?",
+    "Really? Then go!  Now",
+    "- Hi. - Where were you?",
+    "I know what I am",
+])
+def test_sentence_initial_capital_is_not_a_name(original):
+    assert triage_reasons(original, "Luego", 0.9, 3.0) == []
+
+
+@pytest.mark.parametrize("original", ["tell Maria, Now", "so long,  Tyler", "we saw him in Paris."])
+def test_mid_sentence_capital_is_a_name(original):
+    assert triage_reasons(original, "Luego", 0.9, 3.0) == ["numbers_names"]
+
+
+def test_no_duration_skips_reading_speed():
+    assert triage_reasons("talk fast", " ".join(["rápido"] * 25), 0.9, None) == []
+
+
+def test_sample_size_rounds_without_a_floor():
+    others = list(range(10))
+    assert triage_sample(others, 0.0) == []
+    assert triage_sample(others, 0.04) == []
+    assert len(triage_sample(others, 0.25)) == 2  # round half to even
+    assert sorted(triage_sample(others, 1.0)) == others
+    assert triage_sample([], 0.5) == []
+
+
+def test_sample_is_deterministic():
+    others = list(range(100))
+    assert triage_sample(others, 0.1) == triage_sample(others, 0.1)
+    assert set(triage_sample(others, 0.1)) <= set(others)
+
+
+def test_each_window_samples_with_its_own_seed(tiny_models, srt_file, tmp_path, monkeypatch):
+    seeds = []
+
+    def recording(others, rate, seed=TRIAGE_SEED):
+        seeds.append(seed)
+        return triage_sample(others, rate, seed)
+    monkeypatch.setattr(translate, "triage_sample", recording)
+    translate_srt(srt_file, "en", "es", str(tmp_path / "out"), window=10, triage_rate=0.5)
+    assert seeds == [TRIAGE_SEED, TRIAGE_SEED + 10, TRIAGE_SEED + 20]
+
+
+def test_summary_without_sample_uses_risky_lines():
+    stats = {"lines": 4, "risky": 2, "sampled": 0, "risky_sum": 1.6, "sample_sum": 0.0, "sample_sumsq": 0.0}
+    summary = triage_summary(stats, 0.0)
+    assert summary["estimated_similarity"] == 0.8 and summary["ci95"] == [0.8, 0.8]
+
+
+def test_summary_estimate_is_stratified():
+    # 2 risky lines at 0.5, 4 others of which 2 sampled at 0.9
+    stats = {"lines": 6, "risky": 2, "sampled": 2, "risky_sum": 1.0, "sample_sum": 1.8, "sample_sumsq": 1.62}
+    summary = triage_summary(stats, 0.5)
+    assert math.isclose(summary["estimated_similarity"], (1.0 + 4 * 0.9) / 6, abs_tol=1e-3)
+    assert summary["ci95"][0] == summary["ci95"][1]  # no sample variance
+    assert summary["back_translated"] == 4
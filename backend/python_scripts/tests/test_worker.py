@@ -0,0 +1,100 @@
+import json
+import threading
+
+from worker import serve
+
+
+def run(lines, handler, capsys):
+    serve(lines, handler)
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def echo(job, progress):
+    progress({"event": "progress", "stage": "forward", "lines_done": 1, "lines_total": 1, "progress": 0.5})
+    return {"srt_file": job["out_base"] + ".srt"}
+
+
+def test_results_and_progress_carry_the_job_id(capsys):
+    out = run([json.dumps({"id": "a", "out_base": "x"}), "", json.dumps({"id": "b", "out_base": "y"})], echo, capsys)
+    assert out[0] == {"event": "ready"}
+    assert [m["id"] for m in out[1:]] == ["a", "a", "b", "b"]
+    assert out[1]["event"] == "progress" and out[2] == {"srt_file": "x.srt", "id": "a"}
+
+
+def test_errors_are_reported_per_job(capsys):
+    def fail(job, progress):
+        raise ValueError("--window can't be combined with --workers")
+
+    out = run(["not json", json.dumps({"id": "a"})], fail, capsys)
+    assert any("id" not in m and m.get("error", "").startswith("Invalid job") for m in out)
+    assert out[-1] == {"id": "a", "error": "--window can't be combined with --workers"}
+
+
+def test_cancel_queued_job(capsys):
+    ran = []
+
+    def handler(job, progress):
+        ran.append(job["id"])
+        return {}
+
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocking(job, progress):
+        if job["id"] == "a":
+            started.set()
+            release.wait(5)
+        return handler(job, progress)
+
+    def lines():
+        yield json.dumps({"id": "a"})
+        started.wait(5)
+        yield json.dumps({"id": "b"})
+        yield json.dumps({"cancel": "b"})
+        release.set()
+
+    out = run(lines(), blocking, capsys)
+    assert ran == ["a"]
+    assert {"id": "b", "error": "Job cancelled", "cancelled": True} in out
+
+
+def test_cancel_running_job_at_next_progress_event(capsys):
+    started = threading.Event()
+    stopped = []
+
+    def long_job(job, progress):
+        started.set()
+        for i in range(500):
+            progress({"event": "progress", "lines_done": i})
+            threading.Event().wait(0.01)
+        stopped.append("finished")  # not reached when cancelled
+        return {}
+
+    def lines():
+        yield json.dumps({"id": "a"})
+        started.wait(5)
+        yield json.dumps({"cancel": "a"})
+
+    out = run(lines(), long_job, capsys)
+    assert stopped == []
+    assert out[-1] == {"id": "a", "error": "Job cancelled", "cancelled": True}
+
+
+def test_cancel_for_unknown_or_finished_job_is_ignored(capsys):
+    done = threading.Event()
+
+    def handler(job, progress):
+        done.set()
+        return {}
+
+    def lines():
+        yield json.dumps({"cancel": "never-sent"})
+        yield json.dumps({"id": "a"})
+        done.wait(5)
+        yield json.dumps({"cancel": "a"})  # already finished (or about to)
+        yield json.dumps({"id": "a"})  # an id can be reused after its job ended
+
+    out = run(lines(), handler, capsys)
+    results = [m for m in out if m.get("id") == "a"]
+    assert results[0] == {"id": "a"}
+    assert len(results) == 2
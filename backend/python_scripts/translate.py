@@ -1,55 +1,118 @@
+import os
 import sys
-import json
+import math
+import random
+import re
 import time
-import pysrt
+import numpy as np
 from datetime import datetime
-from transformers import MarianMTModel, MarianTokenizer
 import torch
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import util
+from embedding_cache import cached_encode
+from inference_backend import DEFAULT_BACKEND, memory_key
+from model_registry import configure_torch_threads, get_registry, marian_model_name, using_models
+from parallel_translate import parallel_translate
+from columnar_report import ColumnarReportWriter
+from pipeline_artifact import save_artifact
+from progress import ProgressReporter, pipeline_stages
+from report_index import index_report
+from similarity import BACK_TRANSLATION_DECODE
+from stage_pipeline import default_overlap_threads, overlap_summary, overlapped_translate, parse_overlap_threads
+from srt_stream import JsonReportWriter, SrtWriter, count_cues, detect_eol, iter_srt, windows
+from translation_memory import cached_generate, get_translation_memory, hit_rate, iter_cached_generate
 
-# -------------------
-# Args
-# -------------------
-uploaded_srt = sys.argv[1]
-src_lang = sys.argv[2]
-tgt_lang = sys.argv[3]
-out_base = sys.argv[4]
-skip_back_translation = "--fast" in sys.argv  # optional fast mode
-
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-out_srt_path = f"{out_base}_{timestamp}.srt"
-out_json_path = f"{out_base}_{timestamp}.json"
-
-# -------------------
-# Load SRT
-# -------------------
-subs = pysrt.open(uploaded_srt)
-total_lines = len(subs)
-
-# -------------------
-# Load MarianMT models
-# -------------------
+# Usage:
+#   python translate.py <uploaded_srt> <src_lang> <tgt_lang> <out_base> [--fast] [--backend torch|int8|onnx]
+#                       [--pipeline] [--workers N] [--window N] [--report-format json|npz]
+#                       [--adaptive THRESHOLD] [--triage SAMPLE_RATE] [--overlap [--overlap-threads N]]
+#   python translate.py <uploaded_srt> <src_lang> es,fr,de <out_base> [options as above]
+#   python translate.py <season.zip|directory|a.srt,b.srt> <src_lang> <tgt_lang> <out_base> --batch [options]
+#   python translate.py --worker [--threads N]
+#
+# Worker mode keeps models resident and reads JSON jobs on stdin (protocol
+# in worker.py). Several target languages and --batch jobs are run by
+# translate_jobs.py; progress events are described in progress.py.
+#
+# Pipeline mode scores with similarity.py's SBERT model and back-translation
+# decode settings and saves the back-translations and embeddings as
+# downloads/pipeline_<key>.npz, so a later similarity check on the same
+# original file only recomputes edited lines.
+#
+# --workers N splits very long files into contiguous chunks translated by N
+# processes, each with its own models and threads/N torch threads.
+#
+# --window N reads, translates and writes N cues at a time so memory stays
+# flat on multi-hour files; the SRT and JSON grow as windows finish.
+#
+# --report-format npz writes the report as a columnar .npz instead of JSON
+# ("json_file" in the result then points at it); see columnar_report.py.
+#
+# --adaptive T decodes every line greedily, then re-decodes with beam search
+# only the lines whose back-translation similarity is below T, keeping the
+# better-scoring translation. Escalated lines and the estimated time saved
+# against full beam search are in the report and metadata.
+#
+# --triage R back-translates only risky lines (long, high CPS, low
+# confidence, numbers or names) plus a random fraction R of the others.
+# Metadata "triage" estimates the overall similarity with a 95% confidence
+# interval; unchecked lines have back_translation_match null.
+#
+# --overlap runs forward translation, back-translation and embedding
+# concurrently on the generate() batches of the sequential path
+# (stage_pipeline.py); --overlap-threads sets the process-wide torch thread
+# count all three stages share while they run (torch.set_num_threads, not a
+# per-stage budget; default: a third of the budget).
+# Metadata "overlap" has per-stage busy time and utilization.
+#
 device = "cpu"
+SBERT_MODEL_NAME = "paraphrase-MiniLM-L3-v2"
+PIPELINE_SBERT_MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"  # same as similarity.py
+PIPELINE_BT_DECODE = BACK_TRANSLATION_DECODE  # pipeline back-translations decode like similarity.py's
+BEAM_SIZE = 4
+CACHE_STAGES = ("forward", "back_translation", "embedding")  # stages with translation memory / embedding cache stats
 
-model_name = f"Helsinki-NLP/opus-mt-{src_lang}-{tgt_lang}"
-tokenizer = MarianTokenizer.from_pretrained(model_name)
-model = MarianMTModel.from_pretrained(model_name).to(device)
-model.eval()
+# Triage mode: lines matching any of these are always back-translated
+TRIAGE_LONG_WORDS = 12
+TRIAGE_HIGH_CPS = 20  # same threshold as high_speed_count
+TRIAGE_MIN_CONFIDENCE = 0.6
+TRIAGE_SEED = 0  # plus the index of the window's (or chunk's) first line
+# Digits, or a capitalized word mid-sentence: not the first word, and not
+# right after sentence punctuation or a dialogue dash ("Go. Now" / "- Where")
+_NUMBER_OR_NAME = re.compile(r"\d|[^\s.!?-]\s+[A-Z][a-z]")
 
-if not skip_back_translation:
-    bt_model_name = f"Helsinki-NLP/opus-mt-{tgt_lang}-{src_lang}"
-    bt_tokenizer = MarianTokenizer.from_pretrained(bt_model_name)
-    bt_model = MarianMTModel.from_pretrained(bt_model_name).to(device)
-    bt_model.eval()
-
-# -------------------
-# Load SentenceTransformer for novelty check
-# -------------------
-sbert_model = SentenceTransformer('paraphrase-MiniLM-L3-v2', device=device)
+REPORT_FORMATS = ("json", "npz")
+# Options that can't run together: each flag with the ones it excludes
+INCOMPATIBLE_OPTIONS = (
+    ("--window", ("--workers",)),
+    ("--triage", ("--fast", "--pipeline", "--adaptive", "--batch")),
+    ("--overlap", ("--workers", "--adaptive", "--triage")),
+    ("--batch", ("several targets",)),
+)
 
 # -------------------
 # Helper functions
 # -------------------
+def check_options(skip_back_translation=False, pipeline=False, workers=1, window=None, report_format="json",
+                  adaptive_threshold=None, triage_rate=None, overlap=False, batch=False, targets=1, **_):
+    """Raise ValueError for an unknown report format or options listed in INCOMPATIBLE_OPTIONS."""
+    if report_format not in REPORT_FORMATS:
+        raise ValueError(f"Unknown report format: {report_format}")
+    given = {
+        "--fast": skip_back_translation,
+        "--pipeline": pipeline,
+        "--workers": workers > 1,
+        "--window": bool(window),
+        "--adaptive": adaptive_threshold is not None,
+        "--triage": triage_rate is not None,
+        "--overlap": overlap,
+        "--batch": batch,
+        "several targets": targets > 1
+    }
+    for flag, excluded in INCOMPATIBLE_OPTIONS:
+        clash = [other for other in excluded if given[flag] and given[other]]
+        if clash:
+            raise ValueError(f"{flag} can't be combined with {', '.join(clash)}")
+
 def is_sound_cue(text: str) -> bool:
     text = text.strip()
     return text.startswith("[") and text.endswith("]")
@@ -62,112 +125,675 @@ def compute_cps(text, start, end, max_cps=25):
     cps = len(text.split()) / duration  # words/sec
     return min(cps, max_cps)
 
-def translate_text(text_list, model, tokenizer, batch_size=8):
-    translated = []
-    for i in range(0, len(text_list), batch_size):
-        batch = text_list[i:i+batch_size]
-        inputs = tokenizer(batch, return_tensors="pt", padding=True, truncation=True).to(device)
-        with torch.inference_mode():
-            outputs = model.generate(**inputs, max_length=256, num_beams=4)
-        decoded = tokenizer.batch_decode(outputs, skip_special_tokens=True)
-        translated.extend(decoded)
-    return translated
+def translate_text(text_list, model, tokenizer, model_name, stats=None, on_lines=None, max_tokens=1024,
+                   num_beams=BEAM_SIZE, with_scores=False, hit_lines=None, max_length=256):
+    # Translation memory first, then length-bucketed batches for the misses;
+    # results keep input order. with_scores gives (text, mean token log-prob).
+    return cached_generate(
+        text_list, model_name, model, tokenizer, memory=get_translation_memory(),
+        stats=stats, device=device, max_tokens=max_tokens, max_length=max_length, num_beams=num_beams,
+        on_lines=on_lines, with_scores=with_scores, hit_lines=hit_lines
+    )
+
+def iter_translate_text(text_list, model, tokenizer, model_name, stats=None, num_beams=BEAM_SIZE, with_scores=False,
+                        hit_lines=None):
+    # translate_text() one generate() batch at a time: (line indices, outputs)
+    return iter_cached_generate(
+        text_list, model_name, model, tokenizer, memory=get_translation_memory(),
+        stats=stats, device=device, max_tokens=1024, max_length=256, num_beams=num_beams, with_scores=with_scores,
+        hit_lines=hit_lines
+    )
+
+def encode_texts(sbert_model, texts, model_name, stats=None, on_lines=None, chunk_size=256, hit_lines=None):
+    # Embedding cache first; only lines not embedded by an earlier job are encoded
+    chunks = []
+    for i in range(0, len(texts), chunk_size):
+        chunk = texts[i:i+chunk_size]
+        chunk_hits = [] if hit_lines is not None else None
+        chunks.append(cached_encode(sbert_model, model_name, chunk, stats=stats, hit_lines=chunk_hits))
+        if hit_lines is not None:
+            hit_lines.extend(i + j for j in chunk_hits)
+        if on_lines is not None:
+            on_lines(len(chunk))
+    if not chunks:
+        return torch.empty((0, sbert_model.get_sentence_embedding_dimension()))
+    return torch.cat(chunks)
 
 # -------------------
-# Translation loop
+# Translation stages
 # -------------------
-start_time = time.time()
-report = []
-high_speed_count = 0
+def translate_lines(texts, cues, src_lang, tgt_lang, backend=DEFAULT_BACKEND, skip_back_translation=False,
+                    sbert_name=SBERT_MODEL_NAME, reporter=None, tm_stats=None, adaptive_threshold=None,
+                    triage_rate=None, durations=None, source_embeddings=None, line_stats=False, bt_decode=None,
+                    line_offset=0):
+    """
+    Forward-translate the non-cue lines, then back-translate and embed all of
+    them. Returns a dict of per-line results: "translated", "confidences",
+    "back_translated", "orig_emb", "bt_emb", "similarities" and "escalated";
+    with skip_back_translation the back-translation fields are None and every
+    similarity is 1.0. Confidence is exp(mean token log-prob) of the forward
+    translation, from the scores of the same generate() call (1.0 for cues,
+    which are kept as-is).
 
-try:
-    texts = [s.text.replace("\n", " ").strip() for s in subs]
-    cues = [is_sound_cue(t) for t in texts]
+    adaptive_threshold decodes greedily first and re-decodes with beam search
+    only the lines whose back-translation similarity is below it, keeping
+    whichever translation scores better.
+
+    triage_rate back-translates only risky lines (see triage_reasons; durations
+    are the cue lengths in seconds) plus that fraction of the others. Unchecked
+    lines get similarity None, the result adds "checked" and "risk", and no
+    embeddings are returned. line_offset, the file index of texts[0], seeds
+    the sample so that each window (or chunk) samples different positions.
+
+    source_embeddings, if given, is called with the positions being checked
+    and returns their source embeddings (shared by the targets of a
+    multi-target job) instead of encoding them here.
+
+    line_stats adds "lookups": per line, the translation memory / embedding
+    cache [hits, misses] of each stage (see DedupResults).
+
+    bt_decode overrides the back-translation's num_beams/max_length (pipeline
+    mode decodes like similarity.py, whose checks reuse its back-translations).
+    """
+    registry = get_registry()
+    model_name = marian_model_name(src_lang, tgt_lang)
+    (tokenizer, model), backward = registry.marian_pair(
+        src_lang, tgt_lang, back=not skip_back_translation, backend=backend
+    )
+    adaptive = adaptive_threshold is not None and not skip_back_translation
+    if reporter is None:
+        reporter = ProgressReporter(None, pipeline_stages(skip_back_translation, adaptive))
+    if tm_stats is None:
+        tm_stats = {"forward": {"hits": 0, "misses": 0}, "back_translation": {"hits": 0, "misses": 0},
+                    "embedding": {"hits": 0, "misses": 0}}
+
+    lookups = [{stage: [0, 0] for stage in CACHE_STAGES} for _ in texts] if line_stats else None
+
+    def record(stage, lines, hit_lines):
+        if lookups is not None:
+            count_line_lookups(lookups, stage, lines, hit_lines)
 
     # Only translate non-cue lines
-    non_cue_texts = [t for i, t in enumerate(texts) if not cues[i]]
-    trans_non_cues = translate_text(non_cue_texts, model, tokenizer)
+    non_cue = [i for i in range(len(texts)) if not cues[i]]
+    non_cue_texts = [texts[i] for i in non_cue]
+    reporter.start_stage("forward", len(non_cue_texts))
+    forward_start = time.time()
+    hits = []
+    forward = translate_text(
+        non_cue_texts, model, tokenizer, memory_key(model_name, backend), tm_stats["forward"],
+        on_lines=reporter.advance, num_beams=1 if adaptive else BEAM_SIZE, with_scores=True, hit_lines=hits
+    )
+    record("forward", non_cue, hits)
+    forward_decoded = len(non_cue) - len(hits)  # translation memory hits cost no decoding
+    forward_seconds = time.time() - forward_start
+    reporter.end_stage()
+    add_stage_seconds(tm_stats, "forward", forward_seconds)
 
-    # Map translations back to all lines
+    # Map translations back to all lines (cues are kept as-is)
     trans_texts = []
+    confidences = []
     non_cue_idx = 0
-    for is_cue in cues:
+    for i, is_cue in enumerate(cues):
         if is_cue:
-            trans_texts.append(texts[non_cue_idx] if False else texts[non_cue_idx])
+            trans_texts.append(texts[i])
+            confidences.append(1.0)
         else:
-            trans_texts.append(trans_non_cues[non_cue_idx])
+            text, log_prob = forward[non_cue_idx]
+            trans_texts.append(text)
+            confidences.append(math.exp(log_prob))
             non_cue_idx += 1
 
+    result = {
+        "translated": trans_texts,
+        "confidences": confidences,
+        "back_translated": None,
+        "orig_emb": None,
+        "bt_emb": None,
+        "similarities": [1.0] * len(texts),
+        "escalated": [False] * len(texts)
+    }
+    if lookups is not None:
+        result["lookups"] = lookups
+    if skip_back_translation:
+        return result
+
+    # Triage mode back-translates only risky lines plus a random sample of the rest
+    checked = list(range(len(texts)))
+    if triage_rate is not None:
+        risks = [
+            "" if cues[i] else ",".join(triage_reasons(
+                texts[i], trans_texts[i], confidences[i], durations[i] if durations else None
+            ))
+            for i in range(len(texts))
+        ]
+        risky = [i for i in range(len(texts)) if risks[i]]
+        others = [i for i in range(len(texts)) if not cues[i] and not risks[i]]
+        sampled = triage_sample(others, triage_rate, seed=TRIAGE_SEED + line_offset)
+        checked = sorted(risky + sampled)
+
     # Back-translation similarity
-    if not skip_back_translation:
-        bt_texts = translate_text(trans_texts, bt_model, bt_tokenizer)
-        orig_emb = sbert_model.encode(texts, convert_to_tensor=True)
-        bt_emb = sbert_model.encode(bt_texts, convert_to_tensor=True)
-        similarities = util.cos_sim(orig_emb, bt_emb).diagonal().tolist()
+    bt_tokenizer, bt_model = backward
+    bt_key = memory_key(marian_model_name(tgt_lang, src_lang), backend)
+    sbert_model = registry.sentence_transformer(sbert_name)
+    reporter.start_stage("back_translation", len(checked))
+    stage_start = time.time()
+    hits = []
+    bt_texts = translate_text(
+        [trans_texts[i] for i in checked], bt_model, bt_tokenizer, bt_key, tm_stats["back_translation"],
+        on_lines=reporter.advance, hit_lines=hits, **(bt_decode or {})
+    )
+    record("back_translation", checked, hits)
+    reporter.end_stage()
+    add_stage_seconds(tm_stats, "back_translation", time.time() - stage_start)
+
+    reporter.start_stage("embedding", 2 * len(checked))
+    stage_start = time.time()
+    if source_embeddings is not None:
+        orig_emb = source_embeddings(checked)
+        reporter.advance(len(checked))
     else:
-        similarities = [1.0] * len(texts)
-
-    # Fill subtitles and report
-    for idx, sub in enumerate(subs):
-        original_text = texts[idx]
-        translated_text = trans_texts[idx] if not cues[idx] else original_text
-        bt_match = similarities[idx]
-        start_sec = time_to_seconds(sub.start)
-        end_sec = time_to_seconds(sub.end)
-        cps = compute_cps(translated_text, start_sec, end_sec)
-        if cps >= 20:
-            high_speed_count += 1
-
-        sub.text = translated_text  # preserve cues
-
-        report.append({
-            "index": sub.index,
-            "original": original_text,
-            "translated": translated_text,
-            "start": str(sub.start),
-            "end": str(sub.end),
-            "reading_speed_cps": round(cps, 2),
-            "confidence": 0.9,
-            "back_translation_match": round(bt_match, 3),
-            "novelty": bt_match < 0.95
-        })
-
-except Exception as e:
-    print(json.dumps({"error": str(e)}))
-    sys.stdout.flush()
-    sys.exit(1)
+        hits = []
+        orig_emb = encode_texts(
+            sbert_model, [texts[i] for i in checked], sbert_name, tm_stats["embedding"], on_lines=reporter.advance,
+            hit_lines=hits
+        )
+        record("embedding", checked, hits)
+    hits = []
+    bt_emb = encode_texts(
+        sbert_model, bt_texts, sbert_name, tm_stats["embedding"], on_lines=reporter.advance, hit_lines=hits
+    )
+    record("embedding", checked, hits)
+    similarities = util.cos_sim(orig_emb, bt_emb).diagonal().tolist()
+    reporter.end_stage()
+    add_stage_seconds(tm_stats, "embedding", time.time() - stage_start)
+
+    if triage_rate is not None:
+        # Unchecked lines get no similarity; the estimate comes from triage_summary()
+        full_bt = [None] * len(texts)
+        full_sims = [None] * len(texts)
+        for j, i in enumerate(checked):
+            full_bt[i], full_sims[i] = bt_texts[j], similarities[j]
+        result.update(
+            back_translated=full_bt, similarities=full_sims,
+            checked=[sim is not None for sim in full_sims], risk=risks
+        )
+        triage_stats = tm_stats.setdefault("triage", {})
+        counts = {
+            "lines": len(risky) + len(others),
+            "risky": len(risky),
+            "sampled": len(sampled),
+            "risky_sum": sum(full_sims[i] for i in risky),
+            "sample_sum": sum(full_sims[i] for i in sampled),
+            "sample_sumsq": sum(full_sims[i] ** 2 for i in sampled)
+        }
+        for i in risky:
+            for reason in risks[i].split(","):
+                counts[f"reason_{reason}"] = counts.get(f"reason_{reason}", 0) + 1
+        for key, value in counts.items():
+            triage_stats[key] = triage_stats.get(key, 0) + value
+        return result
+
+    result.update(back_translated=bt_texts, orig_emb=orig_emb, bt_emb=bt_emb, similarities=similarities)
+
+    if adaptive:
+        # Beam search only for greedy lines that scored below the threshold
+        low = [i for i, sim in enumerate(similarities) if not cues[i] and sim < adaptive_threshold]
+        reporter.start_stage("escalation", len(low))
+        beam_start = time.time()
+        hits = []
+        beam = translate_text(
+            [texts[i] for i in low], model, tokenizer, memory_key(model_name, backend), tm_stats["forward"],
+            on_lines=reporter.advance, num_beams=BEAM_SIZE, with_scores=True, hit_lines=hits
+        )
+        record("forward", low, hits)
+        beam_decoded = len(low) - len(hits)
+        beam_texts = [text for text, _ in beam]
+        beam_seconds = time.time() - beam_start
+        hits = []
+        beam_bt = translate_text(
+            beam_texts, bt_model, bt_tokenizer, bt_key, tm_stats["back_translation"], hit_lines=hits,
+            **(bt_decode or {})
+        )
+        record("back_translation", low, hits)
+        hits = []
+        beam_emb = encode_texts(sbert_model, beam_bt, sbert_name, tm_stats["embedding"], hit_lines=hits)
+        record("embedding", low, hits)
+        beam_sims = util.cos_sim(orig_emb[low], beam_emb).diagonal().tolist() if low else []
+        rescoring_seconds = time.time() - beam_start - beam_seconds
+        reporter.end_stage()
+        add_stage_seconds(tm_stats, "escalation", beam_seconds + rescoring_seconds)
+
+        improved = 0
+        result["improved"] = [False] * len(texts)
+        for j, i in enumerate(low):
+            result["escalated"][i] = True
+            if beam_sims[j] > similarities[i]:
+                trans_texts[i], bt_texts[i], similarities[i] = beam_texts[j], beam_bt[j], beam_sims[j]
+                bt_emb[i] = beam_emb[j]
+                confidences[i] = math.exp(beam[j][1])
+                result["improved"][i] = True
+                improved += 1
+
+        adaptive_stats = tm_stats.setdefault("adaptive", {})
+        for key, value in (("lines", len(non_cue_texts)), ("escalated", len(low)), ("improved", improved),
+                           ("greedy_decoded", forward_decoded), ("beam_decoded", beam_decoded),
+                           ("greedy_seconds", forward_seconds), ("beam_seconds", beam_seconds),
+                           ("rescoring_seconds", rescoring_seconds)):
+            adaptive_stats[key] = adaptive_stats.get(key, 0) + value
+    return result
+
+def count_line_lookups(lookups, stage, lines, hit_lines):
+    """Count one cache lookup for each of lines; hit_lines are the positions (in lines) that hit."""
+    hit_lines = set(hit_lines)
+    for j, i in enumerate(lines):
+        lookups[i][stage][0 if j in hit_lines else 1] += 1
+
+def add_stage_seconds(tm_stats, stage, seconds):
+    """Accumulate wall time per stage in tm_stats["stage_seconds"] (reported in metadata)."""
+    stage_seconds = tm_stats.setdefault("stage_seconds", {})
+    stage_seconds[stage] = stage_seconds.get(stage, 0.0) + seconds
+
+def adaptive_summary(stats, threshold):
+    """
+    Escalation counts plus time saved against beam-searching every line.
+    Only lines that were actually decoded count: translation memory hits
+    take no decoding time in either mode. Full beam time is the beam time
+    per decoded escalated line times the greedily decoded lines; the
+    estimates are None when no escalated line was decoded.
+    """
+    if not stats:
+        return None
+    beam_per_line = stats["beam_seconds"] / stats["beam_decoded"] if stats["beam_decoded"] else None
+    full_beam = beam_per_line * stats["greedy_decoded"] if beam_per_line is not None else None
+    spent = stats["greedy_seconds"] + stats["beam_seconds"] + stats["rescoring_seconds"]
+    return {
+        "threshold": threshold,
+        "lines": stats["lines"],
+        "escalated": stats["escalated"],
+        "improved": stats["improved"],
+        "greedy_decoded": round(stats["greedy_decoded"]),
+        "beam_decoded": round(stats["beam_decoded"]),
+        "greedy_seconds": round(stats["greedy_seconds"], 2),
+        "beam_seconds": round(stats["beam_seconds"], 2),
+        "rescoring_seconds": round(stats["rescoring_seconds"], 2),
+        "estimated_full_beam_seconds": round(full_beam, 2) if full_beam is not None else None,
+        "estimated_seconds_saved": round(full_beam - spent, 2) if full_beam is not None else None
+    }
+
+def triage_reasons(original, translated, confidence, duration):
+    """Why a line is risky enough to always back-translate in triage mode (empty if it isn't)."""
+    reasons = []
+    if len(original.split()) > TRIAGE_LONG_WORDS:
+        reasons.append("long")
+    if duration is not None and compute_cps(translated, 0, duration) >= TRIAGE_HIGH_CPS:
+        reasons.append("high_cps")
+    if confidence < TRIAGE_MIN_CONFIDENCE:
+        reasons.append("low_confidence")
+    if _NUMBER_OR_NAME.search(original):
+        reasons.append("numbers_names")
+    return reasons
+
+def triage_sample(others, rate, seed=TRIAGE_SEED):
+    """The lines (of the non-risky others) triage mode also checks: round(rate * len(others)) of them, maybe none."""
+    return random.Random(seed).sample(others, min(len(others), round(rate * len(others))))
+
+def triage_summary(stats, sample_rate, z=1.96):
+    """
+    Stratified estimate of the mean similarity over all translated lines:
+    risky lines are all measured, the rest are estimated from their random
+    sample, with a normal-approximation confidence interval (finite population
+    corrected) from the sample variance.
+    """
+    if not stats:
+        return None
+    lines, risky, sampled = stats["lines"], stats["risky"], stats["sampled"]
+    others = lines - risky
+    estimate = margin = None
+    if sampled:
+        sample_mean = stats["sample_sum"] / sampled
+        estimate = (stats["risky_sum"] + others * sample_mean) / lines
+        variance = (stats["sample_sumsq"] - sampled * sample_mean ** 2) / (sampled - 1) if sampled > 1 else 0.0
+        margin = z * (others / lines) * math.sqrt(max(0.0, variance) * (1 - sampled / others) / sampled)
+    elif risky:
+        estimate, margin = stats["risky_sum"] / risky, 0.0
+    return {
+        "sample_rate": sample_rate,
+        "lines": lines,
+        "risky": risky,
+        "sampled": sampled,
+        "back_translated": risky + sampled,
+        "back_translation_fraction": round((risky + sampled) / lines, 4) if lines else 0.0,
+        "reasons": {key[len("reason_"):]: value for key, value in stats.items() if key.startswith("reason_")},
+        "estimated_similarity": round(estimate, 3) if estimate is not None else None,
+        "ci95": [round(estimate - margin, 3), round(estimate + margin, 3)] if estimate is not None else None
+    }
+
+# -------------------
+# Translation job
+# -------------------
+def source_window(subs):
+    """(subs, texts, sound-cue flags, durations) for one window of parsed cues."""
+    texts = [s.text.replace("\n", " ").strip() for s in subs]
+    cues = [is_sound_cue(t) for t in texts]
+    durations = [time_to_seconds(s.end) - time_to_seconds(s.start) for s in subs]
+    return subs, texts, cues, durations
+
+class SrtTranslation:
+    """
+    One SRT/report pair being translated and written window by window.
+    add(subs, texts, cues, durations) translates one window (see
+    source_window) and appends it to the outputs, finish() writes the report
+    metadata and returns the result dict, abort() removes the partial
+    outputs. translate_srt() drives one over a file; a multi-target job
+    drives one per target from a single pass over it (translate_jobs.py).
+    Options are translate_srt()'s; source is the job's SharedSource, whose
+    eol, cue_count and per-window source embeddings are used.
+    """
+
+    def __init__(self, uploaded_srt, src_lang, tgt_lang, out_base, skip_back_translation=False, progress=None,
+                 backend=DEFAULT_BACKEND, pipeline=False, workers=1, window=None, report_format="json",
+                 adaptive_threshold=None, triage_rate=None, overlap=False, overlap_threads=None, source=None,
+                 shared_results=None):
+        check_options(skip_back_translation, pipeline, workers, window, report_format, adaptive_threshold,
+                      triage_rate, overlap)
+        self.job_start = time.time()
+        self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.out_srt_path = f"{out_base}_{self.timestamp}.srt"
+        self.out_json_path = f"{out_base}_{self.timestamp}.{report_format}"
+        self.src_lang, self.tgt_lang = src_lang, tgt_lang
+        self.skip_back_translation = skip_back_translation
+        self.backend = backend
+        self.pipeline = pipeline
+        self.workers = workers
+        self.window = window
+        self.adaptive_threshold = adaptive_threshold
+        self.triage_rate = triage_rate
+        self.source = source
+        self.shared_results = shared_results
+
+        # Models come from the shared registry and stay resident across jobs
+        # (worker mode) until the registry's memory budget evicts them
+        load_start = time.time()
+        self.registry = get_registry()
+        self.sbert_name = PIPELINE_SBERT_MODEL_NAME if pipeline else SBERT_MODEL_NAME
+        if workers <= 1:
+            self.registry.marian_pair(src_lang, tgt_lang, back=not skip_back_translation, backend=backend)
+            if not skip_back_translation:
+                self.registry.sentence_transformer(self.sbert_name)
+        self.load_seconds = time.time() - load_start
+
+        self.start_time = time.time()
+        # Translation memory hits per Marian stage, plus embedding cache hits
+        self.tm_stats = {"forward": {"hits": 0, "misses": 0}, "back_translation": {"hits": 0, "misses": 0},
+                         "embedding": {"hits": 0, "misses": 0}}
+        self.settings = {
+            "src_lang": src_lang,
+            "tgt_lang": tgt_lang,
+            "backend": backend,
+            "skip_back_translation": skip_back_translation,
+            "sbert_name": self.sbert_name,
+            "adaptive_threshold": adaptive_threshold,
+            "triage_rate": triage_rate,
+            "bt_decode": PIPELINE_BT_DECODE if pipeline else None
+        }
+        self.adaptive = adaptive_threshold is not None and not skip_back_translation
+        self.overlap = overlap and not skip_back_translation
+        self.overlap_threads = (overlap_threads or default_overlap_threads()) if self.overlap else overlap_threads
+        if workers > 1:
+            # Contiguous chunks in a process pool, each worker with its own models
+            # and an even share of this process's thread budget
+            self.reporter = ProgressReporter(progress, ["chunks"])
+        elif window:
+            self.reporter = ProgressReporter(progress, ["windows"])
+            self.reporter.start_stage("windows", source.cue_count if source else count_cues(uploaded_srt))
+        elif self.overlap:
+            self.reporter = ProgressReporter(progress, ["batches"])
+        else:
+            self.reporter = ProgressReporter(progress, pipeline_stages(skip_back_translation, self.adaptive))
+
+        # Only pipeline mode keeps every line, for its artifact
+        self.artifact_lines = {"texts": [], "trans_texts": [], "bt_texts": [], "orig_emb": [], "bt_emb": []}
+        self.total_lines = 0
+        self.high_speed_count = 0
+        self.cps_sum = 0.0
+        self.bt_match_sum = 0.0
+        self.confidence_sum = 0.0
+        self.srt_writer = SrtWriter(self.out_srt_path, eol=source.eol if source else detect_eol(uploaded_srt))
+        self.json_writer = (ColumnarReportWriter if report_format == "npz" else JsonReportWriter)(
+            self.out_json_path, "subtitles"
+        )
+
+    def add(self, subs, texts, cues, durations):
+        """Translate one window and append it to the SRT and report; subs get the translations."""
+        settings, tm_stats = self.settings, self.tm_stats
+        reporter = None if self.window else self.reporter
+        if self.shared_results is not None:
+            result = self.shared_results.lookup(texts, tm_stats)
+        elif self.workers > 1:
+            result = parallel_translate(
+                texts, cues, self.workers, max(1, torch.get_num_threads() // self.workers),
+                reporter=self.reporter, tm_stats=tm_stats, durations=durations, line_offset=self.total_lines,
+                **settings
+            )
+        elif self.overlap:
+            result = overlapped_translate(
+                texts, cues, self.overlap_threads, reporter=reporter, tm_stats=tm_stats, durations=durations,
+                **settings
+            )
+        else:
+            source = self.source
+            result = translate_lines(
+                texts, cues, reporter=reporter, tm_stats=tm_stats, durations=durations, line_offset=self.total_lines,
+                source_embeddings=(
+                    lambda positions: source.embeddings(self.sbert_name, tm_stats, positions)
+                ) if source and not self.skip_back_translation else None,
+                **settings
+            )
+        trans_texts, bt_texts = result["translated"], result["back_translated"]
+        orig_emb, bt_emb, similarities = result["orig_emb"], result["bt_emb"], result["similarities"]
+        confidences = result["confidences"]
+
+        if self.pipeline and not self.skip_back_translation:
+            self.artifact_lines["texts"].extend(texts)
+            self.artifact_lines["trans_texts"].extend(trans_texts)
+            self.artifact_lines["bt_texts"].extend(bt_texts)
+            self.artifact_lines["orig_emb"].append(orig_emb.cpu().numpy())
+            self.artifact_lines["bt_emb"].append(bt_emb.cpu().numpy())
+
+        # Fill subtitles and report
+        report = []
+        for idx, sub in enumerate(subs):
+            original_text = texts[idx]
+            translated_text = trans_texts[idx] if not cues[idx] else original_text
+            bt_match = similarities[idx]
+            start_sec = time_to_seconds(sub.start)
+            end_sec = time_to_seconds(sub.end)
+            cps = compute_cps(translated_text, start_sec, end_sec)
+            if cps >= 20:
+                self.high_speed_count += 1
+
+            sub.text = translated_text  # preserve cues
+
+            entry = {
+                "index": sub.index,
+                "original": original_text,
+                "translated": translated_text,
+                "start": str(sub.start),
+                "end": str(sub.end),
+                "reading_speed_cps": round(cps, 2),
+                "confidence": round(confidences[idx], 3),
+                "back_translation_match": round(bt_match, 3) if bt_match is not None else None,
+                "novelty": bt_match < 0.95 if bt_match is not None else None
+            }
+            if self.adaptive:
+                entry["escalated"] = result["escalated"][idx]
+            if self.triage_rate is not None:
+                entry["checked"] = result["checked"][idx]
+                entry["risk"] = result["risk"][idx]
+            report.append(entry)
+            self.cps_sum += round(cps, 2)
+            self.bt_match_sum += round(bt_match, 3) if bt_match is not None else 0.0
+            self.confidence_sum += round(confidences[idx], 3)
+
+        self.srt_writer.write(subs)
+        self.json_writer.add(report)
+        self.total_lines += len(subs)
+        if self.window:
+            self.reporter.advance(len(subs))
+
+    def abort(self):
+        """No half-written outputs for failed or cancelled jobs."""
+        self.srt_writer.close()
+        self.json_writer.close()
+        for path in (self.out_srt_path, self.out_json_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def finish(self):
+        self.srt_writer.close()
+        src_lang, tgt_lang, tm_stats = self.src_lang, self.tgt_lang, self.tm_stats
+        skip_back_translation = self.skip_back_translation
+        total_lines = self.total_lines
+
+        inference_seconds = time.time() - self.start_time
+        for stage in ("forward", "back_translation", "embedding"):
+            tm_stats[stage]["hit_rate"] = hit_rate(tm_stats[stage])
+
+        triage = triage_summary(tm_stats.get("triage"), self.triage_rate) if self.triage_rate is not None else None
+
+        artifact_file = None
+        if self.pipeline and not skip_back_translation:
+            artifact_lines = self.artifact_lines
+            artifact_file = save_artifact(
+                os.path.dirname(os.path.abspath(self.out_json_path)), src_lang, tgt_lang,
+                artifact_lines["texts"], artifact_lines["trans_texts"], artifact_lines["bt_texts"],
+                np.concatenate(artifact_lines["orig_emb"]) if artifact_lines["orig_emb"] else np.empty((0, 0)),
+                np.concatenate(artifact_lines["bt_emb"]) if artifact_lines["bt_emb"] else np.empty((0, 0)),
+                sbert_model=self.sbert_name, bt_model=marian_model_name(tgt_lang, src_lang),
+                bt_decode=PIPELINE_BT_DECODE
+            )
+
+        metadata = {
+            "model": marian_model_name(src_lang, tgt_lang),
+            "src_lang": src_lang,
+            "tgt_lang": tgt_lang,
+            "lines_translated": total_lines,
+            "elapsed_seconds": None,  # whole job, set once the outputs are written
+            "load_seconds": round(self.load_seconds, 2),
+            "inference_seconds": round(inference_seconds, 2),
+            "avg_cps": round(self.cps_sum/max(1, total_lines), 2),
+            "avg_confidence": round(self.confidence_sum/max(1, total_lines), 3),
+            "avg_bt_match": (
+                round(self.bt_match_sum/max(1, total_lines), 3) if triage is None else triage["estimated_similarity"]
+            ),
+            "high_speed_count": self.high_speed_count,
+            "device": device,
+            "backend": self.backend,
+            "workers": self.workers,
+            "window": self.window,
+            "sbert_model": self.sbert_name if not skip_back_translation else None,
+            "model_registry": self.registry.stats(),
+            "translation_memory": {stage: tm_stats[stage] for stage in ("forward", "back_translation")},
+            "embedding_cache": tm_stats["embedding"] if not skip_back_translation else None,
+            "adaptive": adaptive_summary(tm_stats.get("adaptive"), self.adaptive_threshold) if self.adaptive else None,
+            "triage": triage,
+            "overlap": overlap_summary(tm_stats.get("overlap"), self.overlap_threads) if self.overlap else None,
+            # Summed over chunks, so with --workers N these add up to more than the elapsed time
+            "stage_seconds": {stage: round(sec, 3) for stage, sec in tm_stats.get("stage_seconds", {}).items()},
+            "artifact": os.path.basename(artifact_file) if artifact_file else None,
+            "timestamp": self.timestamp
+        }
+
+        # -------------------
+        # Save outputs
+        # -------------------
+        # Subtitles were written window by window; metadata closes the report
+        metadata["elapsed_seconds"] = round(time.time() - self.job_start, 2)
+        self.json_writer.close(metadata=metadata)
+        index_report(self.out_json_path)  # downloads analytics index (report_index.py)
+
+        return {
+            "progress": 1.0,
+            "srt_file": self.out_srt_path,
+            "json_file": self.out_json_path,
+            "meta": metadata
+        }
+
+@using_models
+def translate_srt(uploaded_srt, src_lang, tgt_lang, out_base, skip_back_translation=False, progress=None,
+                  backend=DEFAULT_BACKEND, pipeline=False, workers=1, window=None, report_format="json",
+                  adaptive_threshold=None, triage_rate=None, overlap=False, overlap_threads=None,
+                  shared_results=None):
+    """
+    Translate one SRT file and write the SRT/JSON pair; returns the result dict.
+    progress, if given, is called with a progress event dict after every batch.
+    backend selects the Marian inference backend (see inference_backend.py).
+    pipeline also stores a reusable back-translation/embedding artifact.
+    workers > 1 splits the file across that many processes (parallel_translate.py).
+    window streams the file in windows of that many cues (srt_stream.py).
+    report_format "npz" writes the report as a columnar .npz (columnar_report.py).
+    adaptive_threshold decodes greedily and escalates low-similarity lines to beam search.
+    triage_rate back-translates only risky lines plus that fraction of the rest.
+    overlap runs the three stages concurrently; overlap_threads is the process-wide torch thread count.
+    shared_results is a DedupResults (batch jobs) that replaces translating the lines.
+    """
+    job = SrtTranslation(
+        uploaded_srt, src_lang, tgt_lang, out_base, skip_back_translation, progress, backend, pipeline, workers,
+        window, report_format, adaptive_threshold, triage_rate, overlap, overlap_threads,
+        shared_results=shared_results
+    )
+    # Cues are read, translated and written one window at a time, so memory
+    # is bounded by the window size (the whole file is one window by default)
+    try:
+        for subs in windows(iter_srt(uploaded_srt), window):
+            job.add(*source_window(subs))
+    except BaseException:
+        job.abort()
+        raise
+    return job.finish()
 
 # -------------------
-# Save outputs
+# Entry points
 # -------------------
-subs.save(out_srt_path, encoding="utf-8")
-
-metadata = {
-    "model": model_name,
-    "src_lang": src_lang,
-    "tgt_lang": tgt_lang,
-    "lines_translated": total_lines,
-    "elapsed_seconds": round(time.time() - start_time, 2),
-    "avg_cps": round(sum(r["reading_speed_cps"] for r in report)/len(report), 2),
-    "avg_confidence": 0.9,
-    "avg_bt_match": round(sum(r["back_translation_match"] for r in report)/len(report), 3),
-    "high_speed_count": high_speed_count,
-    "device": device,
-    "timestamp": timestamp
-}
-
-output_json = {
-    "metadata": metadata,
-    "subtitles": report
-}
-
-with open(out_json_path, "w", encoding="utf-8") as f:
-    json.dump(output_json, f, indent=2, ensure_ascii=False)
-
-print(json.dumps({
-    "progress": 1.0,
-    "srt_file": out_srt_path,
-    "json_file": out_json_path,
-    "meta": metadata
-}))
-sys.stdout.flush()
+def main(argv):
+    from translate_jobs import run_translation
+    from worker import emit, serve
+
+    # --threads pins this process's torch pool (the job queue gives each worker a share of the cores)
+    configure_torch_threads(int(argv[argv.index("--threads") + 1]) if "--threads" in argv else None)
+
+    if "--worker" in argv:
+        serve()
+        return
+
+    uploaded_srt = argv[1]
+    src_lang = argv[2]
+    tgt_lang = argv[3]
+    out_base = argv[4]
+    skip_back_translation = "--fast" in argv  # optional fast mode
+    backend = argv[argv.index("--backend") + 1] if "--backend" in argv else DEFAULT_BACKEND
+    pipeline = "--pipeline" in argv
+    workers = int(argv[argv.index("--workers") + 1]) if "--workers" in argv else 1
+    window = int(argv[argv.index("--window") + 1]) if "--window" in argv else None
+    report_format = argv[argv.index("--report-format") + 1] if "--report-format" in argv else "json"
+    adaptive_threshold = float(argv[argv.index("--adaptive") + 1]) if "--adaptive" in argv else None
+    triage_rate = float(argv[argv.index("--triage") + 1]) if "--triage" in argv else None
+    overlap = "--overlap" in argv
+    overlap_threads = (
+        parse_overlap_threads(argv[argv.index("--overlap-threads") + 1]) if "--overlap-threads" in argv else None
+    )
+
+    try:
+        result = run_translation(
+            uploaded_srt, src_lang, tgt_lang, out_base, skip_back_translation=skip_back_translation,
+            progress=emit, backend=backend, pipeline=pipeline, workers=workers,
+            window=window, report_format=report_format, adaptive_threshold=adaptive_threshold,
+            triage_rate=triage_rate, overlap=overlap, overlap_threads=overlap_threads, batch="--batch" in argv
+        )
+    except Exception as e:
+        emit({"error": str(e)})
+        sys.exit(1)
+    emit(result)
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,366 @@
+# translate_jobs.py
+# Jobs that write more than one translate.py SRT/report pair.
+#
+# Several target languages (es,fr,de) make one job: the upload is streamed
+# once, each window translated into every target before the next is read,
+# and its cue flags, durations and source embeddings are shared. Each
+# target gets its own SRT/JSON pair (<out_base>_<tgt>_...) and the result is
+# {"targets": {tgt: <single-target result>}, "summary": ..., "summary_file": ...}
+# with the summary written to summary_<out_base name>_<timestamp>.json.
+#
+# --batch (job key "batch", with "uploaded_srt" an archive/directory or
+# "uploaded_srts" a list) translates many files as one job: identical lines
+# (after whitespace normalization) across all files are translated once, in
+# shared generate() batches, and fanned back out to one SRT/report pair per
+# file (<out_base>_<nnn>_<name>_...). The result is {"files": [...],
+# "summary": ..., "summary_file": ...}; the summary has the dedup ratio and
+# lines/sec.
+import copy
+import functools
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+from datetime import datetime
+import torch
+from embedding_cache import normalize_text
+from inference_backend import DEFAULT_BACKEND
+from model_registry import get_registry, using_models
+from parallel_translate import parallel_translate
+from progress import ProgressReporter, pipeline_stages
+from srt_stream import count_cues, detect_eol, iter_srt, windows
+from stage_pipeline import default_overlap_threads, overlapped_translate
+from translate import (PIPELINE_BT_DECODE, PIPELINE_SBERT_MODEL_NAME, SBERT_MODEL_NAME, SrtTranslation, check_options,
+                       encode_texts, is_sound_cue, source_window, translate_lines, translate_srt)
+from translation_memory import hit_rate
+
+
+class DedupResults:
+    """
+    translate_lines() results for the unique lines of a batch job, looked up
+    per window (lookup(texts)) in the same shape a translate_lines() call on
+    those texts returns.
+
+    lookup(texts, tm_stats) also adds the window's share of the shared run's
+    stats to a file's tm_stats. The first occurrence of a line in the batch
+    gets its unique line's cache hits/misses ("lookups", see translate_lines'
+    line_stats) and adaptive outcome; a repeat counts all its lookups as hits,
+    since it cost nothing. Greedy time and decoded-line counts are split
+    evenly over the unique lines and beam/rescoring ones over the escalated.
+    """
+
+    def __init__(self, keys, result, cues, adaptive_stats=None):
+        self.index = {key: i for i, key in enumerate(keys)}
+        self.result = result
+        self.cues = cues
+        self.adaptive_stats = adaptive_stats
+        self.seen = set()
+
+    def lookup(self, texts, tm_stats=None):
+        idx = [self.index[normalize_text(t)] for t in texts]
+        out = {}
+        for key, value in self.result.items():
+            if value is None:
+                out[key] = None
+            elif isinstance(value, torch.Tensor):
+                out[key] = value[idx]
+            else:
+                out[key] = [value[i] for i in idx]
+        if tm_stats is not None:
+            self._attribute(idx, tm_stats)
+        return out
+
+    def _attribute(self, idx, tm_stats):
+        lookups = self.result.get("lookups")
+        shared = self.adaptive_stats
+        if shared:
+            adaptive = tm_stats.setdefault("adaptive", {key: type(value)() for key, value in shared.items()})
+        for i in idx:
+            first = i not in self.seen
+            self.seen.add(i)
+            if lookups is not None:
+                for stage, (hits, misses) in lookups[i].items():
+                    tm_stats[stage]["hits"] += hits if first else hits + misses
+                    tm_stats[stage]["misses"] += misses if first else 0
+            if not shared or self.cues[i]:
+                continue
+            escalated = self.result["escalated"][i]
+            adaptive["lines"] += 1
+            adaptive["escalated"] += escalated
+            adaptive["improved"] += self.result["improved"][i]
+            if first:
+                for key in ("greedy_decoded", "greedy_seconds"):
+                    adaptive[key] += shared[key] / shared["lines"]
+                if escalated:
+                    for key in ("beam_decoded", "beam_seconds", "rescoring_seconds"):
+                        adaptive[key] += shared[key] / shared["escalated"]
+
+
+class SharedSource:
+    """
+    An upload streamed once for all targets of a multi-target job: each of
+    its windows (see source_window) is handed to every target before the
+    next is read, and the source embeddings of a window's lines are computed
+    by the first target that needs them. Only the current window is held.
+    """
+
+    def __init__(self, path, window=None):
+        self.path = path
+        self.window = window
+        self.eol = detect_eol(path)
+        self.cue_count = count_cues(path)
+        self._texts = []
+        self._embeddings = {}
+        self.embeddings_reused = 0
+
+    def iter_windows(self):
+        for subs in windows(iter_srt(self.path), self.window):
+            subs, texts, cues, durations = source_window(subs)
+            self._texts, self._embeddings = texts, {}
+            yield subs, texts, cues, durations
+
+    def embeddings(self, sbert_name, tm_stats, positions):
+        """Embeddings of the current window's lines at positions; each line is encoded once across targets."""
+        rows = self._embeddings.setdefault(sbert_name, {})
+        missing = [i for i in positions if i not in rows]
+        self.embeddings_reused += len(positions) - len(missing)
+        sbert_model = get_registry().sentence_transformer(sbert_name)
+        encoded = encode_texts(sbert_model, [self._texts[i] for i in missing], sbert_name, tm_stats["embedding"])
+        rows.update(zip(missing, encoded))
+        if not positions:
+            return encoded
+        return torch.stack([rows[i] for i in positions])
+
+
+def target_languages(tgt_lang):
+    """Target list from "es", "es,fr,de" or ["es", "fr"], without duplicates."""
+    langs = tgt_lang if isinstance(tgt_lang, (list, tuple)) else str(tgt_lang).split(",")
+    return list(dict.fromkeys(lang.strip() for lang in langs if lang.strip()))
+
+
+@using_models
+def translate_srt_multi(uploaded_srt, src_lang, tgt_langs, out_base, progress=None, **options):
+    """
+    Translate one SRT into several languages. The file is streamed once
+    through a SharedSource: every window is translated into each target in
+    turn (one SrtTranslation per target) before the next window is read, so
+    --window keeps memory bounded and cue flags, durations and source
+    embeddings are shared. All targets' models stay loaded for the whole job.
+    Writes one SRT/report pair per target plus a combined summary JSON.
+    """
+    if src_lang in tgt_langs:
+        raise ValueError(f"Target languages must differ from the source ({src_lang})")
+    start_time = time.time()
+    source = SharedSource(uploaded_srt, options.get("window"))
+    done = dict.fromkeys(tgt_langs, 0.0)
+
+    def target_progress(event, tgt_lang):
+        done[tgt_lang] = event["progress"]
+        overall = sum(done.values()) / len(tgt_langs)
+        elapsed = time.time() - start_time
+        progress(dict(
+            event, target=tgt_lang, progress=round(overall, 4),
+            eta_seconds=round(elapsed / overall * (1 - overall), 1) if overall > 0 else None
+        ))
+
+    jobs = {}
+    try:
+        for tgt_lang in tgt_langs:
+            jobs[tgt_lang] = SrtTranslation(
+                uploaded_srt, src_lang, tgt_lang, f"{out_base}_{tgt_lang}",
+                progress=functools.partial(target_progress, tgt_lang=tgt_lang) if progress else None,
+                source=source, **options
+            )
+        for subs, texts, cues, durations in source.iter_windows():
+            for job in jobs.values():
+                # Targets write their translation into the cues, so each gets copies
+                job.add([copy.copy(s) for s in subs], texts, cues, durations)
+    except BaseException:
+        for job in jobs.values():
+            job.abort()
+        raise
+    results = {tgt_lang: job.finish() for tgt_lang, job in jobs.items()}
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    summary = {
+        "src_lang": src_lang,
+        "tgt_langs": list(tgt_langs),
+        "lines": source.cue_count,
+        "elapsed_seconds": round(time.time() - start_time, 2),
+        "source_embeddings_reused": source.embeddings_reused,
+        "targets": {
+            tgt_lang: {
+                "srt_file": os.path.basename(result["srt_file"]),
+                "json_file": os.path.basename(result["json_file"]),
+                "inference_seconds": result["meta"]["inference_seconds"],
+                "avg_confidence": result["meta"]["avg_confidence"],
+                "avg_bt_match": result["meta"]["avg_bt_match"],
+                "high_speed_count": result["meta"]["high_speed_count"]
+            }
+            for tgt_lang, result in results.items()
+        },
+        "timestamp": timestamp
+    }
+    # Not named translated_*, so report_index.py and columnar_report.py leave it alone
+    summary_path = os.path.join(
+        os.path.dirname(os.path.abspath(out_base)), f"summary_{os.path.basename(out_base)}_{timestamp}.json"
+    )
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    return {"progress": 1.0, "targets": results, "summary": summary, "summary_file": summary_path}
+
+
+def batch_inputs(uploaded):
+    """
+    SRT paths of a batch job from a list of paths, a comma-separated string,
+    a directory or a .zip archive; returns (paths, temporary directory to
+    remove afterwards or None).
+    """
+    if isinstance(uploaded, (list, tuple)):
+        return list(uploaded), None
+    if os.path.isdir(uploaded):
+        names = sorted(n for n in os.listdir(uploaded) if n.lower().endswith(".srt"))
+        return [os.path.join(uploaded, n) for n in names], None
+    if zipfile.is_zipfile(uploaded):
+        tmp = tempfile.mkdtemp(prefix="srt_batch_")
+        paths = []
+        with zipfile.ZipFile(uploaded) as archive:
+            members = sorted(m for m in archive.namelist() if m.lower().endswith(".srt"))
+            for i, member in enumerate(members):
+                # Flattened, numbered names: no paths from the archive are trusted
+                path = os.path.join(tmp, f"{i:04d}_{os.path.basename(member)}")
+                with archive.open(member) as src, open(path, "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                paths.append(path)
+        return paths, tmp
+    return [p for p in str(uploaded).split(",") if p], None
+
+
+@using_models
+def translate_batch(srt_paths, src_lang, tgt_lang, out_base, progress=None, skip_back_translation=False,
+                    backend=DEFAULT_BACKEND, pipeline=False, workers=1, overlap=False, overlap_threads=None,
+                    adaptive_threshold=None, triage_rate=None, **file_options):
+    """
+    Translate many SRTs (e.g. a season) as one job. Lines are deduplicated
+    across all files by normalized text and the unique ones translated in a
+    single translate_lines() run (or its --workers / --overlap variants), so
+    recurring lines cost one translation and every file's lines share the
+    same length-bucketed generate() batches. Each file is then written by
+    translate_srt() from those results. Returns the per-file results plus a
+    summary with the dedup ratio and throughput (also saved as JSON).
+    """
+    # --triage is rejected: risk depends on each cue's timing, not just its text
+    check_options(skip_back_translation, pipeline, workers, adaptive_threshold=adaptive_threshold,
+                  triage_rate=triage_rate, overlap=overlap, batch=True, **file_options)
+    if not srt_paths:
+        raise ValueError("No SRT files in the batch")
+    start_time = time.time()
+
+    # Unique lines across all files, first occurrence wins
+    unique = {}
+    total_lines = 0
+    for path in srt_paths:
+        for sub in iter_srt(path):
+            text = sub.text.replace("\n", " ").strip()
+            unique.setdefault(normalize_text(text), text)
+            total_lines += 1
+    keys = list(unique)
+    texts = [unique[key] for key in keys]
+    cues = [is_sound_cue(t) for t in texts]
+
+    settings = {
+        "src_lang": src_lang,
+        "tgt_lang": tgt_lang,
+        "backend": backend,
+        "skip_back_translation": skip_back_translation,
+        "sbert_name": PIPELINE_SBERT_MODEL_NAME if pipeline else SBERT_MODEL_NAME,
+        "adaptive_threshold": adaptive_threshold,
+        "triage_rate": None,
+        "bt_decode": PIPELINE_BT_DECODE if pipeline else None,
+        "line_stats": True  # for each file's share of the cache and adaptive stats
+    }
+    tm_stats = {"forward": {"hits": 0, "misses": 0}, "back_translation": {"hits": 0, "misses": 0},
+                "embedding": {"hits": 0, "misses": 0}}
+    translate_start = time.time()
+    if workers > 1:
+        reporter = ProgressReporter(progress, ["chunks"])
+        result = parallel_translate(
+            texts, cues, workers, max(1, torch.get_num_threads() // workers),
+            reporter=reporter, tm_stats=tm_stats, **settings
+        )
+    elif overlap and not skip_back_translation:
+        reporter = ProgressReporter(progress, ["batches"])
+        result = overlapped_translate(
+            texts, cues, overlap_threads or default_overlap_threads(), reporter=reporter, tm_stats=tm_stats, **settings
+        )
+    else:
+        adaptive = adaptive_threshold is not None and not skip_back_translation
+        reporter = ProgressReporter(progress, pipeline_stages(skip_back_translation, adaptive))
+        result = translate_lines(texts, cues, reporter=reporter, tm_stats=tm_stats, **settings)
+    translate_seconds = time.time() - translate_start
+    shared = DedupResults(keys, result, cues, tm_stats.get("adaptive"))
+
+    results = []
+    for i, path in enumerate(srt_paths):
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", os.path.splitext(os.path.basename(path))[0])
+        results.append(translate_srt(
+            path, src_lang, tgt_lang, f"{out_base}_{i + 1:03d}_{name}", skip_back_translation,
+            backend=backend, pipeline=pipeline, adaptive_threshold=adaptive_threshold,
+            shared_results=shared, **file_options
+        ))
+
+    for stage in ("forward", "back_translation", "embedding"):
+        tm_stats[stage]["hit_rate"] = hit_rate(tm_stats[stage])
+    elapsed = time.time() - start_time
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    summary = {
+        "src_lang": src_lang,
+        "tgt_lang": tgt_lang,
+        "files": len(srt_paths),
+        "lines": total_lines,
+        "unique_lines": len(texts),
+        "dedup_ratio": round(1 - len(texts) / total_lines, 4) if total_lines else 0.0,
+        "translate_seconds": round(translate_seconds, 2),
+        "elapsed_seconds": round(elapsed, 2),
+        "lines_per_sec": round(total_lines / elapsed, 2) if elapsed else None,
+        "unique_lines_per_sec": round(len(texts) / translate_seconds, 2) if translate_seconds else None,
+        "translation_memory": {stage: tm_stats[stage] for stage in ("forward", "back_translation")},
+        "embedding_cache": tm_stats["embedding"] if not skip_back_translation else None,
+        "stage_seconds": {stage: round(sec, 3) for stage, sec in tm_stats.get("stage_seconds", {}).items()},
+        "outputs": [
+            {
+                "source": os.path.basename(path),
+                "srt_file": os.path.basename(r["srt_file"]),
+                "json_file": os.path.basename(r["json_file"])
+            }
+            for path, r in zip(srt_paths, results)
+        ],
+        "timestamp": timestamp
+    }
+    summary_path = os.path.join(
+        os.path.dirname(os.path.abspath(out_base)), f"summary_{os.path.basename(out_base)}_{timestamp}.json"
+    )
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    return {"progress": 1.0, "files": results, "summary": summary, "summary_file": summary_path}
+
+
+def run_translation(uploaded_srt, src_lang, tgt_lang, out_base, batch=False, **options):
+    """translate_srt, translate_srt_multi when tgt_lang names several targets, or translate_batch."""
+    tgt_langs = target_languages(tgt_lang)
+    if not tgt_langs:
+        raise ValueError("No target language given")
+    check_options(batch=batch, targets=len(tgt_langs), **options)
+    if batch:
+        srt_paths, tmp = batch_inputs(uploaded_srt)
+        try:
+            return translate_batch(srt_paths, src_lang, tgt_langs[0], out_base, **options)
+        finally:
+            if tmp is not None:
+                shutil.rmtree(tmp, ignore_errors=True)
+    if len(tgt_langs) > 1:
+        return translate_srt_multi(uploaded_srt, src_lang, tgt_langs, out_base, **options)
+    return translate_srt(uploaded_srt, src_lang, tgt_langs[0], out_base, **options)
@@ -0,0 +1,180 @@
+# translation_memory.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from batching import DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_TOKENS, iter_batched_generate
+
+# SQLite file shared by every script and worker process. Set
+# SUBTITLE_TM_PATH=off to disable the memory entirely.
+DEFAULT_TM_PATH = os.environ.get(
+    "SUBTITLE_TM_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cache", "translation_memory.sqlite")
+)
+
+
+def make_key(model_name, text, num_beams, max_length):
+    """Cache key: model + decode settings + exact source text."""
+    raw = f"{model_name}\x1f{num_beams}\x1f{max_length}\x1f{text}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TranslationMemory:
+    """Persistent (model, text, decode settings) -> translation store."""
+
+    def __init__(self, path=DEFAULT_TM_PATH):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " source TEXT NOT NULL,"
+            " target TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " log_prob REAL)"
+        )
+        # Memories created before log_prob was recorded
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(translations)")]
+        if "log_prob" not in columns:
+            self._conn.execute("ALTER TABLE translations ADD COLUMN log_prob REAL")
+        self._conn.commit()
+
+    def lookup(self, model_name, texts, num_beams, max_length, with_scores=False):
+        """
+        Return {text: translation} for the texts already in memory, or
+        {text: (translation, log_prob)} with with_scores (entries stored
+        without a score count as missing then).
+        """
+        keys = {make_key(model_name, t, num_beams, max_length): t for t in set(texts)}
+        found = {}
+        key_list = list(keys)
+        with self._lock:
+            for i in range(0, len(key_list), 500):
+                chunk = key_list[i:i+500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, target, log_prob FROM translations WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, target, log_prob in rows:
+                    if not with_scores:
+                        found[keys[key]] = target
+                    elif log_prob is not None:
+                        found[keys[key]] = (target, log_prob)
+        return found
+
+    def store(self, model_name, pairs, num_beams, max_length, scores=None):
+        """
+        Insert (source, translation) pairs, with their mean token log-probs if
+        given; storing a pair without a score keeps the score already recorded.
+        """
+        now = time.time()
+        scores = scores if scores is not None else [None] * len(pairs)
+        rows = [
+            (make_key(model_name, src, num_beams, max_length), model_name, src, tgt, now, log_prob)
+            for (src, tgt), log_prob in zip(pairs, scores)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO translations (key, model, source, target, created, log_prob)"
+                " VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET target=excluded.target, created=excluded.created,"
+                " log_prob=COALESCE(excluded.log_prob, translations.log_prob)", rows
+            )
+            self._conn.commit()
+
+
+_memory = None
+
+
+def get_translation_memory():
+    """Shared memory for this process, or None when disabled."""
+    global _memory
+    if DEFAULT_TM_PATH.lower() == "off":
+        return None
+    if _memory is None:
+        _memory = TranslationMemory()
+    return _memory
+
+
+def hit_rate(stats):
+    total = stats["hits"] + stats["misses"]
+    return round(stats["hits"] / total, 4) if total else 0.0
+
+
+def iter_cached_generate(texts, model_name, model, tokenizer, memory=None, stats=None, device="cpu",
+                         max_tokens=DEFAULT_MAX_TOKENS, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                         max_length=256, num_beams=4, with_scores=False, hit_lines=None):
+    """
+    cached_generate() one batch at a time. Yields (line indices, outputs):
+    first the lines found in memory, then the lines of each generate() call
+    (every line with the batch's texts), in the batches cached_generate() runs.
+    """
+    if memory is None:
+        if stats is not None:
+            stats["misses"] = stats.get("misses", 0) + len(texts)
+        yield from iter_batched_generate(
+            texts, model, tokenizer, max_tokens=max_tokens, max_batch_size=max_batch_size,
+            device=device, max_length=max_length, num_beams=num_beams, with_scores=with_scores
+        )
+        return
+
+    known = memory.lookup(model_name, texts, num_beams, max_length, with_scores=with_scores)
+    missing = list(dict.fromkeys(t for t in texts if t not in known))
+    lines = {}
+    for i, text in enumerate(texts):
+        lines.setdefault(text, []).append(i)
+    if stats is not None:
+        hits = sum(len(lines[t]) for t in lines if t in known)
+        stats["hits"] = stats.get("hits", 0) + hits
+        stats["misses"] = stats.get("misses", 0) + len(texts) - hits
+
+    found = [i for i, text in enumerate(texts) if text in known]
+    if hit_lines is not None:
+        hit_lines.extend(found)
+    if found:
+        yield found, [known[texts[i]] for i in found]
+    for indices, generated in iter_batched_generate(
+        missing, model, tokenizer, max_tokens=max_tokens, max_batch_size=max_batch_size,
+        device=device, max_length=max_length, num_beams=num_beams, with_scores=with_scores
+    ):
+        new_pairs = [(missing[i], out) for i, out in zip(indices, generated)]
+        if with_scores:
+            memory.store(
+                model_name, [(src, tgt) for src, (tgt, _) in new_pairs], num_beams, max_length,
+                scores=[log_prob for _, (_, log_prob) in new_pairs]
+            )
+        else:
+            memory.store(model_name, new_pairs, num_beams, max_length)
+        yield (
+            [line for src, _ in new_pairs for line in lines[src]],
+            [out for src, out in new_pairs for _ in lines[src]]
+        )
+
+
+def cached_generate(texts, model_name, model, tokenizer, memory=None, stats=None, device="cpu",
+                    max_tokens=DEFAULT_MAX_TOKENS, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                    max_length=256, num_beams=4, on_lines=None, with_scores=False, hit_lines=None):
+    """
+    batched_generate() that consults the translation memory first and only
+    runs generate() for unique texts not seen before with the same model and
+    decode settings. stats, if given, gets per-line "hits"/"misses" added;
+    on_lines, if given, is called with the number of input lines finished.
+    with_scores returns (translation, mean token log-prob) pairs. hit_lines,
+    if given, is a list that gets the positions of the texts found in memory.
+    """
+    results = [None] * len(texts)
+    for indices, outputs in iter_cached_generate(
+        texts, model_name, model, tokenizer, memory=memory, stats=stats, device=device, max_tokens=max_tokens,
+        max_batch_size=max_batch_size, max_length=max_length, num_beams=num_beams, with_scores=with_scores,
+        hit_lines=hit_lines
+    ):
+        for i, out in zip(indices, outputs):
+            results[i] = out
+        if on_lines is not None:
+            on_lines(len(indices))
+    return results
@@ -1,22 +1,24 @@
-import json
+import sys
 import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
 from pathlib import Path
+from columnar_report import open_report
 
 # -----------------------
-# Fixed input path
+# Input path (JSON or columnar .npz report)
 # -----------------------
-json_file = r"C:\Users\adity\subtitle-webapp\backend\python_scripts\translated_1762535368818_a4294561-8699-46ae-ac6c-3e69dcfa1ee7_20251107_223937.json"
+json_file = sys.argv[1] if len(sys.argv) > 1 else r"C:\Users\adity\subtitle-webapp\backend\python_scripts\translated_1762535368818_a4294561-8699-46ae-ac6c-3e69dcfa1ee7_20251107_223937.json"
 
 # -----------------------
 # Load data
 # -----------------------
-with open(json_file, "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-subs = pd.DataFrame(data["subtitles"])
-meta = data["metadata"]
+# Only the columns plotted below are read from a columnar report
+with open_report(json_file) as data:
+    subs = data.to_dataframe(
+        ["index", "original", "translated", "reading_speed_cps", "back_translation_match", "novelty"]
+    )
+    meta = data.fields["metadata"]
 
 print("\n=== Metadata Summary ===")
 for k, v in meta.items():
@@ -0,0 +1,132 @@
+# worker.py
+# Warm worker protocol of `translate.py --worker` (translationWorker.js keeps
+# one per job queue slot). Models stay resident in the process's registry
+# between jobs. One JSON job per line on stdin:
+#   {"id": "...", "uploaded_srt": "...", "src_lang": "en", "tgt_lang": "es",
+#    "out_base": "...", "fast": false, "backend": "torch", "pipeline": false, "workers": 1,
+#    "window": null, "report_format": "json", "adaptive": null,
+#    "triage": null, "overlap": false, "overlap_threads": null, "batch": false}
+# answered with one JSON line per job on stdout (same shape as the one-shot
+# output plus "id", or {"id": ..., "error": ...}). "tgt_lang" may also be a
+# list or comma-separated string of targets, and "batch" jobs take
+# "uploaded_srts" (see translate_jobs.py).
+# {"cancel": "<id>"} cancels a queued or running job.
+# {"id": "...", "kind": "similarity", "original_srt": "...", "translated_srt": "...",
+#  "out_json": "...", "src_lang": "en", "tgt_lang": "es", "threshold": 0.7,
+#  "artifacts_dir": null, "align": false} runs similarity.py's check on the same
+# resident models ("align" pairs cues by timestamps instead of by position).
+# Progress events (progress.py) carry the job's "id" too; the first line a
+# worker prints is {"event": "ready"}.
+import json
+import queue
+import sys
+import threading
+
+_emit_lock = threading.Lock()
+
+
+def emit(message):
+    with _emit_lock:
+        print(json.dumps(message, ensure_ascii=False))
+        sys.stdout.flush()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def run_job(job, progress):
+    """Run one job message (a translation, or "kind": "similarity") and return its result dict."""
+    if job.get("kind") == "similarity":
+        from similarity import compute_similarity
+        return compute_similarity(
+            job["original_srt"], job["translated_srt"], job["out_json"],
+            src_lang=job.get("src_lang", "en"), tgt_lang=job.get("tgt_lang", "es"),
+            threshold=float(job.get("threshold", 0.7)), artifacts_dir=job.get("artifacts_dir"),
+            align=bool(job.get("align")), progress=progress
+        )
+
+    from inference_backend import DEFAULT_BACKEND
+    from stage_pipeline import parse_overlap_threads
+    from translate_jobs import run_translation
+    return run_translation(
+        job.get("uploaded_srts") or job["uploaded_srt"],
+        job.get("src_lang", "en"),
+        job.get("tgt_lang", "es"),
+        job["out_base"],
+        skip_back_translation=bool(job.get("fast")),
+        progress=progress,
+        backend=job.get("backend", DEFAULT_BACKEND),
+        pipeline=bool(job.get("pipeline")),
+        workers=int(job.get("workers", 1)),
+        window=job.get("window"),
+        report_format=job.get("report_format", "json"),
+        adaptive_threshold=job.get("adaptive"),
+        triage_rate=job.get("triage"),
+        overlap=bool(job.get("overlap")),
+        overlap_threads=parse_overlap_threads(job["overlap_threads"]) if job.get("overlap_threads") else None,
+        batch=bool(job.get("batch"))
+    )
+
+
+def serve(lines=None, handler=run_job):
+    """
+    Worker loop: one JSON job per input line (stdin by default), one JSON
+    result per stdout line. A reader thread keeps consuming input while a
+    job runs so that {"cancel": id} messages take effect at the next batch
+    boundary (the next progress callback); cancels for ids that are neither
+    queued nor running are ignored. handler(job, progress) runs a job.
+    """
+    lines = sys.stdin if lines is None else lines
+    jobs = queue.Queue()
+    active = set()  # ids queued or running
+    cancelled = set()
+    lock = threading.Lock()
+
+    def read_input():
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                message = json.loads(line)
+            except ValueError as e:
+                emit({"error": f"Invalid job: {e}"})
+                continue
+            with lock:
+                if "cancel" in message:
+                    if message["cancel"] in active:
+                        cancelled.add(message["cancel"])
+                    continue
+                active.add(message.get("id"))
+            jobs.put(message)
+        jobs.put(None)  # input closed
+
+    threading.Thread(target=read_input, daemon=True).start()
+    emit({"event": "ready"})
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id = job.get("id")
+
+        def on_progress(event, job_id=job_id):
+            if job_id in cancelled:
+                raise JobCancelled()
+            emit(dict(event, id=job_id))
+
+        try:
+            if job_id in cancelled:
+                raise JobCancelled()
+            result = handler(job, on_progress)
+            result["id"] = job_id
+            emit(result)
+        except JobCancelled:
+            emit({"id": job_id, "error": "Job cancelled", "cancelled": True})
+        except Exception as e:
+            emit({"id": job_id, "error": str(e)})
+        finally:
+            with lock:
+                active.discard(job_id)
+                cancelled.discard(job_id)
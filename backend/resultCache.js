@@ -0,0 +1,242 @@
+// resultCache.js
+// Job-level memo for /api/translate. A job's key is a SHA-256 over the
+// uploaded file's bytes, the language pair, the job's options
+// (translateOptions.js) and the versions of the models the job would load,
+// so re-uploading the same SRT (page refresh, another account) returns the
+// artifacts already in downloads/ instead of running translate.py again.
+// The inference backend and local model directory the workers run with are
+// part of the key too.
+// The cache keeps its own hard links (copies across filesystems) of a job's
+// outputs under filesDir/<key>/, and every hit gets fresh links named after
+// the hit's outBase, so each Translation record owns its files and eviction
+// only ever deletes the cache's copies. The index lives in a JSON file,
+// written at most every saveDelayMs for lookups and right away when entries
+// change; entries whose files are gone are dropped on lookup. Eviction
+// removes entries older than maxAgeMs, then the least recently used ones
+// while the cache's copies exceed maxBytes.
+const crypto = require("crypto");
+const fs = require("fs");
+const os = require("os");
+const path = require("path");
+
+const SBERT_MODEL_NAME = "paraphrase-MiniLM-L3-v2"; // translate.py
+const PIPELINE_SBERT_MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2";
+
+function hashFile(filePath) {
+  return new Promise((resolve, reject) => {
+    const hash = crypto.createHash("sha256");
+    fs.createReadStream(filePath)
+      .on("data", (chunk) => hash.update(chunk))
+      .on("error", reject)
+      .on("end", () => resolve(hash.digest("hex")));
+  });
+}
+
+// Hub revision (refs/main) of a downloaded model, or the checkpoint's mtime
+// when SUBTITLE_MODEL_DIR has a local copy (same layout as inference_backend.py)
+function modelVersion(modelName) {
+  const localDir = process.env.SUBTITLE_MODEL_DIR;
+  if (localDir) {
+    const local = path.join(path.resolve(localDir), modelName.replace(/\//g, "--"));
+    try {
+      return `local:${Math.floor(fs.statSync(local).mtimeMs)}`;
+    } catch (e) {
+      // not there -> from_pretrained falls back to the hub
+    }
+  }
+  const hubDir = process.env.HF_HUB_CACHE ||
+    path.join(process.env.HF_HOME || path.join(os.homedir(), ".cache", "huggingface"), "hub");
+  try {
+    const ref = path.join(hubDir, `models--${modelName.replace(/\//g, "--")}`, "refs", "main");
+    return fs.readFileSync(ref, "utf8").trim();
+  } catch (e) {
+    return "unknown";
+  }
+}
+
+function modelVersions({ srcLang, tgtLang, fast, pipeline }) {
+  const names = [];
+  for (const tgt of String(tgtLang).split(",").map((t) => t.trim()).filter(Boolean)) {
+    names.push(`Helsinki-NLP/opus-mt-${srcLang}-${tgt}`);
+    if (!fast) names.push(`Helsinki-NLP/opus-mt-${tgt}-${srcLang}`);
+  }
+  if (!fast) names.push(`sentence-transformers/${pipeline ? PIPELINE_SBERT_MODEL_NAME : SBERT_MODEL_NAME}`);
+  const versions = Object.fromEntries(names.map((name) => [name, modelVersion(name)]));
+  // MODEL_VERSION bumps every key at once (e.g. after changing generation settings)
+  if (process.env.MODEL_VERSION) versions.override = process.env.MODEL_VERSION;
+  return versions;
+}
+
+// Artifact paths of a translate.py result (single or multi-target)
+function resultFiles(result) {
+  if (result.targets) {
+    return Object.values(result.targets)
+      .flatMap((target) => [target.srt_file, target.json_file])
+      .concat(result.summary_file);
+  }
+  return [result.srt_file, result.json_file];
+}
+
+// Hard link, or a copy where linking isn't possible (another filesystem)
+function linkOrCopy(from, to) {
+  try {
+    fs.linkSync(from, to);
+  } catch (e) {
+    if (e.code !== "EXDEV" && e.code !== "EPERM") throw e;
+    fs.copyFileSync(from, to);
+  }
+}
+
+// A job's outputs are all named after its outBase ("summary_<name>_..." for
+// multi-target summaries), so renaming is replacing that name everywhere
+function renamed(value, fromName, toName) {
+  return JSON.parse(JSON.stringify(value).split(fromName).join(toName));
+}
+
+class ResultCache {
+  constructor({ indexPath, filesDir = null, maxAgeMs, maxBytes, saveDelayMs = 1000 }) {
+    this.indexPath = indexPath;
+    this.filesDir = filesDir || path.join(path.dirname(indexPath), "results");
+    this.maxAgeMs = maxAgeMs;
+    this.maxBytes = maxBytes;
+    this.saveDelayMs = saveDelayMs;
+    this.saveTimer = null;
+    this.entries = new Map(); // key -> { result, outBaseName, files, createdAt, lastUsed }
+    try {
+      for (const [key, entry] of Object.entries(JSON.parse(fs.readFileSync(indexPath, "utf8")))) {
+        // entries from before the cache kept its own copies point into downloads/
+        if (entry.outBaseName) this.entries.set(key, entry);
+      }
+    } catch (e) {
+      if (e.code !== "ENOENT") console.error("Result cache index unreadable, starting empty:", e.message);
+    }
+  }
+
+  async key(uploadedPath, params) {
+    const body = JSON.stringify({
+      file: await hashFile(uploadedPath),
+      srcLang: params.srcLang,
+      tgtLang: params.tgtLang,
+      fast: Boolean(params.fast),
+      pipeline: Boolean(params.pipeline),
+      // without a backend option the workers use this environment's (see inference_backend.py)
+      backend: params.backend || process.env.SUBTITLE_INFERENCE_BACKEND || "torch",
+      window: params.window || null,
+      reportFormat: params.reportFormat || "json",
+      adaptive: params.adaptive ?? null,
+      triage: params.triage ?? null,
+      overlap: Boolean(params.overlap),
+      overlapThreads: params.overlapThreads || null,
+      modelDir: process.env.SUBTITLE_MODEL_DIR ? path.resolve(process.env.SUBTITLE_MODEL_DIR) : null,
+      models: modelVersions(params)
+    });
+    return crypto.createHash("sha256").update(body).digest("hex");
+  }
+
+  // The cached result with its outputs linked under outBase's name, or null on a miss
+  get(key, outBase) {
+    const entry = this.entries.get(key);
+    if (!entry) return null;
+    if (Date.now() - entry.createdAt > this.maxAgeMs || !entry.files.every((f) => fs.existsSync(f))) {
+      this._remove(key);
+      this.flush();
+      return null;
+    }
+    const result = renamed(entry.result, entry.outBaseName, path.basename(outBase));
+    const targets = resultFiles(result);
+    try {
+      entry.files.forEach((file, i) => {
+        if (path.basename(file).startsWith("summary_")) {
+          // the summary lists the other outputs by name
+          const summary = fs.readFileSync(file, "utf8");
+          fs.writeFileSync(targets[i], summary.split(entry.outBaseName).join(path.basename(outBase)));
+        } else {
+          linkOrCopy(file, targets[i]);
+        }
+      });
+    } catch (e) {
+      console.error("Result cache hit couldn't be linked, running the job:", e.message);
+      for (const file of targets) fs.rm(file, { force: true }, () => {});
+      return null;
+    }
+    entry.lastUsed = Date.now();
+    this._scheduleSave();
+    return result;
+  }
+
+  // Stores the cache's own links to a finished job's outputs
+  set(key, result, outBase) {
+    const dir = path.join(this.filesDir, key);
+    let files;
+    try {
+      fs.rmSync(dir, { recursive: true, force: true });
+      fs.mkdirSync(dir, { recursive: true });
+      files = resultFiles(result).map((file) => {
+        const copy = path.join(dir, path.basename(file));
+        linkOrCopy(file, copy);
+        return copy;
+      });
+    } catch (e) {
+      console.error("Result cache couldn't store the job's outputs:", e.message);
+      fs.rm(dir, { recursive: true, force: true }, () => {});
+      return;
+    }
+    const now = Date.now();
+    this.entries.set(key, {
+      result, outBaseName: path.basename(outBase), files, createdAt: now, lastUsed: now
+    });
+    this.evict();
+  }
+
+  // Drops an entry and deletes the cache's copies; returns the bytes freed
+  _remove(key) {
+    const entry = this.entries.get(key);
+    this.entries.delete(key);
+    const bytes = this._filesSize(entry.files);
+    fs.rm(path.join(this.filesDir, key), { recursive: true, force: true }, () => {});
+    return bytes;
+  }
+
+  _filesSize(files) {
+    return files.reduce((sum, file) => {
+      try {
+        return sum + fs.statSync(file).size;
+      } catch (e) {
+        return sum;
+      }
+    }, 0);
+  }
+
+  // Expired entries first, then least recently used until the cached files fit maxBytes
+  evict() {
+    const now = Date.now();
+    for (const [key, entry] of this.entries) {
+      if (now - entry.createdAt > this.maxAgeMs) this._remove(key);
+    }
+    let size = this._filesSize([...this.entries.values()].flatMap((e) => e.files));
+    const byUse = [...this.entries.entries()].sort((a, b) => a[1].lastUsed - b[1].lastUsed);
+    for (const [key] of byUse) {
+      if (size <= this.maxBytes) break;
+      size -= this._remove(key);
+    }
+    this.flush();
+  }
+
+  // Hits only bump lastUsed, so their index writes are batched
+  _scheduleSave() {
+    if (this.saveTimer) return;
+    this.saveTimer = setTimeout(() => this.flush(), this.saveDelayMs);
+    this.saveTimer.unref();
+  }
+
+  flush() {
+    clearTimeout(this.saveTimer);
+    this.saveTimer = null;
+    const tmp = `${this.indexPath}.tmp`;
+    fs.mkdirSync(path.dirname(this.indexPath), { recursive: true });
+    fs.writeFileSync(tmp, JSON.stringify(Object.fromEntries(this.entries)));
+    fs.renameSync(tmp, this.indexPath);
+  }
+}
+
+module.exports = { ResultCache, modelVersions, resultFiles };
@@ -4,12 +4,17 @@ const multer = require("multer");
 const cors = require("cors");
 const path = require("path");
 const fs = require("fs");
-const { spawn } = require("child_process");
+const os = require("os");
 const jwt = require("jsonwebtoken");
 const bcrypt = require("bcryptjs");
 const { v4: uuidv4 } = require("uuid");
 const mongoose = require("mongoose");
 const { User, Translation, Similarity } = require("./UserSchema"); // <-- correct import
+const { TranslationWorker } = require("./translationWorker");
+const { JobQueue } = require("./jobQueue");
+const { ResultCache } = require("./resultCache");
+const { parseTranslateOptions } = require("./translateOptions");
+const { wantsEventStream, openEventStream, sendEvent, queueEvents, progressEvents } = require("./eventStream");
 
 // ---------------- MONGO ----------------
 mongoose.connect("mongodb://localhost:27017/subtitleApp")
@@ -24,6 +29,7 @@ const SECRET_KEY = process.env.SECRET_KEY || "REPLACE_WITH_A_SECURE_KEY";
 // adjust allowed origins for dev
 app.use(cors({
   origin: ["http://localhost:3000", "http://127.0.0.1:3000"],
+  exposedHeaders: ["X-Job-Id"],
   credentials: true
 }));
 
@@ -135,67 +141,282 @@ app.get("/api/profile", authMiddleware, async (req, res) => {
   }
 });
 
+// ---------------- JOB QUEUE ----------------
+// adjust PYTHON_PATH to your Python runtime if needed
+const PYTHON_PATH = process.env.PYTHON_PATH || "python";
+// JOB_WORKERS jobs run at once; each gets WORKER_THREADS torch threads so
+// concurrent jobs don't oversubscribe the cores
+const JOB_WORKERS = parseInt(process.env.JOB_WORKERS || "2", 10);
+const WORKER_THREADS = parseInt(
+  process.env.WORKER_THREADS || String(Math.max(1, Math.floor(os.cpus().length / JOB_WORKERS))),
+  10
+);
+
+const jobQueue = new JobQueue({ concurrency: JOB_WORKERS });
+// one warm translate.py worker per queue slot
+const translationWorkers = Array.from(
+  { length: JOB_WORKERS },
+  () => new TranslationWorker({ pythonPath: PYTHON_PATH, threads: WORKER_THREADS })
+);
+
+// JOB STATUS (queue position while waiting)
+app.get("/api/jobs/:jobId", authMiddleware, (req, res) => {
+  const status = jobQueue.status(req.params.jobId);
+  if (!status || jobQueue.owner(req.params.jobId) !== String(req.user.userId)) {
+    return res.status(404).json({ error: "Job not found" });
+  }
+  return res.json(status);
+});
+
+// CANCEL a queued or running job (job id comes from the `queued` event or X-Job-Id header)
+app.post("/api/jobs/:jobId/cancel", authMiddleware, (req, res) => {
+  if (jobQueue.owner(req.params.jobId) !== String(req.user.userId)) {
+    return res.status(404).json({ error: "Job not found" });
+  }
+  const cancelled = jobQueue.cancel(req.params.jobId);
+  return res.json({ message: cancelled ? "Cancellation requested" : "Job can't be cancelled", job_id: req.params.jobId });
+});
+
+// ---------------- RESULT CACHE ----------------
+// Repeat uploads (same bytes, languages, options and model versions) get their
+// own links to the outputs kept in cache/results/; entries expire after
+// RESULT_CACHE_MAX_AGE_HOURS and the least recently used go once the cached
+// files exceed RESULT_CACHE_MAX_MB
+const resultCache = new ResultCache({
+  indexPath: path.join(BASE_DIR, "cache", "result_cache.json"),
+  maxAgeMs: parseFloat(process.env.RESULT_CACHE_MAX_AGE_HOURS || "168") * 3600 * 1000,
+  maxBytes: parseFloat(process.env.RESULT_CACHE_MAX_MB || "2048") * 1024 * 1024
+});
+resultCache.evict();
+// hits batch their index writes; don't lose the last ones on shutdown
+process.on("exit", () => resultCache.flush());
+
 // ---------------- TRANSLATION ----------------
+// Clients opt into Server-Sent Events with `Accept: text/event-stream` or ?stream=1 (eventStream.js)
+
 app.post("/api/translate", authMiddleware, upload.single("file"), async (req, res) => {
   try {
     if (!req.file) return res.status(400).json({ error: "No file uploaded" });
 
     const srcLang = req.body.srcLang || "en";
     const tgtLang = req.body.tgtLang || "es";
+    // fast, pipeline, backend, window, reportFormat, adaptive, triage, overlap, overlapThreads
+    let options;
+    try {
+      options = parseTranslateOptions(req.body);
+    } catch (e) {
+      if (!e.invalidOption) throw e;
+      return res.status(400).json({ error: e.message });
+    }
     const uploadedPath = path.resolve(req.file.path);
     const outBase = path.join(DOWNLOAD_DIR, `translated_${Date.now()}_${uuidv4()}`);
-
-    // adjust this path to your Python runtime if needed
-    const pythonPath = process.env.PYTHON_PATH || "python";
-
-    const py = spawn(pythonPath, [
-      path.join(__dirname, "python_scripts", "translate.py"),
-      uploadedPath,
-      srcLang,
-      tgtLang,
-      outBase
-    ], { shell: true });
-
-    let stdoutBuffer = "";
-    let stderrBuffer = "";
-    py.stdout.on("data", (data) => { stdoutBuffer += data.toString(); });
-    py.stderr.on("data", (data) => { stderrBuffer += data.toString(); });
-
-    py.on("close", async (code) => {
-      if (code !== 0) {
-        console.error("Python translate error:", stderrBuffer);
-        return res.status(500).json({ error: "Translation failed", details: stderrBuffer });
+    const jobId = uuidv4();
+    const stream = wantsEventStream(req);
+    const cacheKey = await resultCache.key(uploadedPath, { srcLang, tgtLang, ...options });
+    const cached = resultCache.get(cacheKey, outBase);
+
+    if (stream) openEventStream(res, jobId);
+
+    let result = cached;
+    if (!result) {
+      const job = jobQueue.enqueue({
+        id: jobId,
+        userId: req.user.userId,
+        kind: "translate",
+        onUpdate: stream ? queueEvents(res, jobId) : null,
+        run: (job, slot) => {
+          const worker = translationWorkers[slot];
+          job.onCancel = () => worker.cancel(jobId);
+          return worker.run({
+            id: jobId,
+            uploadedSrt: uploadedPath,
+            srcLang,
+            tgtLang,
+            outBase,
+            ...options,
+            onProgress: stream ? progressEvents(res, jobId) : null
+          });
+        }
+      });
+      if (stream) {
+        // client went away before the job finished -> stop working on it
+        res.on("close", () => {
+          if (!res.writableEnded) jobQueue.cancel(jobId);
+        });
       }
 
       try {
-        const finalLine = stdoutBuffer.split("\n").filter(Boolean).pop();
-        const result = JSON.parse(finalLine);
+        result = await job.promise;
+      } catch (e) {
+        console.error("Python translate error:", e.details || e);
+        const body = {
+          error: e.cancelled ? "Translation cancelled" : "Translation failed",
+          details: e.details || e.message
+        };
+        if (stream) {
+          sendEvent(res, e.cancelled ? "cancelled" : "error", body);
+          return res.end();
+        }
+        return res.status(e.cancelled ? 409 : 500).json(body);
+      }
+      resultCache.set(cacheKey, result, outBase);
+    }
 
-        // Persist translation record
-        await Translation.create({
-          userId: req.user.userId,
-          originalFile: uploadedPath,
-          translatedFile: result.srt_file,
-          jsonReport: result.json_file,
+    // tgtLang "es,fr,de" is one multi-target job with a result per target
+    const targets = result.targets || { [tgtLang]: result };
+
+    // Persist translation records
+    for (const [lang, target] of Object.entries(targets)) {
+      await Translation.create({
+        userId: req.user.userId,
+        originalFile: uploadedPath,
+        translatedFile: target.srt_file,
+        jsonReport: target.json_file,
+        srcLang,
+        tgtLang: lang,
+        progress: 1
+      });
+    }
+
+    const payload = result.targets ? {
+      message: "Translation complete",
+      job_id: jobId,
+      progress: 1,
+      cached: Boolean(cached),
+      targets: Object.fromEntries(Object.entries(targets).map(([lang, target]) => [lang, {
+        srt_file: `/downloads/${path.basename(target.srt_file)}`,
+        json_file: `/downloads/${path.basename(target.json_file)}`
+      }])),
+      summary_file: `/downloads/${path.basename(result.summary_file)}`,
+      timing: { elapsed_seconds: result.summary.elapsed_seconds }
+    } : {
+      message: "Translation complete",
+      job_id: jobId,
+      progress: 1,
+      cached: Boolean(cached),
+      srt_file: `/downloads/${path.basename(result.srt_file)}`,
+      json_file: `/downloads/${path.basename(result.json_file)}`,
+      timing: {
+        load_seconds: result.meta.load_seconds,
+        inference_seconds: result.meta.inference_seconds
+      }
+    };
+    if (stream) {
+      sendEvent(res, "done", payload);
+      return res.end();
+    }
+    return res.json(payload);
+  } catch (err) {
+    console.error("Translate endpoint error:", err);
+    if (res.headersSent) return res.end();
+    return res.status(500).json({ error: "Translate endpoint error" });
+  }
+});
+
+// BATCH: a season as a .zip of SRTs or several `files`; lines repeated across
+// episodes are translated once. One job, one SRT/report pair per file.
+const MAX_BATCH_FILES = parseInt(process.env.MAX_BATCH_FILES || "100", 10);
+
+app.post("/api/translate/batch", authMiddleware, upload.array("files", MAX_BATCH_FILES), async (req, res) => {
+  try {
+    const files = req.files || [];
+    if (!files.length) return res.status(400).json({ error: "No files uploaded" });
+    const zip = files.length === 1 && path.extname(files[0].originalname).toLowerCase() === ".zip";
+    if (!zip && files.some((f) => path.extname(f.originalname).toLowerCase() !== ".srt")) {
+      return res.status(400).json({ error: "Upload one .zip or several .srt files" });
+    }
+
+    const srcLang = req.body.srcLang || "en";
+    const tgtLang = req.body.tgtLang || "es";
+    const pipeline = req.body.pipeline === "true" || req.body.pipeline === true;
+    const uploadedPaths = files.map((f) => path.resolve(f.path));
+    const outBase = path.join(DOWNLOAD_DIR, `translated_${Date.now()}_${uuidv4()}`);
+    const jobId = uuidv4();
+    const stream = wantsEventStream(req);
+
+    if (stream) openEventStream(res, jobId);
+
+    const job = jobQueue.enqueue({
+      id: jobId,
+      userId: req.user.userId,
+      kind: "translate",
+      onUpdate: stream ? queueEvents(res, jobId) : null,
+      run: (job, slot) => {
+        const worker = translationWorkers[slot];
+        job.onCancel = () => worker.cancel(jobId);
+        return worker.run({
+          id: jobId,
+          uploadedSrt: zip ? uploadedPaths[0] : null,
+          uploadedSrts: zip ? null : uploadedPaths,
           srcLang,
           tgtLang,
-          progress: 1
+          outBase,
+          pipeline,
+          batch: true,
+          onProgress: stream ? progressEvents(res, jobId) : null
         });
-
-        return res.json({
-          message: "Translation complete",
-          progress: 1,
-          srt_file: `/downloads/${path.basename(result.srt_file)}`,
-          json_file: `/downloads/${path.basename(result.json_file)}`
-        });
-      } catch (e) {
-        console.error("Failed to parse Python output:", e, stdoutBuffer);
-        return res.status(500).json({ error: "Failed to parse Python output" });
       }
     });
+    if (stream) {
+      res.on("close", () => {
+        if (!res.writableEnded) jobQueue.cancel(jobId);
+      });
+    }
+
+    let result;
+    try {
+      result = await job.promise;
+    } catch (e) {
+      console.error("Python batch translate error:", e.details || e);
+      const body = {
+        error: e.cancelled ? "Translation cancelled" : "Translation failed",
+        details: e.details || e.message
+      };
+      if (stream) {
+        sendEvent(res, e.cancelled ? "cancelled" : "error", body);
+        return res.end();
+      }
+      return res.status(e.cancelled ? 409 : 500).json(body);
+    }
+
+    const outputs = result.summary.outputs;
+    for (let i = 0; i < result.files.length; i++) {
+      await Translation.create({
+        userId: req.user.userId,
+        originalFile: zip ? uploadedPaths[0] : uploadedPaths[i],
+        translatedFile: result.files[i].srt_file,
+        jsonReport: result.files[i].json_file,
+        srcLang,
+        tgtLang,
+        progress: 1
+      });
+    }
+
+    const payload = {
+      message: "Translation complete",
+      job_id: jobId,
+      progress: 1,
+      files: result.files.map((file, i) => ({
+        source: zip ? outputs[i].source : files[i].originalname,
+        srt_file: `/downloads/${path.basename(file.srt_file)}`,
+        json_file: `/downloads/${path.basename(file.json_file)}`
+      })),
+      summary_file: `/downloads/${path.basename(result.summary_file)}`,
+      dedup_ratio: result.summary.dedup_ratio,
+      timing: {
+        elapsed_seconds: result.summary.elapsed_seconds,
+        lines_per_sec: result.summary.lines_per_sec
+      }
+    };
+    if (stream) {
+      sendEvent(res, "done", payload);
+      return res.end();
+    }
+    return res.json(payload);
   } catch (err) {
-    console.error("Translate endpoint error:", err);
-    return res.status(500).json({ error: "Translate endpoint error" });
+    console.error("Batch translate endpoint error:", err);
+    if (res.headersSent) return res.end();
+    return res.status(500).json({ error: "Batch translate endpoint error" });
   }
 });
 
@@ -211,53 +432,71 @@ app.post("/api/similarity",
       const originalPath = path.resolve(req.files.original[0].path);
       const translatedPath = path.resolve(req.files.translated[0].path);
       const threshold = parseFloat(req.body.threshold || "0.7");
+      const srcLang = req.body.srcLang || "en";
+      const tgtLang = req.body.tgtLang || "es";
+      // opt-in: pair cues by timestamps, so split or merged cues compare as groups
+      const align = req.body.align === "true" || req.body.align === true;
       const outJson = path.join(DOWNLOAD_DIR, `similarity_${Date.now()}_${uuidv4()}.json`);
 
-      const pythonPath = process.env.PYTHON_PATH || "python";
-
-      const py = spawn(pythonPath, [
-        path.join(__dirname, "python_scripts", "similarity.py"),
-        originalPath,
-        translatedPath,
-        "--threshold", threshold.toString(),
-        "--out_json", outJson
-      ], { shell: true });
+      const job = jobQueue.enqueue({
+        id: uuidv4(),
+        userId: req.user.userId,
+        kind: "similarity",
+        // the warm translate.py worker of the slot, so models stay loaded between checks
+        run: (job, slot) => {
+          const worker = translationWorkers[slot];
+          job.onCancel = () => worker.cancel(job.id);
+          return worker.similarity({
+            id: job.id,
+            originalSrt: originalPath,
+            translatedSrt: translatedPath,
+            outJson,
+            srcLang,
+            tgtLang,
+            threshold,
+            align,
+            // reuse back-translations from a pipeline-mode translate job when available
+            artifactsDir: DOWNLOAD_DIR
+          });
+        }
+      });
+      res.setHeader("X-Job-Id", job.id);
 
-      let stderr = "";
-      py.stderr.on("data", (data) => stderr += data.toString());
+      try {
+        await job.promise;
+      } catch (e) {
+        console.error("Python similarity error:", e.details || e);
+        return res.status(e.cancelled ? 409 : 500).json({
+          error: e.cancelled ? "Similarity check cancelled" : "Python script failed",
+          details: e.details
+        });
+      }
 
-      py.on("close", async (code) => {
-        if (code !== 0) {
-          console.error("Python similarity error:", stderr);
-          return res.status(500).json({ error: "Python script failed", details: stderr });
-        }
+      try {
+        const fileContent = fs.readFileSync(outJson, "utf-8");
+        const result = JSON.parse(fileContent);
+        const lowSimLines = (result.report || []).filter(r => r.similarity < (result.summary?.threshold ?? threshold));
 
-        try {
-          const fileContent = fs.readFileSync(outJson, "utf-8");
-          const result = JSON.parse(fileContent);
-          const lowSimLines = (result.report || []).filter(r => r.similarity < (result.summary?.threshold ?? threshold));
-
-          // Save similarity
-          await Similarity.create({
-            userId: req.user.userId,
-            originalFile: originalPath,
-            translatedFile: translatedPath,
-            backTranslated: result.back_translated_file || "",
-            jsonReport: outJson,
-            threshold
-          });
+        // Save similarity
+        await Similarity.create({
+          userId: req.user.userId,
+          originalFile: originalPath,
+          translatedFile: translatedPath,
+          backTranslated: result.back_translated_file || "",
+          jsonReport: outJson,
+          threshold
+        });
 
-          return res.json({
-            summary: result.summary,
-            report: result.report,
-            low_similarity: lowSimLines,
-            json_file: `/downloads/${path.basename(outJson)}`
-          });
-        } catch (e) {
-          console.error("Error parsing Python similarity output:", e);
-          return res.status(500).json({ error: "Failed to parse Python output" });
-        }
-      });
+        return res.json({
+          summary: result.summary,
+          report: result.report,
+          low_similarity: lowSimLines,
+          json_file: `/downloads/${path.basename(outJson)}`
+        });
+      } catch (e) {
+        console.error("Error parsing Python similarity output:", e);
+        return res.status(500).json({ error: "Failed to parse Python output" });
+      }
     } catch (err) {
       console.error("Similarity endpoint error:", err);
       return res.status(500).json({ error: "Similarity endpoint error" });
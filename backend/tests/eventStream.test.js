@@ -0,0 +1,62 @@
+const test = require("node:test");
+const assert = require("node:assert");
+const { wantsEventStream, openEventStream, queueEvents, progressEvents, sendEvent } = require("../eventStream");
+
+function fakeResponse() {
+  return {
+    status: null,
+    headers: null,
+    body: "",
+    writeHead(status, headers) {
+      this.status = status;
+      this.headers = headers;
+    },
+    write(chunk) {
+      this.body += chunk;
+    }
+  };
+}
+
+// [[event, data], ...] from the SSE frames written so far
+function events(res) {
+  return res.body.split("\n\n").filter(Boolean).map((frame) => {
+    const [event, data] = frame.split("\n");
+    return [event.replace(/^event: /, ""), JSON.parse(data.replace(/^data: /, ""))];
+  });
+}
+
+test("clients opt in with the Accept header or ?stream=1", () => {
+  assert.ok(wantsEventStream({ headers: { accept: "text/event-stream" }, query: {} }));
+  assert.ok(wantsEventStream({ headers: {}, query: { stream: "1" } }));
+  assert.ok(!wantsEventStream({ headers: { accept: "application/json" }, query: {} }));
+});
+
+test("a job's events arrive as SSE frames tagged with its id", () => {
+  const res = fakeResponse();
+  openEventStream(res, "job-1");
+  assert.strictEqual(res.status, 200);
+  assert.strictEqual(res.headers["Content-Type"], "text/event-stream");
+  assert.strictEqual(res.headers["X-Job-Id"], "job-1");
+
+  const onUpdate = queueEvents(res, "job-1");
+  onUpdate({ status: "queued", position: 1 });
+  onUpdate({ status: "queued", position: 0 });
+  onUpdate({ status: "running", position: null });
+  // a worker progress event (progress.py) keeps only the documented fields
+  progressEvents(res, "job-1")({
+    id: "job-1", event: "progress", target: "es", stage: "forward",
+    lines_done: 10, lines_total: 40, progress: 0.25, eta_seconds: 3.5
+  });
+  sendEvent(res, "done", { progress: 1 });
+
+  assert.deepStrictEqual(events(res), [
+    ["queued", { job_id: "job-1", position: 1 }],
+    ["queued", { job_id: "job-1", position: 0 }],
+    ["started", { job_id: "job-1" }],
+    ["progress", {
+      job_id: "job-1", target: "es", stage: "forward",
+      lines_done: 10, lines_total: 40, progress: 0.25, eta_seconds: 3.5
+    }],
+    ["done", { progress: 1 }]
+  ]);
+});
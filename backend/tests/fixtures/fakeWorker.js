@@ -0,0 +1,24 @@
+// Stand-in for `translate.py --worker` speaking the same NDJSON protocol
+// (worker.py): echoes each job back as its result after one progress event.
+// Jobs whose uploaded_srt is "hold" only finish when cancelled; "fail" jobs
+// answer with an error.
+const readline = require("readline");
+
+const held = new Set();
+
+function emit(message) {
+  process.stdout.write(JSON.stringify(message) + "\n");
+}
+
+emit({ event: "ready" });
+readline.createInterface({ input: process.stdin }).on("line", (line) => {
+  const message = JSON.parse(line);
+  if ("cancel" in message) {
+    if (held.delete(message.cancel)) emit({ id: message.cancel, error: "Job cancelled", cancelled: true });
+    return;
+  }
+  emit({ id: message.id, event: "progress", stage: "forward", lines_done: 1, lines_total: 2, progress: 0.5 });
+  if (message.uploaded_srt === "hold") held.add(message.id);
+  else if (message.uploaded_srt === "fail") emit({ id: message.id, error: "boom" });
+  else emit({ id: message.id, job: message });
+});
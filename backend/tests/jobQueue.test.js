@@ -0,0 +1,108 @@
+const test = require("node:test");
+const assert = require("node:assert");
+const { JobQueue } = require("../jobQueue");
+
+// A job that runs until finish() is called; started records the start order
+function controlledJob(queue, started, id, userId, onUpdate = null) {
+  let finish;
+  const done = new Promise((resolve) => { finish = resolve; });
+  const job = queue.enqueue({
+    id,
+    userId,
+    kind: "translate",
+    onUpdate,
+    run: (job, slot) => {
+      started.push({ id, slot });
+      return done;
+    }
+  });
+  job.finish = finish;
+  return job;
+}
+
+const tick = () => new Promise((resolve) => setImmediate(resolve));
+
+test("at most concurrency jobs run, each on a free slot", async () => {
+  const queue = new JobQueue({ concurrency: 2 });
+  const started = [];
+  const jobs = ["a", "b", "c"].map((id) => controlledJob(queue, started, id, id));
+  await tick();
+  assert.deepStrictEqual(started, [{ id: "a", slot: 0 }, { id: "b", slot: 1 }]);
+  assert.strictEqual(queue.status("c").status, "queued");
+
+  jobs[1].finish("done");
+  assert.strictEqual(await jobs[1].promise, "done");
+  await tick();
+  assert.deepStrictEqual(started[2], { id: "c", slot: 1 });
+});
+
+test("users are served round-robin, FIFO within a user", async () => {
+  const queue = new JobQueue({ concurrency: 1 });
+  const started = [];
+  const jobs = [
+    controlledJob(queue, started, "a1", "alice"),
+    controlledJob(queue, started, "a2", "alice"),
+    controlledJob(queue, started, "a3", "alice"),
+    controlledJob(queue, started, "b1", "bob"),
+    controlledJob(queue, started, "b2", "bob")
+  ];
+  // bob's first job jumps ahead of alice's backlog
+  assert.strictEqual(queue.status("b1").position, 0);
+  assert.strictEqual(queue.status("a2").position, 1);
+  for (const job of jobs) {
+    await tick();
+    jobs.find((j) => j.id === started[started.length - 1].id).finish();
+    await tick();
+  }
+  assert.deepStrictEqual(started.map((s) => s.id), ["a1", "b1", "a2", "b2", "a3"]);
+});
+
+test("queued jobs see their position change, then start", async () => {
+  const queue = new JobQueue({ concurrency: 1 });
+  const started = [];
+  const updates = [];
+  const first = controlledJob(queue, started, "first", "alice");
+  controlledJob(queue, started, "second", "alice");
+  controlledJob(queue, started, "third", "bob", (update) => updates.push(update));
+  assert.deepStrictEqual(updates, [{ status: "queued", position: 0 }]);
+  first.finish();
+  await tick();
+  await tick();
+  assert.deepStrictEqual(updates[updates.length - 1], { status: "running", position: null });
+});
+
+test("cancelling a queued job rejects it and moves the others up", async () => {
+  const queue = new JobQueue({ concurrency: 1 });
+  const started = [];
+  controlledJob(queue, started, "running", "alice");
+  const queued = controlledJob(queue, started, "queued", "bob");
+  controlledJob(queue, started, "last", "carol");
+  assert.strictEqual(queue.status("last").position, 1);
+
+  assert.ok(queue.cancel("queued"));
+  await assert.rejects(queued.promise, (e) => e.cancelled === true);
+  assert.strictEqual(queue.status("queued"), null);
+  assert.strictEqual(queue.status("last").position, 0);
+});
+
+test("cancelling a running job goes through its onCancel hook", async () => {
+  const queue = new JobQueue({ concurrency: 1 });
+  let cancelled = false;
+  const job = queue.enqueue({
+    id: "a",
+    userId: "alice",
+    kind: "translate",
+    run: (job) => new Promise((resolve, reject) => {
+      job.onCancel = () => {
+        cancelled = true;
+        reject(Object.assign(new Error("Job cancelled"), { cancelled: true }));
+      };
+    })
+  });
+  await tick();
+  assert.strictEqual(queue.owner("a"), "alice");
+  assert.ok(queue.cancel("a"));
+  await assert.rejects(job.promise, (e) => e.cancelled);
+  assert.ok(cancelled);
+  assert.ok(!queue.cancel("a")); // gone once finished
+});
@@ -0,0 +1,130 @@
+const test = require("node:test");
+const assert = require("node:assert");
+const fs = require("fs");
+const os = require("os");
+const path = require("path");
+const { ResultCache } = require("../resultCache");
+
+function tempDir(t) {
+  const dir = fs.mkdtempSync(path.join(os.tmpdir(), "result-cache-"));
+  t.after(() => fs.rmSync(dir, { recursive: true, force: true }));
+  return dir;
+}
+
+// A finished single-target job's result with its two outputs in downloads
+function job(downloads, name, bytes = 10) {
+  const outBase = path.join(downloads, name);
+  const result = { srt_file: `${outBase}_1.srt`, json_file: `${outBase}_1.json`, meta: { load_seconds: 1 } };
+  fs.writeFileSync(result.srt_file, "x".repeat(bytes));
+  fs.writeFileSync(result.json_file, "{}");
+  return { outBase, result };
+}
+
+function cache(dir, options = {}) {
+  return new ResultCache({
+    indexPath: path.join(dir, "cache", "index.json"),
+    maxAgeMs: 60000,
+    maxBytes: 1024,
+    saveDelayMs: 10,
+    ...options
+  });
+}
+
+test("a hit gets its own files named after its outBase", (t) => {
+  const dir = tempDir(t);
+  const first = job(dir, "translated_a");
+  const results = cache(dir);
+  results.set("k", first.result, first.outBase);
+
+  const hit = results.get("k", path.join(dir, "translated_b"));
+  assert.strictEqual(hit.srt_file, path.join(dir, "translated_b_1.srt"));
+  assert.strictEqual(fs.readFileSync(hit.srt_file, "utf8"), "x".repeat(10));
+  assert.deepStrictEqual(hit.meta, first.result.meta);
+
+  // the first job's files (and their Translation record) aren't the cache's
+  fs.rmSync(first.result.srt_file);
+  const again = results.get("k", path.join(dir, "translated_c"));
+  assert.ok(fs.existsSync(again.srt_file));
+  assert.strictEqual(results.get("missing", path.join(dir, "translated_d")), null);
+});
+
+test("multi-target summaries are rewritten with the hit's names", (t) => {
+  const dir = tempDir(t);
+  const outBase = path.join(dir, "translated_a");
+  const target = { srt_file: `${outBase}_es_1.srt`, json_file: `${outBase}_es_1.json` };
+  const summaryFile = path.join(dir, "summary_translated_a_1.json");
+  for (const file of [target.srt_file, target.json_file]) fs.writeFileSync(file, "x");
+  fs.writeFileSync(summaryFile, JSON.stringify({ targets: { es: { srt_file: "translated_a_es_1.srt" } } }));
+  const results = cache(dir);
+  results.set("k", { targets: { es: target }, summary_file: summaryFile, summary: {} }, outBase);
+
+  const hit = results.get("k", path.join(dir, "translated_b"));
+  assert.strictEqual(hit.summary_file, path.join(dir, "summary_translated_b_1.json"));
+  const summary = JSON.parse(fs.readFileSync(hit.summary_file, "utf8"));
+  assert.strictEqual(summary.targets.es.srt_file, "translated_b_es_1.srt");
+  assert.ok(fs.existsSync(hit.targets.es.srt_file));
+});
+
+test("expired entries miss and their copies go", async (t) => {
+  const dir = tempDir(t);
+  const first = job(dir, "translated_a");
+  const results = cache(dir);
+  results.set("k", first.result, first.outBase);
+  results.entries.get("k").createdAt -= 120000;
+  assert.strictEqual(results.get("k", path.join(dir, "translated_b")), null);
+  await new Promise((resolve) => setTimeout(resolve, 50));
+  assert.ok(!fs.existsSync(path.join(dir, "cache", "results", "k")));
+  assert.ok(fs.existsSync(first.result.srt_file)); // downloads are left alone
+});
+
+test("the least recently used entries go once the copies exceed maxBytes", async (t) => {
+  const dir = tempDir(t);
+  const results = cache(dir, { maxBytes: 250 });
+  const jobs = ["a", "b", "c"].map((name) => job(dir, `translated_${name}`, 100));
+  results.set("a", jobs[0].result, jobs[0].outBase);
+  results.set("b", jobs[1].result, jobs[1].outBase);
+  results.entries.get("a").lastUsed = 0;
+  results.entries.get("b").lastUsed = 1;
+  assert.ok(results.get("a", path.join(dir, "translated_hit"))); // a is now the most recent
+  results.set("c", jobs[2].result, jobs[2].outBase);
+
+  assert.deepStrictEqual([...results.entries.keys()].sort(), ["a", "c"]);
+  await new Promise((resolve) => setTimeout(resolve, 50));
+  assert.ok(!fs.existsSync(path.join(dir, "cache", "results", "b")));
+  assert.ok(fs.existsSync(jobs[1].result.srt_file));
+});
+
+test("hits batch their index writes", async (t) => {
+  const dir = tempDir(t);
+  const first = job(dir, "translated_a");
+  const results = cache(dir, { saveDelayMs: 30 });
+  results.set("k", first.result, first.outBase);
+  const indexPath = path.join(dir, "cache", "index.json");
+  const saved = () => JSON.parse(fs.readFileSync(indexPath, "utf8")).k.lastUsed;
+  const before = saved();
+
+  await new Promise((resolve) => setTimeout(resolve, 5));
+  const hit = results.get("k", path.join(dir, "translated_b"));
+  assert.ok(hit);
+  assert.strictEqual(saved(), before); // not written yet
+  await new Promise((resolve) => setTimeout(resolve, 60));
+  assert.strictEqual(saved(), results.entries.get("k").lastUsed);
+
+  // a fresh process reads the saved index
+  assert.ok(cache(dir).get("k", path.join(dir, "translated_c")));
+});
+
+test("keys cover the upload and every translate option", async (t) => {
+  const dir = tempDir(t);
+  const upload = path.join(dir, "in.srt");
+  fs.writeFileSync(upload, "1\n00:00:01,000 --> 00:00:02,000\nHi\n");
+  const results = cache(dir);
+  const base = { srcLang: "en", tgtLang: "es" };
+  const keys = await Promise.all([
+    base, { ...base, fast: true }, { ...base, backend: "int8" }, { ...base, window: 50 },
+    { ...base, reportFormat: "npz" }, { ...base, adaptive: 0.5 }, { ...base, triage: 0.1 },
+    { ...base, overlap: true }, { ...base, overlap: true, overlapThreads: 2 }
+  ].map((params) => results.key(upload, params)));
+  assert.strictEqual(new Set(keys).size, keys.length);
+  assert.strictEqual(await results.key(upload, { ...base, backend: "torch" }), keys[0]);
+});
@@ -0,0 +1,44 @@
+const test = require("node:test");
+const assert = require("node:assert");
+const { parseTranslateOptions } = require("../translateOptions");
+
+test("form fields are parsed into worker options", () => {
+  assert.deepStrictEqual(parseTranslateOptions({
+    fast: "false", pipeline: "true", backend: "onnx", window: "200", reportFormat: "npz",
+    adaptive: "0.6", triage: "0.25", overlap: "true", overlapThreads: "2", ignored: "x"
+  }), {
+    fast: false,
+    pipeline: true,
+    backend: "onnx",
+    window: 200,
+    reportFormat: "npz",
+    adaptive: 0.6,
+    triage: 0.25,
+    overlap: true,
+    overlapThreads: 2
+  });
+});
+
+test("missing fields keep translate.py's defaults", () => {
+  assert.deepStrictEqual(parseTranslateOptions({}), {
+    fast: false,
+    pipeline: false,
+    backend: null,
+    window: null,
+    reportFormat: "json",
+    adaptive: null,
+    triage: null,
+    overlap: false,
+    overlapThreads: null
+  });
+});
+
+test("unknown or out-of-range values are rejected", () => {
+  for (const body of [
+    { backend: "cuda" }, { window: "0" }, { window: "1.5" }, { reportFormat: "csv" },
+    { adaptive: "2" }, { triage: "-0.1" }, { triage: "x" }, { overlapThreads: "2" },
+    { overlap: "true", overlapThreads: "0" }
+  ]) {
+    assert.throws(() => parseTranslateOptions(body), (e) => e.invalidOption === true, JSON.stringify(body));
+  }
+});
@@ -0,0 +1,85 @@
+const test = require("node:test");
+const assert = require("node:assert");
+const path = require("path");
+const { TranslationWorker } = require("../translationWorker");
+
+function fakeWorker(t) {
+  const worker = new TranslationWorker({
+    pythonPath: JSON.stringify(process.execPath),
+    scriptPath: path.join(__dirname, "fixtures", "fakeWorker.js")
+  });
+  t.after(() => worker.proc && worker.proc.kill());
+  return worker;
+}
+
+test("run forwards the translate options as worker job keys", async (t) => {
+  const worker = fakeWorker(t);
+  const progress = [];
+  const result = await worker.run({
+    id: "a",
+    uploadedSrt: "in.srt",
+    srcLang: "en",
+    tgtLang: "es",
+    outBase: "out",
+    backend: "int8",
+    window: 50,
+    reportFormat: "npz",
+    triage: 0.2,
+    overlap: true,
+    overlapThreads: 2,
+    onProgress: (event) => progress.push(event)
+  });
+  assert.deepStrictEqual(result.job, {
+    id: "a",
+    uploaded_srt: "in.srt",
+    uploaded_srts: null,
+    src_lang: "en",
+    tgt_lang: "es",
+    out_base: "out",
+    fast: false,
+    pipeline: false,
+    window: 50,
+    report_format: "npz",
+    adaptive: null,
+    triage: 0.2,
+    overlap: true,
+    overlap_threads: 2,
+    batch: false,
+    backend: "int8"
+  });
+  assert.strictEqual(progress.length, 1);
+  assert.strictEqual(progress[0].progress, 0.5);
+});
+
+test("a job without a backend keeps the worker's default", async (t) => {
+  const worker = fakeWorker(t);
+  const result = await worker.run({ id: "b", uploadedSrt: "in.srt", srcLang: "en", tgtLang: "es", outBase: "out" });
+  assert.ok(!("backend" in result.job));
+});
+
+test("results are matched to their job by id", async (t) => {
+  const worker = fakeWorker(t);
+  const held = worker.run({ id: "held", uploadedSrt: "hold", srcLang: "en", tgtLang: "es", outBase: "out" });
+  const quick = await worker.run({ id: "quick", uploadedSrt: "in.srt", srcLang: "en", tgtLang: "es", outBase: "out" });
+  assert.strictEqual(quick.id, "quick");
+  assert.ok(worker.cancel("held"));
+  await assert.rejects(held, (e) => e.cancelled === true && e.details === "Job cancelled");
+});
+
+test("worker errors reject with their details", async (t) => {
+  const worker = fakeWorker(t);
+  const failing = worker.run({ id: "c", uploadedSrt: "fail", srcLang: "en", tgtLang: "es", outBase: "out" });
+  await assert.rejects(failing, (e) => e.details === "boom" && !e.cancelled);
+  assert.ok(!worker.cancel("c")); // finished jobs can't be cancelled
+});
+
+test("similarity jobs use the similarity message kind", async (t) => {
+  const worker = fakeWorker(t);
+  const result = await worker.similarity({
+    id: "s", originalSrt: "a.srt", translatedSrt: "b.srt", outJson: "out.json", srcLang: "en", tgtLang: "es"
+  });
+  assert.strictEqual(result.job.kind, "similarity");
+  assert.strictEqual(result.job.threshold, 0.7);
+  assert.strictEqual(result.job.artifacts_dir, null);
+  assert.strictEqual(result.job.align, false);
+});
@@ -0,0 +1,76 @@
+// translateOptions.js
+// Whitelist of the translate.py options /api/translate accepts from the form
+// body. Each is parsed and range-checked here (a bad value is a 400 before
+// anything is queued); combinations translate.py can't run together
+// (INCOMPATIBLE_OPTIONS in translate.py) come back as the job's error.
+// The parsed options are forwarded to the worker as its job keys and are
+// part of the result cache key, since every one of them changes the output.
+
+const BACKENDS = ["torch", "int8", "onnx"]; // inference_backend.py
+const REPORT_FORMATS = ["json", "npz"]; // translate.py
+
+function invalidOption(message) {
+  return Object.assign(new Error(message), { invalidOption: true });
+}
+
+function flag(value) {
+  return value === "true" || value === true;
+}
+
+function given(value) {
+  return value !== undefined && value !== null && value !== "";
+}
+
+function positiveInt(name, value) {
+  const number = Number(value);
+  if (!Number.isInteger(number) || number < 1) throw invalidOption(`${name} must be a positive integer`);
+  return number;
+}
+
+function numberIn(name, value, min, max) {
+  const number = Number(value);
+  if (!Number.isFinite(number) || number < min || number > max) {
+    throw invalidOption(`${name} must be a number between ${min} and ${max}`);
+  }
+  return number;
+}
+
+// Parsed options from a request body; throws an error with invalidOption set
+// for unknown or out-of-range values
+function parseTranslateOptions(body = {}) {
+  const options = {
+    // fast mode skips back-translation and similarity scoring
+    fast: flag(body.fast),
+    // pipeline mode stores back-translations/embeddings for a later /api/similarity
+    pipeline: flag(body.pipeline),
+    backend: null,
+    window: null,
+    reportFormat: "json",
+    adaptive: null,
+    triage: null,
+    overlap: flag(body.overlap),
+    overlapThreads: null
+  };
+  if (given(body.backend)) {
+    if (!BACKENDS.includes(body.backend)) throw invalidOption(`backend must be one of ${BACKENDS.join(", ")}`);
+    options.backend = body.backend;
+  }
+  if (given(body.window)) options.window = positiveInt("window", body.window);
+  if (given(body.reportFormat)) {
+    if (!REPORT_FORMATS.includes(body.reportFormat)) {
+      throw invalidOption(`reportFormat must be one of ${REPORT_FORMATS.join(", ")}`);
+    }
+    options.reportFormat = body.reportFormat;
+  }
+  // similarity threshold below which a greedy line is re-decoded with beam search
+  if (given(body.adaptive)) options.adaptive = numberIn("adaptive", body.adaptive, -1, 1);
+  // fraction of the low-risk lines that are still back-translated
+  if (given(body.triage)) options.triage = numberIn("triage", body.triage, 0, 1);
+  if (given(body.overlapThreads)) {
+    if (!options.overlap) throw invalidOption("overlapThreads needs overlap");
+    options.overlapThreads = positiveInt("overlapThreads", body.overlapThreads);
+  }
+  return options;
+}
+
+module.exports = { parseTranslateOptions, BACKENDS, REPORT_FORMATS };
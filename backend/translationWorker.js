@@ -0,0 +1,149 @@
+// translationWorker.js
+// Keeps one long-lived `translate.py --worker` process so models stay loaded
+// between requests. Jobs are written to its stdin as JSON lines and results
+// come back on stdout as JSON lines tagged with the job id. Progress events
+// for a job arrive as {"id", "event": "progress", ...} lines before its result.
+// Similarity checks run on the same process (and models) via similarity().
+const path = require("path");
+const { spawn } = require("child_process");
+const { v4: uuidv4 } = require("uuid");
+
+class TranslationWorker {
+  constructor({ pythonPath, scriptPath, threads = 0 } = {}) {
+    this.pythonPath = pythonPath || process.env.PYTHON_PATH || "python";
+    this.scriptPath = scriptPath || path.join(__dirname, "python_scripts", "translate.py");
+    this.threads = threads; // torch intra-op threads for this worker (0 = torch default)
+    this.proc = null;
+    this.pending = new Map();
+    this.stdoutBuffer = "";
+    this.stderrBuffer = "";
+  }
+
+  start() {
+    if (this.proc) return;
+    this.stdoutBuffer = "";
+    this.stderrBuffer = "";
+    const args = [this.scriptPath, "--worker"];
+    const env = { ...process.env };
+    if (this.threads > 0) {
+      args.push("--threads", String(this.threads));
+      env.OMP_NUM_THREADS = String(this.threads);
+      env.MKL_NUM_THREADS = String(this.threads);
+    }
+    this.proc = spawn(this.pythonPath, args, { shell: true, env });
+
+    this.proc.stdout.on("data", (data) => {
+      this.stdoutBuffer += data.toString();
+      const lines = this.stdoutBuffer.split("\n");
+      this.stdoutBuffer = lines.pop();
+      lines.filter(Boolean).forEach((line) => this._handleLine(line));
+    });
+    this.proc.stderr.on("data", (data) => {
+      // keep only the tail; transformers logs a lot on model load
+      this.stderrBuffer = (this.stderrBuffer + data.toString()).slice(-20000);
+    });
+    this.proc.on("close", (code) => {
+      console.error(`Translation worker exited with code ${code}`);
+      const details = this.stderrBuffer;
+      this.proc = null;
+      for (const { reject } of this.pending.values()) {
+        reject(Object.assign(new Error("Translation worker exited"), { details }));
+      }
+      this.pending.clear();
+    });
+  }
+
+  _handleLine(line) {
+    let message;
+    try {
+      message = JSON.parse(line);
+    } catch (e) {
+      console.error("Unparseable worker output:", line);
+      return;
+    }
+    if (message.event === "ready") return;
+
+    const entry = this.pending.get(message.id);
+    if (!entry) return;
+    if (message.event === "progress") {
+      if (entry.onProgress) entry.onProgress(message);
+      return;
+    }
+    this.pending.delete(message.id);
+    if (message.error) {
+      entry.reject(Object.assign(new Error("Translation failed"), {
+        details: message.error,
+        cancelled: Boolean(message.cancelled)
+      }));
+    } else {
+      entry.resolve(message);
+    }
+  }
+
+  // batch: uploadedSrt is a zip/directory, or uploadedSrts lists the files.
+  // The other options are translateOptions.js's; backend null keeps the
+  // worker's default (SUBTITLE_INFERENCE_BACKEND)
+  run({
+    id = uuidv4(), uploadedSrt = null, uploadedSrts = null, srcLang, tgtLang, outBase,
+    fast = false, pipeline = false, backend = null, window = null, reportFormat = "json",
+    adaptive = null, triage = null, overlap = false, overlapThreads = null,
+    batch = false, onProgress = null
+  }) {
+    const job = {
+      id,
+      uploaded_srt: uploadedSrt,
+      uploaded_srts: uploadedSrts,
+      src_lang: srcLang,
+      tgt_lang: tgtLang,
+      out_base: outBase,
+      fast,
+      pipeline,
+      window,
+      report_format: reportFormat,
+      adaptive,
+      triage,
+      overlap,
+      overlap_threads: overlapThreads,
+      batch
+    };
+    if (backend) job.backend = backend;
+    return this._submit(job, onProgress);
+  }
+
+  // similarity.py's check; resolves with { summary, json_file }. align pairs
+  // cues by timestamps instead of by position
+  similarity({
+    id = uuidv4(), originalSrt, translatedSrt, outJson, srcLang, tgtLang, threshold = 0.7,
+    artifactsDir = null, align = false, onProgress = null
+  }) {
+    return this._submit({
+      id,
+      kind: "similarity",
+      original_srt: originalSrt,
+      translated_srt: translatedSrt,
+      out_json: outJson,
+      src_lang: srcLang,
+      tgt_lang: tgtLang,
+      threshold,
+      artifacts_dir: artifactsDir,
+      align
+    }, onProgress);
+  }
+
+  _submit(job, onProgress) {
+    this.start();
+    return new Promise((resolve, reject) => {
+      this.pending.set(job.id, { resolve, reject, onProgress });
+      this.proc.stdin.write(JSON.stringify(job) + "\n");
+    });
+  }
+
+  // Cancels a queued or running job; its promise rejects with `cancelled: true`
+  cancel(id) {
+    if (!this.proc || !this.pending.has(id)) return false;
+    this.proc.stdin.write(JSON.stringify({ cancel: id }) + "\n");
+    return true;
+  }
+}
+
+module.exports = { TranslationWorker };